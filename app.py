@@ -2,9 +2,26 @@
 import streamlit as st
 import pandas as pd
 import os
+import time
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-import plotly.express as px
 import numpy as np
+from storage import initialize_csv, load_data, load_rows, append_data, upsert_row, delete_row, delete_rows, allocate_id, backfill_ids, list_membership, table_lock, cache_stats, StaleVersionError
+import blobstore
+import charts
+import history
+import paging
+import risk
+import rules
+import scheduler
+from facets import ColumnFacet, column_facet
+from filters import FilterError, filter_rows
+from joins import related_rows
+from kpis import Badges, Count, CountBy, Mean, SumBy, TopK, kpi_view
+from rules import Rule
+from search import search_rows, fuzzy_rows
+
+rerun_started = time.perf_counter() # For the per-rerun timing report in the sidebar
 
 # --- App Configuration ---
 st.set_page_config(page_title="Zenova SRP", layout="wide", initial_sidebar_state="expanded")
@@ -385,100 +402,204 @@ st.markdown("""
 DATA_DIR = "data"
 NOTIFICATIONS_FILE = os.path.join(DATA_DIR, "notifications.csv")
 FILES_FILE = os.path.join(DATA_DIR, "uploaded_files.csv")
+BLOB_DIR = os.path.join(DATA_DIR, blobstore.BLOB_DIR_NAME) # Uploaded file contents, stored once per distinct content
 PROJECTS_FILE = os.path.join(DATA_DIR, "project_tasks.csv")
 ASSETS_FILE = os.path.join(DATA_DIR, "assets.csv")
 AUDITS_FILE = os.path.join(DATA_DIR, "audit_points.csv")
 EVENTS_FILE = os.path.join(DATA_DIR, "events.csv")
 FILE_COMMENTS_FILE = os.path.join(DATA_DIR, "file_comments.csv") # NEW FILE COMMENTS
+SAVED_VIEWS_FILE = os.path.join(DATA_DIR, "saved_views.csv") # Named filter expressions per table
+INSIGHTS_SNAPSHOT_FILE = os.path.join(DATA_DIR, "insights_snapshot.json") # Latest co-pilot insights, kept by scheduler.py
+HISTORY_DIR = os.path.join(DATA_DIR, "kpi_history") # Daily supplier KPI snapshots, kept by history.py
 SUPPLIER_RECORDS_DIR = os.path.join(DATA_DIR, "supplier_records")
 SUPPLIER_DUMMY_DATA_FILE = os.path.join(DATA_DIR, "supplier_dummy_data.csv")
 
 os.makedirs(DATA_DIR, exist_ok=True)
 os.makedirs(SUPPLIER_RECORDS_DIR, exist_ok=True)
 
-# --- Helper Functions for Data Handling ---
-def initialize_csv(file_path, columns):
-    """Initializes a CSV file with headers if it doesn't exist or is empty."""
-    if not os.path.exists(file_path) or os.path.getsize(file_path) == 0:
-        pd.DataFrame(columns=columns).to_csv(file_path, index=False)
-
-def load_data(file_path, columns=None):
-    """Loads data from a CSV file. Returns an empty DataFrame if file is empty or not found."""
-    if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
-        try:
-            df = pd.read_csv(file_path)
-            # Ensure columns are present, add if missing (e.g., new columns from updates)
-            if columns:
-                for col in columns:
-                    if col not in df.columns:
-                        df[col] = None # Add missing columns with None or default
-            return df
-        except pd.errors.EmptyDataError:
-            # File exists but is empty
-            if columns:
-                return pd.DataFrame(columns=columns)
-            return pd.DataFrame()
-    else:
-        # File does not exist or is empty (handled by initialize_csv)
-        if columns:
-            return pd.DataFrame(columns=columns)
-        return pd.DataFrame()
-
-def append_data(file_path, new_entry_df):
-    """Appends data to a CSV, ensuring all columns match."""
-    df_existing = load_data(file_path, columns=new_entry_df.columns.tolist())
-    all_columns = list(set(df_existing.columns).union(set(new_entry_df.columns)))
-    df_existing = df_existing.reindex(columns=all_columns)
-    new_entry_df = new_entry_df.reindex(columns=all_columns)
-
-    df = pd.concat([df_existing, new_entry_df], ignore_index=True)
-    df.to_csv(file_path, index=False)
-
-def update_data(file_path, df_to_save):
-    """Overwrites the entire CSV file with the given DataFrame."""
-    df_to_save.to_csv(file_path, index=False)
+# --- Optimistic Concurrency for Edit Forms ---
+def form_base_row(form_key, row, submitted):
+    """Remembers the row an edit form was rendered from.
+
+    The row is kept on the rerun that submits the form, so the save can be
+    rejected if someone else changed that row in between.
+    """
+    state_key = f"{form_key}_base_row"
+    if not submitted or state_key not in st.session_state:
+        st.session_state[state_key] = row.to_dict()
+    return st.session_state[state_key]
+
+def save_row_change(file_path, key, form_key, values=None):
+    """Saves one edited row (or deletes it if values is None) unless it changed since the form was shown. Returns True on success."""
+    state_key = f"{form_key}_base_row"
+    try:
+        if values is None:
+            delete_row(file_path, key, expected=st.session_state.get(state_key))
+        else:
+            upsert_row(file_path, key, values, expected=st.session_state.get(state_key))
+    except StaleVersionError:
+        st.session_state.pop(state_key, None) # The next submit is checked against the latest data
+        st.error("Someone else changed this data while you were editing, so your changes were not saved. Review the latest values and submit again.")
+        return False
+    return True
+
+def set_notification_status(notification_id, status):
+    """Sets one message's status and refreshes the session copy of the mailbox."""
+    upsert_row(NOTIFICATIONS_FILE, notification_id, {"status": status})
+    st.session_state.notifications_df = load_data(NOTIFICATIONS_FILE, columns=notification_columns)
+
+def delete_file_comments(file_name):
+    """Deletes every comment on a file, including ones posted since this session loaded them."""
+    comments_df = load_data(FILE_COMMENTS_FILE, usecols=["comment_id", "file_name"])
+    delete_rows(FILE_COMMENTS_FILE, comments_df.loc[comments_df['file_name'] == file_name, 'comment_id'].tolist())
+
+# --- Uploaded File Contents ---
+def open_stored_file(file_row):
+    """Opens an uploaded file's contents: its blob, or its own path if uploaded before the blob store."""
+    if pd.notna(file_row.get('content_hash')):
+        return blobstore.open_blob(BLOB_DIR, file_row['content_hash'])
+    return open(file_row['path'], "rb")
+
+def delete_stored_file(file_row):
+    """Deletes a file's record, and its contents once no other record shares them.
+
+    Returns False, leaving the contents alone, if there was no record with the row's file_id to delete.
+    """
+    if pd.isna(file_row.get('file_id')):
+        return False
+    with table_lock(FILES_FILE):
+        if not delete_row(FILES_FILE, file_row['file_id']):
+            return False
+        if pd.isna(file_row.get('content_hash')):
+            os.remove(file_row['path'])
+            return True
+        hashes = load_data(FILES_FILE, usecols=["content_hash"])['content_hash']
+        if not (hashes == file_row['content_hash']).any():
+            blobstore.remove(BLOB_DIR, file_row['content_hash'])
+        return True
+
+# --- Form Defaults from Typed Columns ---
+def date_or_today(value):
+    """Returns a date column's value for st.date_input, or today's date if it is missing."""
+    return value.date() if pd.notna(value) else datetime.today().date()
+
+def whole_number(value):
+    """Returns a numeric column's value as an int for st.number_input, or 0 if it is missing."""
+    return int(value) if pd.notna(value) else 0
+
+def is_checked(value):
+    """Returns a boolean column's value for st.checkbox; missing (<NA>) shows unchecked."""
+    return bool(value) if pd.notna(value) else False
+
+# --- Filter Expressions & Saved Views ---
+FILTER_EXPRESSION_HELP = (
+    'Combine conditions with and / or / not and parentheses, e.g. risk_level = "High" and annual_spend_usd > 1M '
+    'and contract_end_date within 90 days. Also: != < <= > >=, in ("A", "B"), contains "text", is empty, today - 30.'
+)
+
+def load_saved_views(view_table):
+    """Returns the saved views of one table (named by its advanced search key), by name."""
+    views_df = load_data(SAVED_VIEWS_FILE, columns=saved_view_columns)
+    return views_df[views_df['view_table'] == view_table].sort_values('name')
+
+def filter_expression_controls(df, advance_search_key):
+    """Shows the filter expression box with its saved views and returns the rows of df that match."""
+    expression_key = f"{advance_search_key}_expression"
+    views_df = load_saved_views(advance_search_key)
+    expressions = dict(zip(views_df['view_id'], views_df['expression']))
+    names = dict(zip(views_df['view_id'], views_df['name']))
+
+    def open_view(): # Runs before the rerun, so the expression box can still be set
+        view_id = st.session_state[f"{advance_search_key}_view"]
+        if view_id:
+            st.session_state[expression_key] = expressions[view_id]
+
+    col_view, col_expression = st.columns([1, 3])
+    with col_view:
+        selected_view = st.selectbox("Saved view", [''] + list(expressions), key=f"{advance_search_key}_view", persist_state="session", on_change=open_view,
+                                     format_func=lambda view_id: names.get(view_id, view_id))
+    with col_expression:
+        expression = st.text_input("Filter expression", key=expression_key, persist_state="session", help=FILTER_EXPRESSION_HELP,
+                                   placeholder='risk_level = "High" and annual_spend_usd > 1M')
+
+    try:
+        # Compiled to one vectorized mask over the table, cached per table version and expression
+        df = filter_rows(df, expression)
+    except FilterError as exc:
+        st.error(f"Filter expression not applied: {exc}")
+        return df
+
+    if expression:
+        col_name, col_save, col_delete = st.columns([3, 1, 1])
+        with col_name:
+            view_name = st.text_input("View name", key=f"{advance_search_key}_view_name", persist_state="session", placeholder="e.g. High risk, big spend, renewing soon")
+        with col_save:
+            if st.button("Save View", key=f"{advance_search_key}_save_view"):
+                if view_name:
+                    append_data(SAVED_VIEWS_FILE, pd.DataFrame([{
+                        "view_id": allocate_id(SAVED_VIEWS_FILE, "VIEW"), "view_table": advance_search_key, "name": view_name,
+                        "expression": expression, "created_by": user_role, "timestamp": datetime.now().isoformat()
+                    }]))
+                    st.success(f"View '{view_name}' saved.")
+                    st.rerun()
+                else:
+                    st.warning("Name the view to save it.")
+        with col_delete:
+            if selected_view and st.button("Delete View", key=f"{advance_search_key}_delete_view"):
+                delete_row(SAVED_VIEWS_FILE, selected_view)
+                st.rerun()
+    return df
 
 # --- Dynamic Search and Filter Function ---
-def apply_search_and_filter(df, search_query_key, advance_search_key):
+def apply_search_and_filter(df, search_query_key, advance_search_key, fuzzy_columns=None):
     st.markdown('<div class="search-bar-container">', unsafe_allow_html=True)
-    search_query = st.text_input("Search...", key=search_query_key, placeholder="Type to search...", help="Search across all visible columns.")
+    search_query = st.text_input("Search...", key=search_query_key, persist_state="session", placeholder="Type to search...", help="Finds rows where every word you type starts a word in any visible column.")
     st.markdown('</div>', unsafe_allow_html=True)
 
-    filtered_df = df.copy()
+    filtered_df = df.copy(deep=False) # Copy-on-write: filtering never touches the cached frame
 
     if search_query:
-        search_lower = search_query.lower()
-        # Search across all string columns
-        filtered_df = filtered_df[
-            filtered_df.apply(lambda row: row.astype(str).str.lower().str.contains(search_lower).any(), axis=1)
-        ]
+        # Word-prefix lookup in the table's inverted index, kept current as rows are written
+        filtered_df = search_rows(filtered_df, search_query)
+        if filtered_df.empty and fuzzy_columns:
+            # Nothing matched as typed: rank the closest spellings instead of showing nothing
+            filtered_df = fuzzy_rows(df, search_query, fuzzy_columns)
+            if not filtered_df.empty:
+                st.caption(f"No exact matches for \"{search_query}\". Showing the closest spellings, best first.")
 
     with st.expander("Advanced Search & Filters", expanded=False):
+        filtered_df = filter_expression_controls(filtered_df, advance_search_key)
         if not filtered_df.empty:
             cols = filtered_df.columns.tolist()
-            # Exclude ID columns from direct text filter, but allow them in options
-            filterable_cols = [col for col in cols if filtered_df[col].dtype == 'object' or len(filtered_df[col].unique()) <= 20] # Text or low cardinality
+            # Distinct counts etc. come from the table's facet cache, counted once per table, not on every rerun
+            column_facets = {col: column_facet(filtered_df, col) for col in cols}
+            filterable_cols = [col for col in cols if pd.api.types.is_string_dtype(filtered_df[col]) or column_facets[col].numeric or (column_facets[col].distinct is not None and column_facets[col].distinct <= 20)] # Text, numbers (by range) or low cardinality
             
             # Use unique keys for each expander's advanced search elements
-            selected_column = st.selectbox("Filter by Column", [''] + filterable_cols, key=f"{advance_search_key}_col")
+            selected_column = st.selectbox("Filter by Column", [''] + filterable_cols, key=f"{advance_search_key}_col", persist_state="session")
 
             if selected_column:
-                unique_values = filtered_df[selected_column].dropna().unique().tolist()
-                
+                # The cached statistics describe the whole table; for a searched or filtered part, describe just its rows
+                facet = column_facets[selected_column]
+                if facet.rows != len(filtered_df):
+                    facet = ColumnFacet(filtered_df[selected_column])
+
                 # Convert numbers to strings for consistent search/selection if mixed types
-                unique_values = [str(val) for val in unique_values]
-                unique_values.sort() # Sort alphabetically
+                value_counts = {str(val): count for val, count in (facet.counts or {}).items()}
+                unique_values = sorted(value_counts) # Sort alphabetically
 
-                if filtered_df[selected_column].dtype == 'object' and len(unique_values) > 50: # For high cardinality text columns
-                    filter_text_query = st.text_input(f"Enter search term for '{selected_column}'", key=f"{advance_search_key}_text_filter")
+                if pd.api.types.is_string_dtype(filtered_df[selected_column]) and (facet.distinct is None or facet.distinct > 50): # For high cardinality text columns
+                    filter_text_query = st.text_input(f"Enter search term for '{selected_column}'", key=f"{advance_search_key}_text_filter", persist_state="session")
                     if filter_text_query:
                         filtered_df = filtered_df[filtered_df[selected_column].astype(str).str.contains(filter_text_query, case=False, na=False)]
-                elif filtered_df[selected_column].dtype in ['int64', 'float64']: # For numeric columns
-                    min_val, max_val = float(filtered_df[selected_column].min()), float(filtered_df[selected_column].max())
-                    col_min, col_max = st.slider(f"Filter by range for '{selected_column}'", min_value=min_val, max_value=max_val, value=(min_val, max_val), key=f"{advance_search_key}_num_range")
-                    filtered_df = filtered_df[(filtered_df[selected_column] >= col_min) & (filtered_df[selected_column] <= col_max)]
+                elif facet.numeric: # For numeric columns
+                    if facet.min is not None and facet.min < facet.max:
+                        st.bar_chart(facet.histogram(), height=120)
+                        col_min, col_max = st.slider(f"Filter by range for '{selected_column}'", min_value=facet.min, max_value=facet.max, value=(facet.min, facet.max), key=f"{advance_search_key}_num_range", persist_state="session")
+                        filtered_df = filtered_df[(filtered_df[selected_column] >= col_min) & (filtered_df[selected_column] <= col_max)]
                 else: # For low cardinality categorical or other types
-                    selected_values = st.multiselect(f"Select values for '{selected_column}'", unique_values, key=f"{advance_search_key}_multiselect")
+                    selected_values = st.multiselect(f"Select values for '{selected_column}'", unique_values, key=f"{advance_search_key}_multiselect", persist_state="session",
+                                                     format_func=lambda val: f"{val} ({value_counts[val]:,})")
                     if selected_values:
                         # Convert column to string for consistent comparison with selected_values
                         filtered_df = filtered_df[filtered_df[selected_column].astype(str).isin(selected_values)]
@@ -488,44 +609,270 @@ def apply_search_and_filter(df, search_query_key, advance_search_key):
     return filtered_df
 
 
+# --- Dashboard KPIs ---
+# Thresholds behind the OEM Dashboard's badges (the alerts' thresholds are in COPILOT_RULES)
+OTD_CHAMPION_RATE = 98.0
+QUALITY_STAR_REJECT_RATE = 0.1
+PERFECT_AUDIT_SCORE = 100
+SUPPLIER_BADGES = { # Badge -> the filter expression a supplier must meet to hold it
+    'OTD Champion 🏆': f"on_time_delivery_rate >= {OTD_CHAMPION_RATE}",
+    'Quality Star ⭐': f"quality_reject_rate <= {QUALITY_STAR_REJECT_RATE}", # Very low reject rate for 'zero'
+    'Audit Excellence 💯': f"last_audit_score = {PERFECT_AUDIT_SCORE}",
+    'Low Risk Partner ✅': 'risk_level = "Low"',
+}
+HIGH_RISK_SCORE = 50 # Composite risk scores (risk.py) at or above this count as high risk
+ALERT_LIST_LIMIT = 100 # Rows fetched for an alert's list
+LEADERBOARD_SIZE = 10
+CHART_THEME = 'plotly_dark' # Plotly template for the dashboard's charts; part of their cache key
+TREND_PERIODS = {"Last 30 days": 30, "Last 90 days": 90, "Last year": 365, "Last 2 years": 730, "All history": None}
+
+def dashboard_kpis():
+    """Returns the dashboard's supplier KPI view, kept current by every write."""
+    return kpi_view(SUPPLIER_DUMMY_DATA_FILE, supplier_columns, "dashboard", {
+        "suppliers": Count(),
+        "avg_on_time_delivery": Mean("on_time_delivery_rate"),
+        "avg_quality_reject": Mean("quality_reject_rate"),
+        "risk_levels": CountBy("risk_level"),
+        "agreement_statuses": CountBy("agreement_status", missing="Unknown"),
+        "spend_by_category": SumBy("annual_spend_usd", "primary_product_category"),
+        "badges": Badges(SUPPLIER_BADGES),
+        "top_spend": TopK("annual_spend_usd", LEADERBOARD_SIZE),
+        "top_audit_score": TopK("last_audit_score", LEADERBOARD_SIZE),
+        "top_on_time_delivery": TopK("on_time_delivery_rate", LEADERBOARD_SIZE),
+        "top_esg_score": TopK("esg_compliance_score", LEADERBOARD_SIZE),
+        "avg_risk_score": Mean(risk.RISK_COLUMN),
+        "high_risk_scores": Count(f"{risk.RISK_COLUMN} >= {HIGH_RISK_SCORE}"),
+        "top_risk_score": TopK(risk.RISK_COLUMN, LEADERBOARD_SIZE),
+    })
+
+def show_leaderboard(supplier_kpis, name, display_columns):
+    """Shows a top-k leaderboard of the supplier KPI view, fetching only its rows."""
+    keys = supplier_kpis.keys(name)
+    if not keys:
+        st.info(f"No supplier has a {display_columns[1].replace('_', ' ')} to rank yet.")
+        return
+    rows = load_rows(SUPPLIER_DUMMY_DATA_FILE, keys, supplier_columns)
+    st.dataframe(rows[display_columns], use_container_width=True, hide_index=True)
+
+def supplier_badge_flags(supplier_kpis, page_df):
+    """Adds a column per badge to a page of suppliers, read from the KPI view's badge bitsets."""
+    flags = supplier_kpis.flags("badges", page_df['supplier_id'].tolist())
+    return page_df.drop(columns='supplier_id').assign(**flags)
+
+def show_trend(frame, name, columns, title, y_label, area=False, cached=True):
+    """Draws some columns of a KPI history series (renamed as columns maps them); cached until the next snapshot."""
+    version = SUPPLIER_HISTORY.version() if cached else None
+    fig = charts.trend(SUPPLIER_HISTORY.network_path, version, frame[list(columns)].rename(columns=columns),
+                       name, title, y_label, CHART_THEME, area=area)
+    st.plotly_chart(fig, use_container_width=True)
+
+def beside_risk_level(page_df):
+    """Moves a page's risk score next to its risk level, where it is read with it."""
+    columns = [col for col in page_df.columns if col != risk.RISK_COLUMN]
+    if risk.RISK_COLUMN not in page_df.columns or 'risk_level' not in columns:
+        return page_df
+    columns.insert(columns.index('risk_level') + 1, risk.RISK_COLUMN)
+    return page_df[columns]
+
+def show_alert_rows(file_path, columns, keys, display_columns):
+    """Shows the rows behind an alert, fetched by key (at most ALERT_LIST_LIMIT of them)."""
+    rows = load_rows(file_path, keys[:ALERT_LIST_LIMIT], columns)
+    st.dataframe(rows[display_columns], use_container_width=True, hide_index=True)
+    if len(keys) > ALERT_LIST_LIMIT:
+        st.caption(f"Showing the first {ALERT_LIST_LIMIT:,} of {len(keys):,}.")
+
+# --- Supplier 360 ---
+def supplier_360_panel(supplier):
+    """Shows everything linked to one supplier across the other tables, looked up through their join indexes."""
+    names = [supplier['supplier_id'], supplier['supplier_name']]
+    related = {label: related_rows(file_path, join_columns, names, columns)
+               for label, file_path, columns, join_columns in SUPPLIER_360_TABLES}
+    metric_cols = st.columns(len(related))
+    for col, (label, rows) in zip(metric_cols, related.items()):
+        col.metric(label, len(rows))
+    for label, rows in related.items():
+        if not rows.empty:
+            with st.expander(f"{label} ({len(rows)})"):
+                st.dataframe(rows, use_container_width=True, hide_index=True)
+    year_ago = pd.Timestamp.today().normalize() - pd.Timedelta(days=365)
+    trend, resolution = SUPPLIER_HISTORY.trend(year_ago, supplier_id=supplier['supplier_id'])
+    if not trend.dropna(how="all").empty:
+        with st.expander(f"📈 KPI History (last year, {resolution})"):
+            name = ("supplier", supplier['supplier_id'], year_ago, resolution)
+            # Not cached: one supplier's small series is drawn quickly, and there are too many suppliers to keep
+            show_trend(trend, name, {"on_time_delivery_rate": "On-Time Delivery", "ESG_score": "ESG Score"}, "Delivery & ESG", "Score / %",
+                       cached=False)
+            show_trend(trend, name, {"quality_reject_rate": "Quality Reject Rate"}, "Quality Reject Rate", "%", cached=False)
+
+# --- Supplier Names for Pickers ---
+def supplier_names():
+    """Every supplier's name, for recipient, attendee and mention pickers in modules that don't load the supplier table."""
+    return load_data(SUPPLIER_DUMMY_DATA_FILE, columns=supplier_columns, usecols=["supplier_name"])['supplier_name'].tolist()
+
+
+# --- Paged Table Display ---
+def paged_dataframe(df, key, decorate=None):
+    """Shows df one page at a time, sorted on the server, so only that page is sent to the browser.
+
+    decorate, if given, turns the page into what is shown, e.g. to add columns computed for its rows only.
+    """
+    col_sort, col_order, col_page = st.columns([3, 1, 1])
+    with col_sort:
+        sort_column = st.selectbox("Sort by", [''] + df.columns.tolist(), key=f"{key}_sort", persist_state="session")
+    with col_order:
+        descending = st.checkbox("Descending", key=f"{key}_desc", persist_state="session")
+    pages = paging.page_count(len(df))
+    if st.session_state.get(f"{key}_page", 1) > pages: # The search or filters left fewer pages
+        st.session_state[f"{key}_page"] = pages
+    with col_page:
+        page_number = st.number_input("Page", min_value=1, max_value=pages, step=1, key=f"{key}_page", persist_state="session")
+
+    page_df = paging.page(df, page_number - 1, sort_column or None, not descending)
+    st.dataframe(decorate(page_df) if decorate else page_df, use_container_width=True, hide_index=True)
+    first_row = (page_number - 1) * paging.PAGE_SIZE
+    st.caption(f"Rows {first_row + 1:,}-{min(first_row + paging.PAGE_SIZE, len(df)):,} of {len(df):,} (page {page_number:,} of {pages:,})")
+
+
+# --- Per-Rerun Timing ---
+modules_run = [] # Titles of the modules this rerun ran
+
+@contextmanager
+def module_timer(title):
+    """Records how long a module's body took, keeping each module's last time for the sidebar report."""
+    started = time.perf_counter()
+    yield
+    st.session_state.setdefault("module_seconds", {})[title] = time.perf_counter() - started
+    modules_run.append(title)
+
+
+def show_rerun_timing(titles):
+    """Sidebar report: this rerun's time, which modules ran, and the last measured time of those skipped."""
+    module_seconds = st.session_state.get("module_seconds", {})
+    skipped = [title for title in titles if title not in modules_run]
+    saved = sum(module_seconds.get(title, 0) for title in skipped)
+    with st.sidebar.expander("⏱️ Rerun Timing"):
+        st.caption(f"This rerun: {(time.perf_counter() - rerun_started) * 1000:,.0f} ms. "
+                   f"Skipped {len(skipped)} modules; those opened before took {saved * 1000:,.0f} ms when last run.")
+        st.dataframe(pd.DataFrame({
+            "Module": titles,
+            "This Rerun": ["ran" if title in modules_run else "skipped" for title in titles],
+            "Last Run (ms)": [round(module_seconds[title] * 1000) if title in module_seconds else None for title in titles],
+        }), use_container_width=True, hide_index=True)
+
+
 # --- Initialize CSV Files ---
-notification_columns = [
-    "notification_id", "sender_role", "recipient_role", "subject", "message",
-    "timestamp", "status", "parent_notification_id" # status: Sent, Read, Replied
-]
+# Each table's columns map to the type load_data parses them into once per data
+# version: str, category (few distinct values), int, float, bool, list (stored as
+# a JSON array), date or datetime.
+notification_columns = {
+    "notification_id": "str", "sender_role": "category", "recipient_role": "category", "subject": "str", "message": "str",
+    "timestamp": "datetime", "status": "category", "parent_notification_id": "str" # status: Sent, Read, Replied
+}
 initialize_csv(NOTIFICATIONS_FILE, notification_columns) # NEW
-initialize_csv(FILES_FILE, ["filename", "type", "size", "uploader", "timestamp", "path"])
+file_columns = {
+    "file_id": "str", "filename": "str", "type": "category", "size": "int", "uploader": "category",
+    "timestamp": "datetime", "path": "str", "content_hash": "str" # path: only for files uploaded before the blob store
+}
+initialize_csv(FILES_FILE, file_columns)
 
 # --- MODIFIED: Added 'is_esg_project' for Sustainability Tracking ---
-project_columns = ["task_id", "task_name", "status", "assigned_to", "due_date", "description", "input_pending", "is_esg_project"]
+project_columns = {
+    "task_id": "str", "task_name": "str", "status": "category", "assigned_to": "str", "due_date": "date",
+    "description": "str", "input_pending": "bool", "is_esg_project": "bool"
+}
 initialize_csv(PROJECTS_FILE, project_columns)
 
 # --- MODIFIED: Added 'last_active_date' for AI Co-pilot (Idle Assets) ---
-asset_columns = ["asset_id", "asset_name", "location", "status", "eol_date", "calibration_date", "notes", "supplier", "last_active_date"]
+asset_columns = {
+    "asset_id": "str", "asset_name": "str", "location": "str", "status": "category", "eol_date": "date",
+    "calibration_date": "date", "notes": "str", "supplier": "str", "last_active_date": "date"
+}
 initialize_csv(ASSETS_FILE, asset_columns)
 
-audit_columns = ["audit_id", "point_description", "status", "assignee", "due_date", "resolution", "input_pending"]
+audit_columns = {
+    "audit_id": "str", "point_description": "str", "status": "category", "assignee": "str", "due_date": "date",
+    "resolution": "str", "input_pending": "bool"
+}
 initialize_csv(AUDITS_FILE, audit_columns)
-event_columns = [
-    "event_id", "title", "description", "start_date", "end_date",
-    "attendees", "created_by", "timestamp"
-]
+event_columns = {
+    "event_id": "str", "title": "str", "description": "str", "start_date": "date", "end_date": "date",
+    "attendees": "list", "created_by": "category", "timestamp": "datetime"
+}
 initialize_csv(EVENTS_FILE, event_columns)
-file_comment_columns = [
-    "comment_id", "file_name", "parent_comment_id", "author", "timestamp", "comment_text", "mentions" # mentions: list of roles
-]
+file_comment_columns = {
+    "comment_id": "str", "file_name": "str", "parent_comment_id": "str", "author": "category", "timestamp": "datetime",
+    "comment_text": "str", "mentions": "list" # mentions: list of roles
+}
 initialize_csv(FILE_COMMENTS_FILE, file_comment_columns) # NEW FILE COMMENTS
+saved_view_columns = {
+    "view_id": "str", "view_table": "category", "name": "str", "expression": "str", "created_by": "category", "timestamp": "datetime"
+}
+initialize_csv(SAVED_VIEWS_FILE, saved_view_columns)
 
 # --- MODIFIED: Added ESG-related columns for Sustainability Tracking & Gamification ---
-supplier_columns = [
-    "supplier_id", "supplier_name", "contact_person", "email", "phone",
-    "agreement_status", "last_audit_score", "notes",
-    "primary_product_category", "on_time_delivery_rate", "quality_reject_rate",
-    "risk_level", "certification", "annual_spend_usd", "last_performance_review_date",
-    "esg_compliance_score", "emissions_target_met" # NEW ESG Columns
-]
+supplier_columns = {
+    "supplier_id": "str", "supplier_name": "str", "contact_person": "str", "email": "str", "phone": "str",
+    "agreement_status": "category", "last_audit_score": "int", "notes": "str",
+    "primary_product_category": "category", "on_time_delivery_rate": "float", "quality_reject_rate": "float",
+    "risk_level": "category", "certification": "category", "annual_spend_usd": "int", "last_performance_review_date": "date",
+    "supplier_city": "category", "supplier_country": "category", "payment_terms": "category",
+    "contract_start_date": "date", "contract_end_date": "date", "supplier_tier": "category", "ESG_score": "float",
+    "account_manager": "category", "onboarding_date": "date",
+    "esg_compliance_score": "int", "emissions_target_met": "bool" # NEW ESG Columns
+}
 initialize_csv(SUPPLIER_DUMMY_DATA_FILE, supplier_columns)
 
+# Repairs legacy IDs once: rows saved without one (e.g. files uploaded before file_id existed),
+# and the repeats left by the old "row count + 1" IDs. A lookup per table after that.
+for file_path, id_prefix in [(SUPPLIER_DUMMY_DATA_FILE, "SUP"), (NOTIFICATIONS_FILE, "NOTIF"), (FILES_FILE, "FILE"),
+                             (PROJECTS_FILE, "TASK"), (ASSETS_FILE, "AST"), (AUDITS_FILE, "AUDIT"), (EVENTS_FILE, "EVENT"),
+                             (FILE_COMMENTS_FILE, "COMM"), (SAVED_VIEWS_FILE, "VIEW")]:
+    backfill_ids(file_path, id_prefix)
+
+# The composite risk score is read with the supplier table as a computed risk_score column.
+# Each factor's weight can be overridden with ZENOVA_RISK_WEIGHT_<COLUMN>, e.g. ZENOVA_RISK_WEIGHT_ESG_SCORE=0.3.
+SUPPLIER_RISK = risk.risk_model(SUPPLIER_DUMMY_DATA_FILE)
+risk_day_job = scheduler.periodic("risk-day", risk.roll_day, 24 * 60 * 60) # Days left on contracts count from the new date after midnight
+
+
+# Where the other tables mention a supplier (by name or ID), for the Supplier 360 panel
+SUPPLIER_360_TABLES = [
+    ("🛠️ Assets", ASSETS_FILE, asset_columns, ["supplier"]),
+    ("📅 Tasks", PROJECTS_FILE, project_columns, ["assigned_to"]),
+    ("📋 Audit Points", AUDITS_FILE, audit_columns, ["assignee"]),
+    ("📁 Files", FILES_FILE, file_columns, ["uploader"]),
+    ("📧 Messages", NOTIFICATIONS_FILE, notification_columns, ["recipient_role", "sender_role"]),
+    ("🗓️ Events", EVENTS_FILE, event_columns, ["attendees", "created_by"]),
+]
+
+# The OEM Dashboard's insights and alerts, evaluated by rules.py in one pass per table.
+# Each threshold can be overridden with ZENOVA_RULE_<NAME>, e.g. ZENOVA_RULE_IDLE_ASSETS=90.
+COPILOT_RULES = {rule.name: rule for rule in [
+    Rule("idle_assets", ASSETS_FILE, asset_columns, 'status = "Operational"', threshold=60, # Only operational assets can be idle
+         date_column="last_active_date", when="older_than"),
+    Rule("overdue_tasks", PROJECTS_FILE, project_columns, 'not status = "Completed"', date_column="due_date", when="past_due"),
+    Rule("high_reject_suppliers", SUPPLIER_DUMMY_DATA_FILE, supplier_columns, "quality_reject_rate > {threshold}", threshold=1.5),
+    Rule("overdue_audits", AUDITS_FILE, audit_columns, 'not status = "Completed"', date_column="due_date", when="past_due"),
+    Rule("upcoming_audits", AUDITS_FILE, audit_columns, 'not status = "Completed"', threshold=30, date_column="due_date", when="due_within"),
+    Rule("overdue_esg_projects", PROJECTS_FILE, project_columns, 'not status = "Completed" and is_esg_project = true',
+         date_column="due_date", when="past_due"),
+    Rule("low_esg_suppliers", SUPPLIER_DUMMY_DATA_FILE, supplier_columns, "esg_compliance_score < {threshold}", threshold=70),
+    Rule("emissions_missed", SUPPLIER_DUMMY_DATA_FILE, supplier_columns, "emissions_target_met = false"),
+    Rule("pending_renewals", SUPPLIER_DUMMY_DATA_FILE, supplier_columns, 'agreement_status = "Pending Renewal"'),
+    Rule("overdue_reviews", SUPPLIER_DUMMY_DATA_FILE, supplier_columns, threshold=365,
+         date_column="last_performance_review_date", when="older_than"),
+]}
+
+# Recomputes the insights in the background after writes and on a schedule; the dashboard reads its latest snapshot
+insight_scheduler = scheduler.scheduler_for(COPILOT_RULES.values(), INSIGHTS_SNAPSHOT_FILE)
+
+# Daily supplier KPI history for the trend charts, recorded in the background
+SUPPLIER_HISTORY = history.KPIHistory(
+    HISTORY_DIR, SUPPLIER_DUMMY_DATA_FILE, supplier_columns,
+    metrics=["on_time_delivery_rate", "quality_reject_rate", "annual_spend_usd", "last_audit_score", "ESG_score"],
+    totals=["annual_spend_usd"], mix=("risk_level", ["Low", "Medium", "High"]))
+history_job = scheduler.periodic("kpi-history", SUPPLIER_HISTORY.record, history.RECORD_INTERVAL_SECONDS)
+
 
 # --- Sidebar Login ---
 st.sidebar.image("ZENOVASRPLOGO.png", width=200) # Updated logo path
@@ -553,8 +900,8 @@ tab_titles = [
     "🗓️ Calendar"
 ]
 
-# Create horizontal tabs
-tabs = st.tabs(tab_titles)
+# Create horizontal tabs; switching tabs reruns the script, which then runs only the selected module
+tabs = st.tabs(tab_titles, key="active_tab", on_change="rerun")
 
 
 # --- Initialize Streamlit Session State (Global Scope) ---
@@ -571,1153 +918,1112 @@ if "events_df" not in st.session_state:
     st.session_state.events_df = load_data(EVENTS_FILE, columns=event_columns)
 
 if "files_df" not in st.session_state:
-    st.session_state.files_df = load_data(FILES_FILE, columns=["filename", "type", "size", "uploader", "timestamp", "path"])
+    st.session_state.files_df = load_data(FILES_FILE, columns=file_columns)
 
 if "file_comments_df" not in st.session_state:
     st.session_state.file_comments_df = load_data(FILE_COMMENTS_FILE, columns=file_comment_columns)
-    # Ensure 'mentions' column is parsed as list
-    if 'mentions' in st.session_state.file_comments_df.columns:
-        st.session_state.file_comments_df['mentions'] = st.session_state.file_comments_df['mentions'].apply(lambda x: eval(x) if isinstance(x, str) else []).fillna('')
 
 
 # --- Main Application Content based on Tab Selection ---
 
 # --- OEM Dashboard Module ---
-with tabs[0]: # Corresponding to "📊 OEM Dashboard"
-    st.subheader("OEM Performance Dashboard")
-    st.markdown("A comprehensive overview of key performance indicators across your supplier network and internal operations.")
-
-    if user_role != "OEM":
-        st.warning("🔒 You must be logged in as 'OEM' to view this dashboard.")
-    else:
-        # Load all relevant data for the dashboard
-        projects_df = load_data(PROJECTS_FILE, columns=project_columns)
-        assets_df = load_data(ASSETS_FILE, columns=asset_columns)
-        audits_df = load_data(AUDITS_FILE, columns=audit_columns)
-        supplier_df = load_data(SUPPLIER_DUMMY_DATA_FILE, columns=supplier_columns)
+if tabs[0].open: # Only the selected module runs; the others keep their widget state
+    with tabs[0], module_timer(tab_titles[0]): # Corresponding to "📊 OEM Dashboard"
+        st.subheader("OEM Performance Dashboard")
+        st.markdown("A comprehensive overview of key performance indicators across your supplier network and internal operations.")
 
-        st.markdown("---")
-        st.subheader("💡 AI Co-pilot Insights")
-        st.markdown("Automated recommendations to highlight critical areas and suggest actions.")
-        current_date = datetime.now()
-
-        col_ai1, col_ai2 = st.columns(2)
+        if user_role != "OEM":
+            st.warning("🔒 You must be logged in as 'OEM' to view this dashboard.")
+        else:
+            # Aggregates come from the KPI view, kept current by every write, and the alerts from the scheduler's
+            # latest snapshot of the co-pilot rules; only the rows behind an alert are fetched
+            supplier_kpis = dashboard_kpis()
+            insights_snapshot = insight_scheduler.latest()
+            if insights_snapshot is not None:
+                insights = insights_snapshot.results
+            else: # The first background refresh failed; evaluating here shows why
+                insights = rules.evaluate(list(COPILOT_RULES.values()))
+            supplier_df = load_data(SUPPLIER_DUMMY_DATA_FILE, columns=supplier_columns)
 
-        with col_ai1:
-            # --- AI Co-pilot Recommendation 1: Idle Assets ---
-            if not assets_df.empty and 'last_active_date' in assets_df.columns:
-                try:
-                    assets_df['last_active_date'] = pd.to_datetime(assets_df['last_active_date'], errors='coerce')
-                    idle_threshold_days = 60 # Example threshold
-                    idle_assets = assets_df[
-                        (assets_df['status'] == 'Operational') & # Only operational assets can be idle
-                        (current_date - assets_df['last_active_date']).dt.days > idle_threshold_days
-                    ]
-                    if not idle_assets.empty:
-                        st.warning(f"**Action Required:** {len(idle_assets)} assets are idle for over {idle_threshold_days} days. Review their utilization.")
-                        with st.expander("View Idle Assets"):
-                            st.dataframe(idle_assets[['asset_name', 'location', 'status', 'last_active_date']], use_container_width=True, hide_index=True)
-                    else:
-                        st.info(f"No operational assets have been idle for over {idle_threshold_days} days.")
-                except Exception as e:
-                    st.error(f"Error checking idle assets: {e}")
-            else:
-                st.info("To enable idle asset tracking, ensure 'last_active_date' column is available and populated in Asset Management.")
+            st.markdown("---")
+            st.subheader("💡 AI Co-pilot Insights")
+            st.markdown("Automated recommendations to highlight critical areas and suggest actions.")
+            if insights_snapshot is not None:
+                refreshing = "" if insights_snapshot.is_current() else " · refreshing after recent changes"
+                st.caption(f"Insights computed at {insights_snapshot.computed_at:%Y-%m-%d %H:%M:%S}{refreshing}")
+            if insight_scheduler.last_error is not None:
+                st.caption(f"⚠️ The last background refresh failed: {insight_scheduler.last_error}")
+
+            col_ai1, col_ai2 = st.columns(2)
+
+            with col_ai1:
+                # --- AI Co-pilot Recommendation 1: Idle Assets ---
+                if 'last_active_date' in asset_columns:
+                    try:
+                        idle_days = COPILOT_RULES["idle_assets"].threshold
+                        idle_asset_ids = insights["idle_assets"]
+                        if idle_asset_ids:
+                            st.warning(f"**Action Required:** {len(idle_asset_ids)} assets are idle for over {idle_days} days. Review their utilization.")
+                            with st.expander("View Idle Assets"):
+                                show_alert_rows(ASSETS_FILE, asset_columns, idle_asset_ids, ['asset_name', 'location', 'status', 'last_active_date'])
+                        else:
+                            st.info(f"No operational assets have been idle for over {idle_days} days.")
+                    except Exception as e:
+                        st.error(f"Error checking idle assets: {e}")
+                else:
+                    st.info("To enable idle asset tracking, ensure 'last_active_date' column is available and populated in Asset Management.")
             
-            st.markdown("---") # Separator for better layout
-            # --- AI Co-pilot Recommendation 2: Overdue Projects/Tasks ---
-            if not projects_df.empty and 'due_date' in projects_df.columns:
+                st.markdown("---") # Separator for better layout
+                # --- AI Co-pilot Recommendation 2: Overdue Projects/Tasks ---
                 try:
-                    projects_df['due_date'] = pd.to_datetime(projects_df['due_date'], errors='coerce')
-                    overdue_tasks = projects_df[
-                        (projects_df['status'] != 'Completed') &
-                        (projects_df['due_date'] < current_date)
-                    ]
-                    if not overdue_tasks.empty:
-                        st.error(f"**Urgent:** {len(overdue_tasks)} projects/tasks are overdue. Prioritize immediate action.")
+                    overdue_task_ids = insights["overdue_tasks"]
+                    if overdue_task_ids:
+                        st.error(f"**Urgent:** {len(overdue_task_ids)} projects/tasks are overdue. Prioritize immediate action.")
                         with st.expander("View Overdue Tasks"):
-                            st.dataframe(overdue_tasks[['task_name', 'assigned_to', 'due_date', 'status']], use_container_width=True, hide_index=True)
+                            show_alert_rows(PROJECTS_FILE, project_columns, overdue_task_ids, ['task_name', 'assigned_to', 'due_date', 'status'])
                     else:
                         st.success("All active projects/tasks are currently on track.")
                 except Exception as e:
                     st.error(f"Error checking overdue projects: {e}")
 
-        with col_ai2:
-            # --- AI Co-pilot Recommendation 3: Low Performing Suppliers (e.g., Quality Reject Rate) ---
-            if not supplier_df.empty and 'quality_reject_rate' in supplier_df.columns:
-                try:
-                    reject_threshold = 1.5 # Example threshold: more than 1.5% reject rate
-                    low_quality_suppliers = supplier_df[supplier_df['quality_reject_rate'] > reject_threshold]
-                    if not low_quality_suppliers.empty:
-                        st.warning(f"**Review Needed:** {len(low_quality_suppliers)} suppliers have a Quality Reject Rate exceeding {reject_threshold}%.")
-                        with st.expander("View Suppliers with High Reject Rates"):
-                            st.dataframe(low_quality_suppliers[['supplier_name', 'quality_reject_rate', 'last_performance_review_date']], use_container_width=True, hide_index=True)
-                    else:
-                        st.success(f"All suppliers currently meet the quality reject rate target of {reject_threshold}%.")
-                except Exception as e:
-                    st.error(f"Error checking low performing suppliers: {e}")
+            with col_ai2:
+                # --- AI Co-pilot Recommendation 3: Low Performing Suppliers (e.g., Quality Reject Rate) ---
+                if supplier_kpis["suppliers"]:
+                    try:
+                        high_reject_rate = COPILOT_RULES["high_reject_suppliers"].threshold
+                        if insights["high_reject_suppliers"]:
+                            st.warning(f"**Review Needed:** {len(insights['high_reject_suppliers'])} suppliers have a Quality Reject Rate exceeding {high_reject_rate}%.")
+                            with st.expander("View Suppliers with High Reject Rates"):
+                                show_alert_rows(SUPPLIER_DUMMY_DATA_FILE, supplier_columns, insights["high_reject_suppliers"],
+                                                ['supplier_name', 'quality_reject_rate', 'last_performance_review_date'])
+                        else:
+                            st.success(f"All suppliers currently meet the quality reject rate target of {high_reject_rate}%.")
+                    except Exception as e:
+                        st.error(f"Error checking low performing suppliers: {e}")
 
-            st.markdown("---") # Separator for better layout
-            # --- AI Co-pilot Recommendation 4: Audits Due Soon or Overdue ---
-            if not audits_df.empty and 'due_date' in audits_df.columns:
+                st.markdown("---") # Separator for better layout
+                # --- AI Co-pilot Recommendation 4: Audits Due Soon or Overdue ---
                 try:
-                    audits_df['due_date'] = pd.to_datetime(audits_df['due_date'], errors='coerce')
-                    upcoming_audits = audits_df[
-                        (audits_df['status'] != 'Completed') &
-                        (audits_df['due_date'] >= current_date) &
-                        (audits_df['due_date'] <= current_date + timedelta(days=30))
-                    ]
-                    overdue_audits = audits_df[
-                        (audits_df['status'] != 'Completed') &
-                        (audits_df['due_date'] < current_date)
-                    ]
-
-                    if not overdue_audits.empty:
-                        st.error(f"**Urgent:** {len(overdue_audits)} audits are overdue. Ensure immediate follow-up.")
+                    overdue_audit_ids = insights["overdue_audits"]
+                    upcoming_audit_ids = insights["upcoming_audits"]
+                    upcoming_days = COPILOT_RULES["upcoming_audits"].threshold
+
+                    if overdue_audit_ids:
+                        st.error(f"**Urgent:** {len(overdue_audit_ids)} audits are overdue. Ensure immediate follow-up.")
                         with st.expander("View Overdue Audits"):
-                            st.dataframe(overdue_audits[['point_description', 'assignee', 'due_date', 'status']], use_container_width=True, hide_index=True)
+                            show_alert_rows(AUDITS_FILE, audit_columns, overdue_audit_ids, ['point_description', 'assignee', 'due_date', 'status'])
 
-                    if not upcoming_audits.empty:
-                        st.info(f"**Heads Up:** {len(upcoming_audits)} audits are due in the next 30 days. Plan accordingly.")
+                    if upcoming_audit_ids:
+                        st.info(f"**Heads Up:** {len(upcoming_audit_ids)} audits are due in the next {upcoming_days} days. Plan accordingly.")
                         with st.expander("View Upcoming Audits"):
-                            st.dataframe(upcoming_audits[['point_description', 'assignee', 'due_date', 'status']], use_container_width=True, hide_index=True)
+                            show_alert_rows(AUDITS_FILE, audit_columns, upcoming_audit_ids, ['point_description', 'assignee', 'due_date', 'status'])
                     else:
-                        st.success("No audits are currently overdue or due in the next 30 days.")
+                        st.success(f"No audits are currently overdue or due in the next {upcoming_days} days.")
                 except Exception as e:
                     st.error(f"Error checking audits: {e}")
 
-        # --- Sustainability Tracking (ESG KPIs) ---
-        st.markdown("---")
-        st.subheader("🌍 Sustainability & ESG Monitoring")
-        st.markdown("Tracking your environmental, social, and governance (ESG) performance.")
+            # --- Sustainability Tracking (ESG KPIs) ---
+            st.markdown("---")
+            st.subheader("🌍 Sustainability & ESG Monitoring")
+            st.markdown("Tracking your environmental, social, and governance (ESG) performance.")
 
-        col_esg1, col_esg2 = st.columns(2)
+            col_esg1, col_esg2 = st.columns(2)
 
-        with col_esg1:
-            # ESG Project Delays
-            if not projects_df.empty and 'is_esg_project' in projects_df.columns:
-                try:
-                    # Ensure due_date is datetime and is_esg_project is boolean
-                    projects_df['due_date'] = pd.to_datetime(projects_df['due_date'], errors='coerce')
-                    projects_df['is_esg_project'] = projects_df['is_esg_project'].astype(bool)
-
-                    esg_project_delays = projects_df[
-                        (projects_df['is_esg_project'] == True) &
-                        (projects_df['status'] != 'Completed') &
-                        (projects_df['due_date'] < current_date)
-                    ]
-                    if not esg_project_delays.empty:
-                        st.error(f"**Sustainability Alert:** {len(esg_project_delays)} ESG-related projects are overdue, potentially impacting sustainability KPIs.")
-                        with st.expander("View Delayed ESG Projects"):
-                            st.dataframe(esg_project_delays[['task_name', 'assigned_to', 'due_date', 'description']], use_container_width=True, hide_index=True)
-                    else:
-                        st.success("All ESG-related projects are currently on track.")
-                except Exception as e:
-                    st.error(f"Error checking ESG project delays: {e}")
-            else:
-                st.info("No ESG project data available. Mark projects as 'ESG-related' in Project Management.")
+            with col_esg1:
+                # ESG Project Delays
+                if 'is_esg_project' in project_columns:
+                    try:
+                        delayed_esg_task_ids = insights["overdue_esg_projects"]
+                        if delayed_esg_task_ids:
+                            st.error(f"**Sustainability Alert:** {len(delayed_esg_task_ids)} ESG-related projects are overdue, potentially impacting sustainability KPIs.")
+                            with st.expander("View Delayed ESG Projects"):
+                                show_alert_rows(PROJECTS_FILE, project_columns, delayed_esg_task_ids, ['task_name', 'assigned_to', 'due_date', 'description'])
+                        else:
+                            st.success("All ESG-related projects are currently on track.")
+                    except Exception as e:
+                        st.error(f"Error checking ESG project delays: {e}")
+                else:
+                    st.info("No ESG project data available. Mark projects as 'ESG-related' in Project Management.")
 
-        with col_esg2:
-            # Supplier ESG Compliance (requires new columns in supplier_dummy_data.csv)
-            if not supplier_df.empty and 'esg_compliance_score' in supplier_df.columns:
-                try:
-                    low_esg_score_threshold = 70 # Example threshold
-                    non_compliant_suppliers = supplier_df[supplier_df['esg_compliance_score'] < low_esg_score_threshold]
-                    if not non_compliant_suppliers.empty:
-                        st.warning(f"**Sustainability Watch:** {len(non_compliant_suppliers)} suppliers have an ESG compliance score below {low_esg_score_threshold}.")
-                        with st.expander("View Suppliers with Low ESG Scores"):
-                            st.dataframe(non_compliant_suppliers[['supplier_name', 'esg_compliance_score', 'certification']], use_container_width=True, hide_index=True)
-                    else:
-                        st.success(f"All suppliers currently meet the ESG compliance score target of {low_esg_score_threshold}.")
-
-                    # Example: Suppliers not meeting emissions target
-                    if 'emissions_target_met' in supplier_df.columns:
-                        not_met_emissions = supplier_df[supplier_df['emissions_target_met'] == False]
-                        if not not_met_emissions.empty:
-                            st.warning(f"**Environmental Focus:** {len(not_met_emissions)} suppliers have not met their emissions reduction targets.")
-                            with st.expander("View Suppliers Not Meeting Emissions Targets"):
-                                st.dataframe(not_met_emissions[['supplier_name', 'emissions_target_met']], use_container_width=True, hide_index=True)
+            with col_esg2:
+                # Supplier ESG Compliance (requires new columns in supplier_dummy_data.csv)
+                if supplier_kpis["suppliers"] and 'esg_compliance_score' in supplier_columns:
+                    try:
+                        low_esg_score = COPILOT_RULES["low_esg_suppliers"].threshold
+                        if insights["low_esg_suppliers"]:
+                            st.warning(f"**Sustainability Watch:** {len(insights['low_esg_suppliers'])} suppliers have an ESG compliance score below {low_esg_score}.")
+                            with st.expander("View Suppliers with Low ESG Scores"):
+                                show_alert_rows(SUPPLIER_DUMMY_DATA_FILE, supplier_columns, insights["low_esg_suppliers"],
+                                                ['supplier_name', 'esg_compliance_score', 'certification'])
                         else:
-                            st.success("All suppliers are meeting their emissions reduction targets.")
+                            st.success(f"All suppliers currently meet the ESG compliance score target of {low_esg_score}.")
+
+                        # Example: Suppliers not meeting emissions target
+                        if 'emissions_target_met' in supplier_columns:
+                            if insights["emissions_missed"]:
+                                st.warning(f"**Environmental Focus:** {len(insights['emissions_missed'])} suppliers have not met their emissions reduction targets.")
+                                with st.expander("View Suppliers Not Meeting Emissions Targets"):
+                                    show_alert_rows(SUPPLIER_DUMMY_DATA_FILE, supplier_columns, insights["emissions_missed"],
+                                                    ['supplier_name', 'emissions_target_met'])
+                            else:
+                                st.success("All suppliers are meeting their emissions reduction targets.")
+
+                    except Exception as e:
+                        st.error(f"Error checking supplier ESG compliance: {e}")
+                else:
+                    st.info("No supplier ESG data available. Add 'esg_compliance_score' and 'emissions_target_met' to supplier records.")
 
-                except Exception as e:
-                    st.error(f"Error checking supplier ESG compliance: {e}")
-            else:
-                st.info("No supplier ESG data available. Add 'esg_compliance_score' and 'emissions_target_met' to supplier records.")
+            # --- Gamification - Badges for Suppliers ---
+            st.markdown("---")
+            st.subheader("🏅 Supplier Recognition & Gamification")
+            st.markdown("Recognize and reward your suppliers for outstanding performance.")
 
-        # --- Gamification - Badges for Suppliers ---
-        st.markdown("---")
-        st.subheader("🏅 Supplier Recognition & Gamification")
-        st.markdown("Recognize and reward your suppliers for outstanding performance.")
+            if not supplier_df.empty:
+                # Badge holders are kept as bitsets in the KPI view, updated by each supplier write
+                badge_counts = supplier_kpis["badges"]
 
-        if not supplier_df.empty:
-            gamified_suppliers = supplier_df.copy()
+                st.markdown("### Supplier Badges Overview")
+                supplier_count = supplier_kpis["suppliers"]
+                col_badges1, col_badges2, col_badges3, col_badges4 = st.columns(4)
+                with col_badges1:
+                    st.metric("OTD Champions", f"{badge_counts['OTD Champion 🏆']} / {supplier_count}", help=f"Suppliers with On-Time Delivery Rate >= {OTD_CHAMPION_RATE}%")
+                with col_badges2:
+                    st.metric("Quality Stars", f"{badge_counts['Quality Star ⭐']} / {supplier_count}", help=f"Suppliers with Quality Reject Rate <= {QUALITY_STAR_REJECT_RATE}%")
+                with col_badges3:
+                    st.metric("Audit Excellence", f"{badge_counts['Audit Excellence 💯']} / {supplier_count}", help=f"Suppliers with Last Audit Score of {PERFECT_AUDIT_SCORE}")
+                with col_badges4:
+                    st.metric("Low Risk Partners", f"{badge_counts['Low Risk Partner ✅']} / {supplier_count}", help=f"Suppliers categorized as 'Low' risk")
 
-            # Define badge criteria and apply
-            # Badge 1: On-Time Delivery Champion
-            otd_threshold = 98.0
-            gamified_suppliers['OTD Champion 🏆'] = gamified_suppliers['on_time_delivery_rate'] >= otd_threshold
 
-            # Badge 2: Zero Quality Deviations
-            reject_threshold = 0.1 # Very low reject rate for 'zero'
-            gamified_suppliers['Quality Star ⭐'] = gamified_suppliers['quality_reject_rate'] <= reject_threshold
+                st.markdown("### Detailed Supplier Badge Status")
+                # Select columns to display for gamification summary; each page gets its badge columns from the bitsets
+                badge_display_cols = ['supplier_id', 'supplier_name', 'on_time_delivery_rate', 'quality_reject_rate', 'last_audit_score', 'risk_level']
 
-            # Badge 3: Perfect Audit Score (assuming 100 is perfect)
-            perfect_audit_score = 100
-            gamified_suppliers['Audit Excellence 💯'] = gamified_suppliers['last_audit_score'] == perfect_audit_score
+                paged_dataframe(supplier_df[badge_display_cols], key="badge_table",
+                                decorate=lambda page_df: supplier_badge_flags(supplier_kpis, page_df))
+
+                st.markdown("---")
+                st.markdown("#### Send a Recognition!")
+                selected_supplier_name = st.selectbox("Select a supplier to recognize:", [''] + supplier_df['supplier_name'].tolist(), key="recognize_supplier_select", persist_state="session")
+                if selected_supplier_name:
+                    recognition_message = st.text_area(f"Enter recognition message for {selected_supplier_name}:", key="recognition_message_text", persist_state="session")
+                    if st.button("Send Recognition Message", key="send_recognition_btn"):
+                        if recognition_message:
+                            notification_id = allocate_id(NOTIFICATIONS_FILE, "NOTIF")
+                            new_notification = pd.DataFrame([{
+                                "notification_id": notification_id,
+                                "sender_role": user_role,
+                                "recipient_role": selected_supplier_name, # Assuming recipient_role can be a specific supplier
+                                "subject": f"Recognition for Excellence - {selected_supplier_name}",
+                                "message": recognition_message,
+                                "timestamp": datetime.now().isoformat(),
+                                "status": "Sent",
+                                "parent_notification_id": None
+                            }])
+                            append_data(NOTIFICATIONS_FILE, new_notification)
+                            st.session_state.notifications_df = load_data(NOTIFICATIONS_FILE, columns=notification_columns) # Reload
+                            st.success(f"Recognition message sent to {selected_supplier_name}!")
+                            # Clear message area after sending (requires a small workaround for st.text_area)
+                            # st.session_state.recognition_message_text = "" # This might not clear immediately
+                        else:
+                            st.warning("Please enter a recognition message.")
+            else:
+                st.info("No supplier data available to apply gamification.")
 
-            # Badge 4: Low Risk Partner
-            gamified_suppliers['Low Risk Partner ✅'] = gamified_suppliers['risk_level'] == 'Low'
+            st.markdown("---")
+            st.subheader("Supplier Performance & Financial Overview")
+            # Removed search bar here
+            if not supplier_df.empty:
+                paged_dataframe(supplier_df, "supplier_overview_table")
+            else:
+                st.info("No supplier data available. Please add new suppliers in '👥 Supplier Records'.")
 
-            st.markdown("### Supplier Badges Overview")
-            col_badges1, col_badges2, col_badges3, col_badges4 = st.columns(4)
-            with col_badges1:
-                st.metric("OTD Champions", f"{gamified_suppliers['OTD Champion 🏆'].sum()} / {len(gamified_suppliers)}", help=f"Suppliers with On-Time Delivery Rate >= {otd_threshold}%")
-            with col_badges2:
-                st.metric("Quality Stars", f"{gamified_suppliers['Quality Star ⭐'].sum()} / {len(gamified_suppliers)}", help=f"Suppliers with Quality Reject Rate <= {reject_threshold}%")
-            with col_badges3:
-                st.metric("Audit Excellence", f"{gamified_suppliers['Audit Excellence 💯'].sum()} / {len(gamified_suppliers)}", help=f"Suppliers with Last Audit Score of {perfect_audit_score}")
-            with col_badges4:
-                st.metric("Low Risk Partners", f"{gamified_suppliers['Low Risk Partner ✅'].sum()} / {len(gamified_suppliers)}", help=f"Suppliers categorized as 'Low' risk")
 
+            with st.container():
+                col_sup1, col_sup2 = st.columns(2)
 
-            st.markdown("### Detailed Supplier Badge Status")
-            # Select columns to display for gamification summary
-            badge_display_cols = ['supplier_name', 'on_time_delivery_rate', 'quality_reject_rate', 'last_audit_score', 'risk_level',
-                                  'OTD Champion 🏆', 'Quality Star ⭐', 'Audit Excellence 💯', 'Low Risk Partner ✅']
+                with col_sup1:
+                    st.markdown("#### 🤝 Supplier Agreement Status")
+                    if supplier_kpis["suppliers"] and 'agreement_status' in supplier_columns:
+                        fig_status = charts.pie(SUPPLIER_DUMMY_DATA_FILE, supplier_kpis.version, supplier_kpis["agreement_statuses"], 'Status',
+                                                'Distribution of Supplier Agreement Status', CHART_THEME)
+                        st.plotly_chart(fig_status, use_container_width=True)
+                    else:
+                        st.info("No supplier data to show agreement status.")
+
+                with col_sup2:
+                    st.markdown("#### 💯 Last Audit Score Distribution")
+                    if not supplier_df.empty and 'last_audit_score' in supplier_df.columns:
+                        # Binned on the server: the browser gets ten bars, not one point per supplier
+                        fig_audit_dist = charts.histogram(supplier_df, 'last_audit_score', 10,
+                                                          'Distribution of Last Audit Scores', 'Audit Score', '#1890FF', CHART_THEME)
+                        st.plotly_chart(fig_audit_dist, use_container_width=True)
+                    else:
+                        st.info("No supplier data to show audit score distribution.")
 
-            st.dataframe(gamified_suppliers[badge_display_cols], use_container_width=True, hide_index=True)
+            st.markdown("---")
+            with st.container():
+                col_performance1, col_performance2 = st.columns(2)
+                with col_performance1:
+                    st.markdown("#### 🚚 Average On-Time Delivery Rate")
+                    avg_delivery = supplier_kpis["avg_on_time_delivery"]
+                    if avg_delivery is not None:
+                        st.metric(label="Overall OTD Rate", value=f"{avg_delivery:.1f}%", delta="Excellent!" if avg_delivery >= 95 else "Needs Improvement" if avg_delivery < 90 else None)
+                        fig_otd = charts.box(supplier_df, 'on_time_delivery_rate',
+                                             'On-Time Delivery Rate Distribution', '#52C41A', CHART_THEME)
+                        st.plotly_chart(fig_otd, use_container_width=True)
+                    else:
+                        st.info("No on-time delivery data available.")
+
+                with col_performance2:
+                    st.markdown("#### 🔍 Average Quality Reject Rate")
+                    avg_reject = supplier_kpis["avg_quality_reject"]
+                    if avg_reject is not None:
+                        st.metric(label="Overall Reject Rate", value=f"{avg_reject:.2f}%", delta="Low" if avg_reject < 0.5 else "High" if avg_reject > 1.0 else None, delta_color="inverse")
+                        fig_reject = charts.box(supplier_df, 'quality_reject_rate',
+                                                'Quality Reject Rate Distribution', '#FF4D4F', CHART_THEME)
+                        st.plotly_chart(fig_reject, use_container_width=True)
+                    else:
+                        st.info("No quality reject rate data available.")
 
             st.markdown("---")
-            st.markdown("#### Send a Recognition!")
-            selected_supplier_name = st.selectbox("Select a supplier to recognize:", [''] + supplier_df['supplier_name'].tolist(), key="recognize_supplier_select")
-            if selected_supplier_name:
-                recognition_message = st.text_area(f"Enter recognition message for {selected_supplier_name}:", key="recognition_message_text")
-                if st.button("Send Recognition Message", key="send_recognition_btn"):
-                    if recognition_message:
-                        notification_id = "NOTIF" + str(len(st.session_state.notifications_df) + 1).zfill(4)
-                        new_notification = pd.DataFrame([{
-                            "notification_id": notification_id,
-                            "sender_role": user_role,
-                            "recipient_role": selected_supplier_name, # Assuming recipient_role can be a specific supplier
-                            "subject": f"Recognition for Excellence - {selected_supplier_name}",
-                            "message": recognition_message,
-                            "timestamp": datetime.now().isoformat(),
-                            "status": "Sent",
-                            "parent_notification_id": None
-                        }])
-                        append_data(NOTIFICATIONS_FILE, new_notification)
-                        st.session_state.notifications_df = load_data(NOTIFICATIONS_FILE, columns=notification_columns) # Reload
-                        st.success(f"Recognition message sent to {selected_supplier_name}!")
-                        # Clear message area after sending (requires a small workaround for st.text_area)
-                        # st.session_state.recognition_message_text = "" # This might not clear immediately
+            with st.container():
+                col_risk_spend = st.columns(2)
+                with col_risk_spend[0]:
+                    st.markdown("#### 🚨 Supplier Risk Level Distribution")
+                    if supplier_kpis["risk_levels"]:
+                        # Ensure consistent order for risk levels
+                        fig_risk = charts.pie(SUPPLIER_DUMMY_DATA_FILE, supplier_kpis.version, supplier_kpis["risk_levels"], 'Risk Level',
+                                              'Distribution of Supplier Risk Levels', CHART_THEME, order=["Low", "Medium", "High"],
+                                              color_map={'Low': '#52C41A', 'Medium': '#FAAD14', 'High': '#FF4D4F'})
+                        st.plotly_chart(fig_risk, use_container_width=True)
                     else:
-                        st.warning("Please enter a recognition message.")
-        else:
-            st.info("No supplier data available to apply gamification.")
+                        st.info("No supplier risk level data.")
+
+                with col_risk_spend[1]:
+                    st.markdown("#### 💰 Annual Spend by Primary Product Category")
+                    if supplier_kpis["spend_by_category"]:
+                        fig_spend = charts.bar(SUPPLIER_DUMMY_DATA_FILE, supplier_kpis.version, supplier_kpis["spend_by_category"],
+                                               'Product Category', 'Annual Spend (USD)', 'Total Annual Spend by Product Category (USD)', CHART_THEME)
+                        st.plotly_chart(fig_spend, use_container_width=True)
+                    else:
+                        st.info("No annual spend or product category data.")
 
-        st.markdown("---")
-        st.subheader("Supplier Performance & Financial Overview")
-        # Removed search bar here
-        if not supplier_df.empty:
-            st.dataframe(supplier_df, use_container_width=True, hide_index=True)
-        else:
-            st.info("No supplier data available. Please add new suppliers in '👥 Supplier Records'.")
-
-
-        with st.container():
-            col_sup1, col_sup2 = st.columns(2)
-
-            with col_sup1:
-                st.markdown("#### 🤝 Supplier Agreement Status")
-                if not supplier_df.empty and 'agreement_status' in supplier_df.columns:
-                    supplier_df['agreement_status'] = supplier_df['agreement_status'].fillna('Unknown').astype(str)
-                    status_counts = supplier_df['agreement_status'].value_counts().reset_index()
-                    status_counts.columns = ['Status', 'Count']
-                    fig_status = px.pie(status_counts, values='Count', names='Status',
-                                         title='Distribution of Supplier Agreement Status', hole=0.3,
-                                         template='plotly_dark') # Set dark theme for Plotly
-                    fig_status.update_traces(textposition='inside', textinfo='percent+label')
-                    fig_status.update_layout(showlegend=True, margin=dict(l=20, r=20, t=30, b=20), height=300)
-                    st.plotly_chart(fig_status, use_container_width=True)
-                else:
-                    st.info("No supplier data to show agreement status.")
-
-            with col_sup2:
-                st.markdown("#### 💯 Last Audit Score Distribution")
-                if not supplier_df.empty and 'last_audit_score' in supplier_df.columns:
-                    fig_audit_dist = px.histogram(supplier_df, x='last_audit_score', nbins=10,
-                                                  title='Distribution of Last Audit Scores',
-                                                  labels={'last_audit_score': 'Audit Score'},
-                                                  color_discrete_sequence=['#1890FF'],
-                                                  template='plotly_dark') # Set dark theme for Plotly
-                    fig_audit_dist.update_layout(bargap=0.1, margin=dict(l=20, r=20, t=30, b=20), height=300)
-                    st.plotly_chart(fig_audit_dist, use_container_width=True)
+            st.markdown("---")
+            with st.container():
+                st.markdown("#### 🧮 Composite Risk Score")
+                st.caption("0 (no risk) to 100, weighted from delivery, quality, audit, ESG, contract end and spend. Sort or filter suppliers by it in Supplier Records.")
+                avg_risk_score = supplier_kpis["avg_risk_score"]
+                if avg_risk_score is not None:
+                    col_score1, col_score2 = st.columns(2)
+                    with col_score1:
+                        st.metric("Average Risk Score", f"{avg_risk_score:.1f}")
+                        st.metric("High-Risk Suppliers", f"{supplier_kpis['high_risk_scores']} / {supplier_kpis['suppliers']}", help=f"Suppliers with a risk score of {HIGH_RISK_SCORE} or more")
+                        fig_risk_score = charts.histogram(supplier_df, risk.RISK_COLUMN, 10, 'Distribution of Risk Scores', 'Risk Score', '#FF4D4F', CHART_THEME)
+                        st.plotly_chart(fig_risk_score, use_container_width=True)
+                    with col_score2:
+                        st.markdown(f"##### Top {LEADERBOARD_SIZE} Highest-Risk Suppliers")
+                        show_leaderboard(supplier_kpis, "top_risk_score", ['supplier_name', risk.RISK_COLUMN, 'risk_level'])
                 else:
-                    st.info("No supplier data to show audit score distribution.")
+                    st.info("No supplier data to score.")
 
-        st.markdown("---")
-        with st.container():
-            col_performance1, col_performance2 = st.columns(2)
-            with col_performance1:
-                st.markdown("#### 🚚 Average On-Time Delivery Rate")
-                if not supplier_df.empty and 'on_time_delivery_rate' in supplier_df.columns:
-                    avg_delivery = supplier_df['on_time_delivery_rate'].mean()
-                    st.metric(label="Overall OTD Rate", value=f"{avg_delivery:.1f}%", delta="Excellent!" if avg_delivery >= 95 else "Needs Improvement" if avg_delivery < 90 else None)
-                    fig_otd = px.box(supplier_df, y='on_time_delivery_rate', title='On-Time Delivery Rate Distribution',
-                                     color_discrete_sequence=['#52C41A'],
-                                     template='plotly_dark') # Set dark theme for Plotly
-                    fig_otd.update_layout(margin=dict(l=20, r=20, t=30, b=20), height=250)
-                    st.plotly_chart(fig_otd, use_container_width=True)
-                else:
-                    st.info("No on-time delivery data available.")
-
-            with col_performance2:
-                st.markdown("#### 🔍 Average Quality Reject Rate")
-                if not supplier_df.empty and 'quality_reject_rate' in supplier_df.columns:
-                    avg_reject = supplier_df['quality_reject_rate'].mean()
-                    st.metric(label="Overall Reject Rate", value=f"{avg_reject:.2f}%", delta="Low" if avg_reject < 0.5 else "High" if avg_reject > 1.0 else None, delta_color="inverse")
-                    fig_reject = px.box(supplier_df, y='quality_reject_rate', title='Quality Reject Rate Distribution',
-                                         color_discrete_sequence=['#FF4D4F'],
-                                         template='plotly_dark') # Set dark theme for Plotly
-                    fig_reject.update_layout(margin=dict(l=20, r=20, t=30, b=20), height=250)
-                    st.plotly_chart(fig_reject, use_container_width=True)
+            st.markdown("---")
+            with st.container():
+                st.markdown("#### 📉 KPI Trends")
+                # Read from the KPI history store, downsampled to weekly or monthly points for longer periods
+                trend_period = st.selectbox("Period", list(TREND_PERIODS), index=1, key="trend_period", persist_state="session")
+                trend_days = TREND_PERIODS[trend_period]
+                trend_start = pd.Timestamp.today().normalize() - pd.Timedelta(days=trend_days) if trend_days else None
+                network_trend, trend_resolution = SUPPLIER_HISTORY.trend(trend_start)
+                if network_trend.empty:
+                    st.info("No KPI history yet. The supplier KPIs are recorded daily while the app runs.")
                 else:
-                    st.info("No quality reject rate data available.")
+                    st.caption("One point per daily snapshot of the supplier KPIs." if trend_resolution == "daily"
+                               else f"{trend_resolution.capitalize()} averages of the daily supplier KPI snapshots.")
+                    trend_name = ("network", trend_start, trend_resolution)
+                    col_trend1, col_trend2 = st.columns(2)
+                    with col_trend1:
+                        show_trend(network_trend, trend_name, {"on_time_delivery_rate": "On-Time Delivery"}, "Average On-Time Delivery Rate", "%")
+                        show_trend(network_trend, trend_name, {"annual_spend_usd total": "Annual Spend"}, "Total Annual Spend", "USD")
+                    with col_trend2:
+                        show_trend(network_trend, trend_name, {"quality_reject_rate": "Quality Reject Rate"}, "Average Quality Reject Rate", "%")
+                        show_trend(network_trend, trend_name, {f"risk_level: {level}": level for level in ["Low", "Medium", "High"]},
+                                   "Risk Mix", "Suppliers", area=True)
 
-        st.markdown("---")
-        with st.container():
-            col_risk_spend = st.columns(2)
-            with col_risk_spend[0]:
-                st.markdown("#### 🚨 Supplier Risk Level Distribution")
-                if not supplier_df.empty and 'risk_level' in supplier_df.columns:
-                    risk_counts = supplier_df['risk_level'].value_counts().reset_index()
-                    risk_counts.columns = ['Risk Level', 'Count']
-                    # Ensure consistent order for risk levels
-                    risk_order = ["Low", "Medium", "High"]
-                    risk_counts['Risk Level'] = pd.Categorical(risk_counts['Risk Level'], categories=risk_order, ordered=True)
-                    risk_counts = risk_counts.sort_values('Risk Level')
-
-                    fig_risk = px.pie(risk_counts, values='Count', names='Risk Level',
-                                      title='Distribution of Supplier Risk Levels', hole=0.3,
-                                      color='Risk Level',
-                                      color_discrete_map={'Low': '#52C41A', 'Medium': '#FAAD14', 'High': '#FF4D4F'},
-                                      template='plotly_dark') # Set dark theme for Plotly
-                    fig_risk.update_traces(textposition='inside', textinfo='percent+label')
-                    fig_risk.update_layout(showlegend=True, margin=dict(l=20, r=20, t=30, b=20), height=300)
-                    st.plotly_chart(fig_risk, use_container_width=True)
-                else:
-                    st.info("No supplier risk level data.")
-
-            with col_risk_spend[1]:
-                st.markdown("#### 💰 Annual Spend by Primary Product Category")
-                if not supplier_df.empty and 'annual_spend_usd' in supplier_df.columns and 'primary_product_category' in supplier_df.columns:
-                    spend_by_category = supplier_df.groupby('primary_product_category')['annual_spend_usd'].sum().reset_index()
-                    spend_by_category = spend_by_category.sort_values(by='annual_spend_usd', ascending=False)
-                    fig_spend = px.bar(spend_by_category, x='primary_product_category', y='annual_spend_usd',
-                                       title='Total Annual Spend by Product Category (USD)',
-                                       labels={'primary_product_category': 'Product Category', 'annual_spend_usd': 'Annual Spend (USD)'},
-                                       color_discrete_sequence=px.colors.qualitative.Plotly,
-                                       template='plotly_dark') # Set dark theme for Plotly
-                    fig_spend.update_layout(xaxis_title_text='Product Category', yaxis_title_text='Annual Spend (USD)',
-                                            margin=dict(l=20, r=20, t=30, b=20), height=300)
-                    st.plotly_chart(fig_spend, use_container_width=True)
-                else:
-                    st.info("No annual spend or product category data.")
+            st.markdown("---")
+            with st.container():
+                st.markdown("#### 📈 Key Supplier Rankings")
+                col_rank1, col_rank2 = st.columns(2)
+                # Leaderboards are maintained top-k lists in the KPI view; only their rows are fetched
+                with col_rank1:
+                    st.markdown(f"##### Top {LEADERBOARD_SIZE} Suppliers by Annual Spend")
+                    if supplier_kpis["suppliers"] and 'annual_spend_usd' in supplier_columns:
+                        show_leaderboard(supplier_kpis, "top_spend", ['supplier_name', 'annual_spend_usd', 'primary_product_category'])
+                    else:
+                        st.info("No supplier spend data to show top suppliers.")
 
-        st.markdown("---")
-        with st.container():
-            st.markdown("#### 📈 Key Supplier Rankings")
-            col_rank1, col_rank2 = st.columns(2)
-            with col_rank1:
-                st.markdown("##### Top 10 Suppliers by Annual Spend")
-                if not supplier_df.empty and 'annual_spend_usd' in supplier_df.columns:
-                    top_spend_suppliers = supplier_df.sort_values(by='annual_spend_usd', ascending=False).head(10)
-                    st.dataframe(top_spend_suppliers[['supplier_name', 'annual_spend_usd', 'primary_product_category']],
-                                 use_container_width=True, hide_index=True)
-                else:
-                    st.info("No supplier spend data to show top suppliers.")
-
-            with col_rank2:
-                st.markdown("##### Top 10 Suppliers by Audit Score")
-                if not supplier_df.empty and 'last_audit_score' in supplier_df.columns:
-                    top_suppliers = supplier_df.sort_values(by='last_audit_score', ascending=False).head(10)
-                    st.dataframe(top_suppliers[['supplier_name', 'last_audit_score', 'agreement_status']],
-                                 use_container_width=True, hide_index=True)
-                else:
-                    st.info("No supplier data to show top suppliers.")
+                with col_rank2:
+                    st.markdown(f"##### Top {LEADERBOARD_SIZE} Suppliers by Audit Score")
+                    if supplier_kpis["suppliers"] and 'last_audit_score' in supplier_columns:
+                        show_leaderboard(supplier_kpis, "top_audit_score", ['supplier_name', 'last_audit_score', 'agreement_status'])
+                    else:
+                        st.info("No supplier data to show top suppliers.")
 
-        st.markdown("---")
-        with st.container():
-            st.markdown("#### ⚠️ Critical Supplier Alerts")
-            col_alerts1, col_alerts2 = st.columns(2)
-            with col_alerts1:
-                st.markdown("##### Agreements Due for Renewal")
-                if not supplier_df.empty:
-                    pending_renewal = supplier_df[supplier_df['agreement_status'] == 'Pending Renewal']
-                    if not pending_renewal.empty:
-                        st.dataframe(pending_renewal[['supplier_name', 'contact_person', 'email', 'agreement_status']],
-                                     use_container_width=True, hide_index=True)
+                col_rank3, col_rank4 = st.columns(2)
+                with col_rank3:
+                    st.markdown(f"##### Top {LEADERBOARD_SIZE} Suppliers by On-Time Delivery")
+                    if supplier_kpis["suppliers"] and 'on_time_delivery_rate' in supplier_columns:
+                        show_leaderboard(supplier_kpis, "top_on_time_delivery", ['supplier_name', 'on_time_delivery_rate', 'risk_level'])
                     else:
-                        st.success("🎉 No supplier agreements are pending renewal.")
-                else:
-                    st.info("No supplier data to check for pending renewals.")
-
-            with col_alerts2:
-                st.markdown("##### Overdue Performance Reviews (> 1 Year)")
-                if not supplier_df.empty:
-                    supplier_df['last_performance_review_date'] = pd.to_datetime(supplier_df['last_performance_review_date'], errors='coerce')
-                    overdue_reviews = supplier_df[
-                        (current_date - supplier_df['last_performance_review_date']).dt.days > 365
-                    ]
-                    if not overdue_reviews.empty:
-                        st.warning(f"**Action Required:** {len(overdue_reviews)} supplier performance reviews are overdue.")
-                        st.dataframe(overdue_reviews[['supplier_name', 'contact_person', 'last_performance_review_date']],
-                                     use_container_width=True, hide_index=True)
+                        st.info("No supplier delivery data to show top suppliers.")
+
+                with col_rank4:
+                    st.markdown(f"##### Top {LEADERBOARD_SIZE} Suppliers by ESG Score")
+                    if supplier_kpis["suppliers"] and 'esg_compliance_score' in supplier_columns:
+                        show_leaderboard(supplier_kpis, "top_esg_score", ['supplier_name', 'esg_compliance_score', 'certification'])
                     else:
-                        st.success("All supplier performance reviews are up-to-date.")
-                else:
-                    st.info("No supplier data to check for overdue performance reviews.")
+                        st.info("No supplier ESG data to show top suppliers.")
+
+            st.markdown("---")
+            with st.container():
+                st.markdown("#### ⚠️ Critical Supplier Alerts")
+                col_alerts1, col_alerts2 = st.columns(2)
+                with col_alerts1:
+                    st.markdown("##### Agreements Due for Renewal")
+                    if supplier_kpis["suppliers"]:
+                        if insights["pending_renewals"]:
+                            show_alert_rows(SUPPLIER_DUMMY_DATA_FILE, supplier_columns, insights["pending_renewals"],
+                                            ['supplier_name', 'contact_person', 'email', 'agreement_status'])
+                        else:
+                            st.success("🎉 No supplier agreements are pending renewal.")
+                    else:
+                        st.info("No supplier data to check for pending renewals.")
+
+                with col_alerts2:
+                    st.markdown("##### Overdue Performance Reviews (> 1 Year)")
+                    if supplier_kpis["suppliers"]:
+                        overdue_review_ids = insights["overdue_reviews"]
+                        if overdue_review_ids:
+                            st.warning(f"**Action Required:** {len(overdue_review_ids)} supplier performance reviews are overdue.")
+                            show_alert_rows(SUPPLIER_DUMMY_DATA_FILE, supplier_columns, overdue_review_ids,
+                                            ['supplier_name', 'contact_person', 'last_performance_review_date'])
+                        else:
+                            st.success("All supplier performance reviews are up-to-date.")
+                    else:
+                        st.info("No supplier data to check for overdue performance reviews.")
 
 
 # --- Supplier Records Module ---
-with tabs[1]: # Corresponding to "👥 Supplier Records"
-    st.subheader("Manage Supplier Information")
-    st.markdown("Maintain a comprehensive database of all your OEM suppliers.")
-
-    supplier_df = load_data(SUPPLIER_DUMMY_DATA_FILE, columns=supplier_columns)
-
-    if user_role not in ["OEM"]:
-        st.warning("🔒 You must be logged in as 'OEM' to manage supplier records.")
-    else:
-        st.markdown("### Add New Supplier")
-        with st.form("new_supplier_form"):
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                new_supplier_name = st.text_input("Supplier Name", key="new_sup_name")
-                new_contact_person = st.text_input("Contact Person", key="new_sup_contact")
-                new_email = st.text_input("Email", key="new_sup_email")
-            with col2:
-                new_phone = st.text_input("Phone", key="new_sup_phone")
-                new_agreement_status = st.selectbox("Agreement Status", ["Active", "Pending Renewal", "Expired", "Under Review"], key="new_sup_agreement")
-                new_product_category = st.text_input("Primary Product Category", help="e.g., Electronics, Raw Materials, Assembly", key="new_sup_prod_cat")
-            with col3:
-                new_last_audit_score = st.number_input("Last Audit Score (0-100)", min_value=0, max_value=100, value=75, key="new_sup_audit_score")
-                new_on_time_delivery = st.number_input("On-Time Delivery Rate (%)", min_value=0.0, max_value=100.0, value=95.0, key="new_sup_otd")
-                new_quality_reject = st.number_input("Quality Reject Rate (%)", min_value=0.0, max_value=100.0, value=0.5, format="%.2f", key="new_sup_reject")
+if tabs[1].open: # Only the selected module runs; the others keep their widget state
+    with tabs[1], module_timer(tab_titles[1]): # Corresponding to "👥 Supplier Records"
+        st.subheader("Manage Supplier Information")
+        st.markdown("Maintain a comprehensive database of all your OEM suppliers.")
+
+        supplier_df = load_data(SUPPLIER_DUMMY_DATA_FILE, columns=supplier_columns)
+
+        if user_role not in ["OEM"]:
+            st.warning("🔒 You must be logged in as 'OEM' to manage supplier records.")
+        else:
+            st.markdown("### Add New Supplier")
+            with st.form("new_supplier_form"):
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    new_supplier_name = st.text_input("Supplier Name", key="new_sup_name")
+                    new_contact_person = st.text_input("Contact Person", key="new_sup_contact")
+                    new_email = st.text_input("Email", key="new_sup_email")
+                with col2:
+                    new_phone = st.text_input("Phone", key="new_sup_phone")
+                    new_agreement_status = st.selectbox("Agreement Status", ["Active", "Pending Renewal", "Expired", "Under Review"], key="new_sup_agreement")
+                    new_product_category = st.text_input("Primary Product Category", help="e.g., Electronics, Raw Materials, Assembly", key="new_sup_prod_cat")
+                with col3:
+                    new_last_audit_score = st.number_input("Last Audit Score (0-100)", min_value=0, max_value=100, value=75, key="new_sup_audit_score")
+                    new_on_time_delivery = st.number_input("On-Time Delivery Rate (%)", min_value=0.0, max_value=100.0, value=95.0, key="new_sup_otd")
+                    new_quality_reject = st.number_input("Quality Reject Rate (%)", min_value=0.0, max_value=100.0, value=0.5, format="%.2f", key="new_sup_reject")
             
-            # --- NEW: ESG Fields for Supplier ---
-            col_esg_sup1, col_esg_sup2 = st.columns(2)
-            with col_esg_sup1:
-                new_esg_score = st.number_input("ESG Compliance Score (0-100)", min_value=0, max_value=100, value=70, key="new_sup_esg_score")
-            with col_esg_sup2:
-                new_emissions_target_met = st.checkbox("Met Emissions Reduction Target?", value=False, key="new_sup_emissions_met")
-
-            new_risk_level = st.selectbox("Risk Level", ["Low", "Medium", "High"], key="new_sup_risk")
-            new_certification = st.text_input("Certifications (e.g., ISO 9001)", key="new_sup_cert")
-            new_annual_spend = st.number_input("Annual Spend (USD)", min_value=0, value=100000, key="new_sup_annual_spend")
-            new_notes = st.text_area("Notes", key="new_sup_notes")
-            new_last_performance_review_date = st.date_input("Last Performance Review Date", value=datetime.today() - timedelta(days=90), key="new_sup_perf_date")
-
-            submit_supplier = st.form_submit_button("Add Supplier")
-
-            if submit_supplier:
-                if new_supplier_name and new_contact_person and new_email:
-                    supplier_id = "SUP" + str(len(supplier_df) + 1).zfill(4)
-                    new_entry = pd.DataFrame([{
-                        "supplier_id": supplier_id,
-                        "supplier_name": new_supplier_name,
-                        "contact_person": new_contact_person,
-                        "email": new_email,
-                        "phone": new_phone,
-                        "agreement_status": new_agreement_status,
-                        "last_audit_score": new_last_audit_score,
-                        "notes": new_notes,
-                        "primary_product_category": new_product_category,
-                        "on_time_delivery_rate": new_on_time_delivery,
-                        "quality_reject_rate": new_quality_reject,
-                        "risk_level": new_risk_level,
-                        "certification": new_certification,
-                        "annual_spend_usd": new_annual_spend,
-                        "last_performance_review_date": new_last_performance_review_date.isoformat(),
-                        "esg_compliance_score": new_esg_score, # NEW
-                        "emissions_target_met": new_emissions_target_met # NEW
-                    }])
-                    append_data(SUPPLIER_DUMMY_DATA_FILE, new_entry)
-                    st.success(f"Supplier '{new_supplier_name}' added successfully!")
-                    st.rerun()
-                else:
-                    st.error("Please fill in all required fields: Supplier Name, Contact Person, Email.")
+                # --- NEW: ESG Fields for Supplier ---
+                col_esg_sup1, col_esg_sup2 = st.columns(2)
+                with col_esg_sup1:
+                    new_esg_score = st.number_input("ESG Compliance Score (0-100)", min_value=0, max_value=100, value=70, key="new_sup_esg_score")
+                with col_esg_sup2:
+                    new_emissions_target_met = st.checkbox("Met Emissions Reduction Target?", value=False, key="new_sup_emissions_met")
+
+                new_risk_level = st.selectbox("Risk Level", ["Low", "Medium", "High"], key="new_sup_risk")
+                new_certification = st.text_input("Certifications (e.g., ISO 9001)", key="new_sup_cert")
+                new_annual_spend = st.number_input("Annual Spend (USD)", min_value=0, value=100000, key="new_sup_annual_spend")
+                new_notes = st.text_area("Notes", key="new_sup_notes")
+                new_last_performance_review_date = st.date_input("Last Performance Review Date", value=datetime.today() - timedelta(days=90), key="new_sup_perf_date")
+
+                submit_supplier = st.form_submit_button("Add Supplier")
+
+                if submit_supplier:
+                    if new_supplier_name and new_contact_person and new_email:
+                        supplier_id = allocate_id(SUPPLIER_DUMMY_DATA_FILE, "SUP")
+                        new_entry = pd.DataFrame([{
+                            "supplier_id": supplier_id,
+                            "supplier_name": new_supplier_name,
+                            "contact_person": new_contact_person,
+                            "email": new_email,
+                            "phone": new_phone,
+                            "agreement_status": new_agreement_status,
+                            "last_audit_score": new_last_audit_score,
+                            "notes": new_notes,
+                            "primary_product_category": new_product_category,
+                            "on_time_delivery_rate": new_on_time_delivery,
+                            "quality_reject_rate": new_quality_reject,
+                            "risk_level": new_risk_level,
+                            "certification": new_certification,
+                            "annual_spend_usd": new_annual_spend,
+                            "last_performance_review_date": new_last_performance_review_date.isoformat(),
+                            "esg_compliance_score": new_esg_score, # NEW
+                            "emissions_target_met": new_emissions_target_met # NEW
+                        }])
+                        append_data(SUPPLIER_DUMMY_DATA_FILE, new_entry)
+                        st.success(f"Supplier '{new_supplier_name}' added successfully!")
+                        st.rerun()
+                    else:
+                        st.error("Please fill in all required fields: Supplier Name, Contact Person, Email.")
 
-        st.markdown("### Existing Suppliers")
+            st.markdown("### Existing Suppliers")
         
-        # Apply search and filter to supplier data
-        display_supplier_df = apply_search_and_filter(supplier_df, "supplier_search", "supplier_advanced_search")
-
-        if not display_supplier_df.empty:
-            st.dataframe(display_supplier_df, use_container_width=True, hide_index=True)
-
-            selected_supplier_id = st.selectbox("Select Supplier ID to Edit/Delete", [''] + display_supplier_df['supplier_id'].tolist(), key="select_supplier_edit_del")
-
-            if selected_supplier_id:
-                selected_supplier = supplier_df[supplier_df['supplier_id'] == selected_supplier_id].iloc[0]
-                st.markdown(f"#### Edit Supplier: {selected_supplier['supplier_name']}")
-                with st.form("edit_supplier_form"):
-                    col1_edit, col2_edit, col3_edit = st.columns(3)
-                    with col1_edit:
-                        edit_supplier_name = st.text_input("Supplier Name", value=selected_supplier['supplier_name'], key="edit_sup_name")
-                        edit_contact_person = st.text_input("Contact Person", value=selected_supplier['contact_person'], key="edit_sup_contact")
-                        edit_email = st.text_input("Email", value=selected_supplier['email'], key="edit_sup_email")
-                    with col2_edit:
-                        edit_phone = st.text_input("Phone", value=selected_supplier['phone'], key="edit_sup_phone")
-                        edit_agreement_status = st.selectbox("Agreement Status", ["Active", "Pending Renewal", "Expired", "Under Review"], index=["Active", "Pending Renewal", "Expired", "Under Review"].index(selected_supplier['agreement_status']), key="edit_sup_agreement")
-                        edit_product_category = st.text_input("Primary Product Category", value=selected_supplier['primary_product_category'], key="edit_sup_prod_cat")
-                    with col3_edit:
-                        edit_last_audit_score = st.number_input("Last Audit Score (0-100)", min_value=0, max_value=100, value=int(selected_supplier['last_audit_score']), key="edit_sup_audit_score")
-                        edit_on_time_delivery = st.number_input("On-Time Delivery Rate (%)", min_value=0.0, max_value=100.0, value=float(selected_supplier['on_time_delivery_rate']), format="%.2f", key="edit_sup_otd")
-                        edit_quality_reject = st.number_input("Quality Reject Rate (%)", min_value=0.0, max_value=100.0, value=float(selected_supplier['quality_reject_rate']), format="%.2f", key="edit_sup_reject")
+            # Apply search and filter to supplier data
+            display_supplier_df = apply_search_and_filter(supplier_df, "supplier_search", "supplier_advanced_search",
+                                                          fuzzy_columns=["supplier_name", "contact_person", "email", "account_manager"])
+
+            if not display_supplier_df.empty:
+                paged_dataframe(display_supplier_df, "supplier_table", decorate=beside_risk_level)
+
+                selected_supplier_id = st.selectbox("Select Supplier ID to Edit/Delete", [''] + display_supplier_df['supplier_id'].tolist(), key="select_supplier_edit_del", persist_state="session")
+
+                if selected_supplier_id:
+                    selected_supplier = supplier_df[supplier_df['supplier_id'] == selected_supplier_id].iloc[0]
+                    st.markdown(f"#### Supplier 360: {selected_supplier['supplier_name']}")
+                    supplier_360_panel(selected_supplier)
+                    st.markdown(f"#### Edit Supplier: {selected_supplier['supplier_name']}")
+                    with st.form("edit_supplier_form"):
+                        col1_edit, col2_edit, col3_edit = st.columns(3)
+                        with col1_edit:
+                            edit_supplier_name = st.text_input("Supplier Name", value=selected_supplier['supplier_name'], key="edit_sup_name")
+                            edit_contact_person = st.text_input("Contact Person", value=selected_supplier['contact_person'], key="edit_sup_contact")
+                            edit_email = st.text_input("Email", value=selected_supplier['email'], key="edit_sup_email")
+                        with col2_edit:
+                            edit_phone = st.text_input("Phone", value=selected_supplier['phone'], key="edit_sup_phone")
+                            edit_agreement_status = st.selectbox("Agreement Status", ["Active", "Pending Renewal", "Expired", "Under Review"], index=["Active", "Pending Renewal", "Expired", "Under Review"].index(selected_supplier['agreement_status']), key="edit_sup_agreement")
+                            edit_product_category = st.text_input("Primary Product Category", value=selected_supplier['primary_product_category'], key="edit_sup_prod_cat")
+                        with col3_edit:
+                            edit_last_audit_score = st.number_input("Last Audit Score (0-100)", min_value=0, max_value=100, value=whole_number(selected_supplier['last_audit_score']), key="edit_sup_audit_score")
+                            edit_on_time_delivery = st.number_input("On-Time Delivery Rate (%)", min_value=0.0, max_value=100.0, value=float(selected_supplier['on_time_delivery_rate']), format="%.2f", key="edit_sup_otd")
+                            edit_quality_reject = st.number_input("Quality Reject Rate (%)", min_value=0.0, max_value=100.0, value=float(selected_supplier['quality_reject_rate']), format="%.2f", key="edit_sup_reject")
                     
-                    # --- NEW: ESG Fields for Supplier Editing ---
-                    col_esg_sup1_edit, col_esg_sup2_edit = st.columns(2)
-                    with col_esg_sup1_edit:
-                        edit_esg_score = st.number_input("ESG Compliance Score (0-100)", min_value=0, max_value=100, value=int(selected_supplier['esg_compliance_score']), key="edit_sup_esg_score")
-                    with col_esg_sup2_edit:
-                        edit_emissions_target_met = st.checkbox("Met Emissions Reduction Target?", value=bool(selected_supplier['emissions_target_met']), key="edit_sup_emissions_met")
-
-                    edit_risk_level = st.selectbox("Risk Level", ["Low", "Medium", "High"], index=["Low", "Medium", "High"].index(selected_supplier['risk_level']), key="edit_sup_risk")
-                    edit_certification = st.text_input("Certifications (e.g., ISO 9001)", value=selected_supplier['certification'], key="edit_sup_cert")
-                    edit_annual_spend = st.number_input("Annual Spend (USD)", min_value=0, value=int(selected_supplier['annual_spend_usd']), key="edit_sup_annual_spend")
-                    edit_notes = st.text_area("Notes", value=selected_supplier['notes'], key="edit_sup_notes")
+                        # --- NEW: ESG Fields for Supplier Editing ---
+                        col_esg_sup1_edit, col_esg_sup2_edit = st.columns(2)
+                        with col_esg_sup1_edit:
+                            edit_esg_score = st.number_input("ESG Compliance Score (0-100)", min_value=0, max_value=100, value=whole_number(selected_supplier['esg_compliance_score']), key="edit_sup_esg_score")
+                        with col_esg_sup2_edit:
+                            edit_emissions_target_met = st.checkbox("Met Emissions Reduction Target?", value=is_checked(selected_supplier['emissions_target_met']), key="edit_sup_emissions_met")
+
+                        edit_risk_level = st.selectbox("Risk Level", ["Low", "Medium", "High"], index=["Low", "Medium", "High"].index(selected_supplier['risk_level']), key="edit_sup_risk")
+                        edit_certification = st.text_input("Certifications (e.g., ISO 9001)", value=selected_supplier['certification'], key="edit_sup_cert")
+                        edit_annual_spend = st.number_input("Annual Spend (USD)", min_value=0, value=whole_number(selected_supplier['annual_spend_usd']), key="edit_sup_annual_spend")
+                        edit_notes = st.text_area("Notes", value=selected_supplier['notes'], key="edit_sup_notes")
                     
-                    # Handle potential NaT for date input
-                    try:
-                        default_date = datetime.strptime(str(selected_supplier['last_performance_review_date']), '%Y-%m-%d').date()
-                    except (ValueError, TypeError):
-                        default_date = datetime.today().date()
-                    edit_last_performance_review_date = st.date_input("Last Performance Review Date", value=default_date, key="edit_sup_perf_date")
-
-                    update_supplier_btn = st.form_submit_button("Update Supplier")
-                    delete_supplier_btn = st.form_submit_button("Delete Supplier")
-
-                    if update_supplier_btn:
-                        idx = supplier_df[supplier_df['supplier_id'] == selected_supplier_id].index[0]
-                        supplier_df.loc[idx] = {
-                            "supplier_id": selected_supplier_id,
-                            "supplier_name": edit_supplier_name,
-                            "contact_person": edit_contact_person,
-                            "email": edit_email,
-                            "phone": edit_phone,
-                            "agreement_status": edit_agreement_status,
-                            "last_audit_score": edit_last_audit_score,
-                            "notes": edit_notes,
-                            "primary_product_category": edit_product_category,
-                            "on_time_delivery_rate": edit_on_time_delivery,
-                            "quality_reject_rate": edit_quality_reject,
-                            "risk_level": edit_risk_level,
-                            "certification": edit_certification,
-                            "annual_spend_usd": edit_annual_spend,
-                            "last_performance_review_date": edit_last_performance_review_date.isoformat(),
-                            "esg_compliance_score": edit_esg_score, # NEW
-                            "emissions_target_met": edit_emissions_target_met # NEW
-                        }
-                        update_data(SUPPLIER_DUMMY_DATA_FILE, supplier_df)
-                        st.success(f"Supplier '{edit_supplier_name}' updated successfully!")
-                        st.rerun()
+                        # Handle potential NaT for date input
+                        default_date = date_or_today(selected_supplier['last_performance_review_date'])
+                        edit_last_performance_review_date = st.date_input("Last Performance Review Date", value=default_date, key="edit_sup_perf_date")
+
+                        update_supplier_btn = st.form_submit_button("Update Supplier")
+                        delete_supplier_btn = st.form_submit_button("Delete Supplier")
+                        form_base_row("edit_supplier_form", selected_supplier, update_supplier_btn or delete_supplier_btn)
+
+                        if update_supplier_btn:
+                            if save_row_change(SUPPLIER_DUMMY_DATA_FILE, selected_supplier_id, "edit_supplier_form", {
+                                "supplier_name": edit_supplier_name,
+                                "contact_person": edit_contact_person,
+                                "email": edit_email,
+                                "phone": edit_phone,
+                                "agreement_status": edit_agreement_status,
+                                "last_audit_score": edit_last_audit_score,
+                                "notes": edit_notes,
+                                "primary_product_category": edit_product_category,
+                                "on_time_delivery_rate": edit_on_time_delivery,
+                                "quality_reject_rate": edit_quality_reject,
+                                "risk_level": edit_risk_level,
+                                "certification": edit_certification,
+                                "annual_spend_usd": edit_annual_spend,
+                                "last_performance_review_date": edit_last_performance_review_date.isoformat(),
+                                "esg_compliance_score": edit_esg_score, # NEW
+                                "emissions_target_met": edit_emissions_target_met # NEW
+                            }):
+                                st.success(f"Supplier '{edit_supplier_name}' updated successfully!")
+                                st.rerun()
                     
-                    if delete_supplier_btn:
-                        supplier_df = supplier_df[supplier_df['supplier_id'] != selected_supplier_id]
-                        update_data(SUPPLIER_DUMMY_DATA_FILE, supplier_df)
-                        st.warning(f"Supplier '{selected_supplier['supplier_name']}' deleted.")
-                        st.rerun()
-        else:
-            st.info("No suppliers added yet.")
+                        if delete_supplier_btn:
+                            if save_row_change(SUPPLIER_DUMMY_DATA_FILE, selected_supplier_id, "edit_supplier_form"):
+                                st.warning(f"Supplier '{selected_supplier['supplier_name']}' deleted.")
+                                st.rerun()
+            else:
+                st.info("No suppliers added yet.")
 
 
 # --- Asset Management Module ---
-with tabs[2]: # Corresponding to "🛠️ Asset Management"
-    st.subheader("Asset Management")
-    st.markdown("Track and manage physical assets used by OEM and suppliers.")
+if tabs[2].open: # Only the selected module runs; the others keep their widget state
+    with tabs[2], module_timer(tab_titles[2]): # Corresponding to "🛠️ Asset Management"
+        st.subheader("Asset Management")
+        st.markdown("Track and manage physical assets used by OEM and suppliers.")
 
-    assets_df = load_data(ASSETS_FILE, columns=asset_columns)
+        assets_df = load_data(ASSETS_FILE, columns=asset_columns)
     
-    if user_role not in ["OEM", "Supplier A", "Supplier B"]:
-        st.warning("🔒 You must be logged in as 'OEM' or a 'Supplier' to manage assets.")
-    else:
-        st.markdown("### Add New Asset")
-        with st.form("new_asset_form"):
-            col_a1, col_a2 = st.columns(2)
-            with col_a1:
-                new_asset_name = st.text_input("Asset Name", key="new_asset_name")
-                new_location = st.text_input("Location", key="new_asset_location")
-                new_status = st.selectbox("Status", ["Operational", "Under Maintenance", "Retired", "Idle"], key="new_asset_status")
-                new_supplier = st.text_input("Associated Supplier (Optional)", help="e.g., Supplier A, Supplier B, or OEM", key="new_asset_supplier")
-            with col_a2:
-                new_eol_date = st.date_input("End of Life Date", value=datetime.today() + timedelta(days=365*5), key="new_asset_eol")
-                new_calibration_date = st.date_input("Last Calibration Date", value=datetime.today(), key="new_asset_calibration")
-                # --- NEW: last_active_date for AI Co-pilot ---
-                new_last_active_date = st.date_input("Last Active Date", value=datetime.today(), help="When was this asset last actively used?", key="new_asset_last_active")
-                new_notes = st.text_area("Notes", key="new_asset_notes")
-
-            submit_asset = st.form_submit_button("Add Asset")
-
-            if submit_asset:
-                if new_asset_name and new_location:
-                    asset_id = "AST" + str(len(assets_df) + 1).zfill(4)
-                    new_entry = pd.DataFrame([{
-                        "asset_id": asset_id,
-                        "asset_name": new_asset_name,
-                        "location": new_location,
-                        "status": new_status,
-                        "eol_date": new_eol_date.isoformat(),
-                        "calibration_date": new_calibration_date.isoformat(),
-                        "notes": new_notes,
-                        "supplier": new_supplier,
-                        "last_active_date": new_last_active_date.isoformat() # NEW
-                    }])
-                    append_data(ASSETS_FILE, new_entry)
-                    st.success(f"Asset '{new_asset_name}' added successfully!")
-                    st.rerun()
-                else:
-                    st.error("Please fill in Asset Name and Location.")
+        if user_role not in ["OEM", "Supplier A", "Supplier B"]:
+            st.warning("🔒 You must be logged in as 'OEM' or a 'Supplier' to manage assets.")
+        else:
+            st.markdown("### Add New Asset")
+            with st.form("new_asset_form"):
+                col_a1, col_a2 = st.columns(2)
+                with col_a1:
+                    new_asset_name = st.text_input("Asset Name", key="new_asset_name")
+                    new_location = st.text_input("Location", key="new_asset_location")
+                    new_status = st.selectbox("Status", ["Operational", "Under Maintenance", "Retired", "Idle"], key="new_asset_status")
+                    new_supplier = st.text_input("Associated Supplier (Optional)", help="e.g., Supplier A, Supplier B, or OEM", key="new_asset_supplier")
+                with col_a2:
+                    new_eol_date = st.date_input("End of Life Date", value=datetime.today() + timedelta(days=365*5), key="new_asset_eol")
+                    new_calibration_date = st.date_input("Last Calibration Date", value=datetime.today(), key="new_asset_calibration")
+                    # --- NEW: last_active_date for AI Co-pilot ---
+                    new_last_active_date = st.date_input("Last Active Date", value=datetime.today(), help="When was this asset last actively used?", key="new_asset_last_active")
+                    new_notes = st.text_area("Notes", key="new_asset_notes")
+
+                submit_asset = st.form_submit_button("Add Asset")
+
+                if submit_asset:
+                    if new_asset_name and new_location:
+                        asset_id = allocate_id(ASSETS_FILE, "AST")
+                        new_entry = pd.DataFrame([{
+                            "asset_id": asset_id,
+                            "asset_name": new_asset_name,
+                            "location": new_location,
+                            "status": new_status,
+                            "eol_date": new_eol_date.isoformat(),
+                            "calibration_date": new_calibration_date.isoformat(),
+                            "notes": new_notes,
+                            "supplier": new_supplier,
+                            "last_active_date": new_last_active_date.isoformat() # NEW
+                        }])
+                        append_data(ASSETS_FILE, new_entry)
+                        st.success(f"Asset '{new_asset_name}' added successfully!")
+                        st.rerun()
+                    else:
+                        st.error("Please fill in Asset Name and Location.")
         
-        st.markdown("### Existing Assets")
+            st.markdown("### Existing Assets")
         
-        # Filter assets for non-OEM users
-        if user_role == "OEM":
-            display_assets_df = assets_df
-        elif user_role in ["Supplier A", "Supplier B"]:
-            display_assets_df = assets_df[assets_df['supplier'] == user_role]
-            if display_assets_df.empty:
-                st.info(f"No assets found for {user_role}.")
-        else: # For Auditor, etc. just show all but no edit/delete
-            display_assets_df = assets_df
-
-        # Apply search and filter to asset data
-        display_assets_df = apply_search_and_filter(display_assets_df, "asset_search", "asset_advanced_search")
-
-        if not display_assets_df.empty:
-            st.dataframe(display_assets_df, use_container_width=True, hide_index=True)
-
-            if user_role in ["OEM", "Supplier A", "Supplier B"]: # Only allow editing/deleting for OEM or the specific supplier
-                selected_asset_id = st.selectbox("Select Asset ID to Edit/Delete", [''] + display_assets_df['asset_id'].tolist(), key="select_asset_edit_del")
-
-                if selected_asset_id:
-                    selected_asset = assets_df[assets_df['asset_id'] == selected_asset_id].iloc[0]
+            # Filter assets for non-OEM users
+            if user_role == "OEM":
+                display_assets_df = assets_df
+            elif user_role in ["Supplier A", "Supplier B"]:
+                display_assets_df = assets_df[assets_df['supplier'] == user_role]
+                if display_assets_df.empty:
+                    st.info(f"No assets found for {user_role}.")
+            else: # For Auditor, etc. just show all but no edit/delete
+                display_assets_df = assets_df
+
+            # Apply search and filter to asset data
+            display_assets_df = apply_search_and_filter(display_assets_df, "asset_search", "asset_advanced_search")
+
+            if not display_assets_df.empty:
+                paged_dataframe(display_assets_df, "asset_table")
+
+                if user_role in ["OEM", "Supplier A", "Supplier B"]: # Only allow editing/deleting for OEM or the specific supplier
+                    selected_asset_id = st.selectbox("Select Asset ID to Edit/Delete", [''] + display_assets_df['asset_id'].tolist(), key="select_asset_edit_del", persist_state="session")
+
+                    if selected_asset_id:
+                        selected_asset = assets_df[assets_df['asset_id'] == selected_asset_id].iloc[0]
                     
-                    # Check if the asset belongs to the logged-in supplier, if applicable
-                    if user_role != "OEM" and selected_asset['supplier'] != user_role:
-                        st.warning(f"You ({user_role}) do not have permission to edit this asset as it belongs to {selected_asset['supplier']}.")
-                    else:
-                        st.markdown(f"#### Edit Asset: {selected_asset['asset_name']}")
-                        with st.form("edit_asset_form"):
-                            col_e1, col_e2 = st.columns(2)
-                            with col_e1:
-                                edit_asset_name = st.text_input("Asset Name", value=selected_asset['asset_name'], key="edit_asset_name")
-                                edit_location = st.text_input("Location", value=selected_asset['location'], key="edit_asset_location")
-                                edit_status = st.selectbox("Status", ["Operational", "Under Maintenance", "Retired", "Idle"], index=["Operational", "Under Maintenance", "Retired", "Idle"].index(selected_asset['status']), key="edit_asset_status")
-                                edit_supplier = st.text_input("Associated Supplier (Optional)", value=selected_asset['supplier'], key="edit_asset_supplier")
-                            with col_e2:
-                                try:
-                                    default_eol = datetime.strptime(str(selected_asset['eol_date']), '%Y-%m-%d').date()
-                                except (ValueError, TypeError):
-                                    default_eol = datetime.today().date()
-                                edit_eol_date = st.date_input("End of Life Date", value=default_eol, key="edit_asset_eol")
+                        # Check if the asset belongs to the logged-in supplier, if applicable
+                        if user_role != "OEM" and selected_asset['supplier'] != user_role:
+                            st.warning(f"You ({user_role}) do not have permission to edit this asset as it belongs to {selected_asset['supplier']}.")
+                        else:
+                            st.markdown(f"#### Edit Asset: {selected_asset['asset_name']}")
+                            with st.form("edit_asset_form"):
+                                col_e1, col_e2 = st.columns(2)
+                                with col_e1:
+                                    edit_asset_name = st.text_input("Asset Name", value=selected_asset['asset_name'], key="edit_asset_name")
+                                    edit_location = st.text_input("Location", value=selected_asset['location'], key="edit_asset_location")
+                                    edit_status = st.selectbox("Status", ["Operational", "Under Maintenance", "Retired", "Idle"], index=["Operational", "Under Maintenance", "Retired", "Idle"].index(selected_asset['status']), key="edit_asset_status")
+                                    edit_supplier = st.text_input("Associated Supplier (Optional)", value=selected_asset['supplier'], key="edit_asset_supplier")
+                                with col_e2:
+                                    default_eol = date_or_today(selected_asset['eol_date'])
+                                    edit_eol_date = st.date_input("End of Life Date", value=default_eol, key="edit_asset_eol")
                                 
-                                try:
-                                    default_cal = datetime.strptime(str(selected_asset['calibration_date']), '%Y-%m-%d').date()
-                                except (ValueError, TypeError):
-                                    default_cal = datetime.today().date()
-                                edit_calibration_date = st.date_input("Last Calibration Date", value=default_cal, key="edit_asset_calibration")
+                                    default_cal = date_or_today(selected_asset['calibration_date'])
+                                    edit_calibration_date = st.date_input("Last Calibration Date", value=default_cal, key="edit_asset_calibration")
                                 
-                                # --- NEW: last_active_date for editing ---
-                                try:
-                                    default_active = datetime.strptime(str(selected_asset['last_active_date']), '%Y-%m-%d').date()
-                                except (ValueError, TypeError):
-                                    default_active = datetime.today().date()
-                                edit_last_active_date = st.date_input("Last Active Date", value=default_active, key="edit_asset_last_active")
-
-                                edit_notes = st.text_area("Notes", value=selected_asset['notes'], key="edit_asset_notes")
-
-                            update_asset_btn = st.form_submit_button("Update Asset")
-                            delete_asset_btn = st.form_submit_button("Delete Asset")
-
-                            if update_asset_btn:
-                                idx = assets_df[assets_df['asset_id'] == selected_asset_id].index[0]
-                                assets_df.loc[idx] = {
-                                    "asset_id": selected_asset_id,
-                                    "asset_name": edit_asset_name,
-                                    "location": edit_location,
-                                    "status": edit_status,
-                                    "eol_date": edit_eol_date.isoformat(),
-                                    "calibration_date": edit_calibration_date.isoformat(),
-                                    "notes": edit_notes,
-                                    "supplier": edit_supplier,
-                                    "last_active_date": edit_last_active_date.isoformat() # NEW
-                                }
-                                update_data(ASSETS_FILE, assets_df)
-                                st.success(f"Asset '{edit_asset_name}' updated successfully!")
-                                st.rerun()
+                                    # --- NEW: last_active_date for editing ---
+                                    default_active = date_or_today(selected_asset['last_active_date'])
+                                    edit_last_active_date = st.date_input("Last Active Date", value=default_active, key="edit_asset_last_active")
+
+                                    edit_notes = st.text_area("Notes", value=selected_asset['notes'], key="edit_asset_notes")
+
+                                update_asset_btn = st.form_submit_button("Update Asset")
+                                delete_asset_btn = st.form_submit_button("Delete Asset")
+                                form_base_row("edit_asset_form", selected_asset, update_asset_btn or delete_asset_btn)
+
+                                if update_asset_btn:
+                                    if save_row_change(ASSETS_FILE, selected_asset_id, "edit_asset_form", {
+                                        "asset_name": edit_asset_name,
+                                        "location": edit_location,
+                                        "status": edit_status,
+                                        "eol_date": edit_eol_date.isoformat(),
+                                        "calibration_date": edit_calibration_date.isoformat(),
+                                        "notes": edit_notes,
+                                        "supplier": edit_supplier,
+                                        "last_active_date": edit_last_active_date.isoformat() # NEW
+                                    }):
+                                        st.success(f"Asset '{edit_asset_name}' updated successfully!")
+                                        st.rerun()
                             
-                            if delete_asset_btn:
-                                assets_df = assets_df[assets_df['asset_id'] != selected_asset_id]
-                                update_data(ASSETS_FILE, assets_df)
-                                st.warning(f"Asset '{selected_asset['asset_name']}' deleted.")
-                                st.rerun()
-            else:
-                st.info("Select an asset above to see details or edit/delete options.")
-        else:
-            if user_role in ["Supplier A", "Supplier B"]:
-                st.info(f"No assets currently managed by {user_role}.")
+                                if delete_asset_btn:
+                                    if save_row_change(ASSETS_FILE, selected_asset_id, "edit_asset_form"):
+                                        st.warning(f"Asset '{selected_asset['asset_name']}' deleted.")
+                                        st.rerun()
+                else:
+                    st.info("Select an asset above to see details or edit/delete options.")
             else:
-                st.info("No assets added yet.")
+                if user_role in ["Supplier A", "Supplier B"]:
+                    st.info(f"No assets currently managed by {user_role}.")
+                else:
+                    st.info("No assets added yet.")
 
 
 # --- Project Management Module ---
-with tabs[3]: # Corresponding to "📅 Project Management"
-    st.subheader("Project & Task Management")
-    st.markdown("Oversee internal projects and tasks, assigning them to relevant personnel.")
-
-    projects_df = load_data(PROJECTS_FILE, columns=project_columns)
-
-    if user_role not in ["OEM", "Supplier A", "Supplier B"]: # Allowing suppliers to see their own projects
-        st.warning("🔒 You must be logged in as 'OEM' or a 'Supplier' to manage projects.")
-    else:
-        st.markdown("### Create New Project/Task")
-        with st.form("new_project_form"):
-            new_task_name = st.text_input("Task Name", key="new_task_name")
-            new_description = st.text_area("Description", key="new_task_description")
-            new_status = st.selectbox("Status", ["Not Started", "In Progress", "Completed", "On Hold", "Input Pending"], key="new_task_status")
-            new_assigned_to = st.text_input("Assigned To (Name/Role)", key="new_task_assignee")
-            new_due_date = st.date_input("Due Date", value=datetime.today() + timedelta(days=7), key="new_task_due_date")
-            new_input_pending = st.checkbox("Input Pending from Supplier?", value=False, key="new_task_input_pending")
-            # --- NEW: is_esg_project for Sustainability Tracking ---
-            new_is_esg_project = st.checkbox("Is this an ESG-related project?", value=False, help="Check if this project contributes to Environmental, Social, or Governance goals.", key="new_task_esg_project")
-
-
-            submit_project = st.form_submit_button("Add Project/Task")
-
-            if submit_project:
-                if new_task_name and new_assigned_to:
-                    task_id = "TASK" + str(len(projects_df) + 1).zfill(4)
-                    new_entry = pd.DataFrame([{
-                        "task_id": task_id,
-                        "task_name": new_task_name,
-                        "status": new_status,
-                        "assigned_to": new_assigned_to,
-                        "due_date": new_due_date.isoformat(),
-                        "description": new_description,
-                        "input_pending": new_input_pending,
-                        "is_esg_project": new_is_esg_project # NEW
-                    }])
-                    append_data(PROJECTS_FILE, new_entry)
-                    st.success(f"Project/Task '{new_task_name}' added successfully!")
-                    st.rerun()
-                else:
-                    st.error("Please fill in Task Name and Assigned To.")
+if tabs[3].open: # Only the selected module runs; the others keep their widget state
+    with tabs[3], module_timer(tab_titles[3]): # Corresponding to "📅 Project Management"
+        st.subheader("Project & Task Management")
+        st.markdown("Oversee internal projects and tasks, assigning them to relevant personnel.")
 
-        st.markdown("### Existing Projects/Tasks")
-        
-        # Filter projects for non-OEM users
-        if user_role == "OEM":
-            display_projects_df = projects_df
-        elif user_role in ["Supplier A", "Supplier B"]:
-            display_projects_df = projects_df[projects_df['assigned_to'] == user_role]
-            if display_projects_df.empty:
-                st.info(f"No projects/tasks assigned to {user_role}.")
-        else: # For Auditor, etc. just show all but no edit/delete
-            display_projects_df = projects_df
-
-        # Apply search and filter to project data
-        display_projects_df = apply_search_and_filter(display_projects_df, "project_search", "project_advanced_search")
-
-        if not display_projects_df.empty:
-            st.dataframe(display_projects_df, use_container_width=True, hide_index=True)
-
-            if user_role in ["OEM", "Supplier A", "Supplier B"]: # Only allow editing/deleting for OEM or the specific supplier
-                selected_task_id = st.selectbox("Select Task ID to Edit/Delete", [''] + display_projects_df['task_id'].tolist(), key="select_task_edit_del")
-
-                if selected_task_id:
-                    selected_task = projects_df[projects_df['task_id'] == selected_task_id].iloc[0]
-
-                    # Check if the task is assigned to the logged-in supplier, if applicable
-                    if user_role != "OEM" and selected_task['assigned_to'] != user_role:
-                        st.warning(f"You ({user_role}) do not have permission to edit this task as it is assigned to {selected_task['assigned_to']}.")
+        projects_df = load_data(PROJECTS_FILE, columns=project_columns)
+
+        if user_role not in ["OEM", "Supplier A", "Supplier B"]: # Allowing suppliers to see their own projects
+            st.warning("🔒 You must be logged in as 'OEM' or a 'Supplier' to manage projects.")
+        else:
+            st.markdown("### Create New Project/Task")
+            with st.form("new_project_form"):
+                new_task_name = st.text_input("Task Name", key="new_task_name")
+                new_description = st.text_area("Description", key="new_task_description")
+                new_status = st.selectbox("Status", ["Not Started", "In Progress", "Completed", "On Hold", "Input Pending"], key="new_task_status")
+                new_assigned_to = st.text_input("Assigned To (Name/Role)", key="new_task_assignee")
+                new_due_date = st.date_input("Due Date", value=datetime.today() + timedelta(days=7), key="new_task_due_date")
+                new_input_pending = st.checkbox("Input Pending from Supplier?", value=False, key="new_task_input_pending")
+                # --- NEW: is_esg_project for Sustainability Tracking ---
+                new_is_esg_project = st.checkbox("Is this an ESG-related project?", value=False, help="Check if this project contributes to Environmental, Social, or Governance goals.", key="new_task_esg_project")
+
+
+                submit_project = st.form_submit_button("Add Project/Task")
+
+                if submit_project:
+                    if new_task_name and new_assigned_to:
+                        task_id = allocate_id(PROJECTS_FILE, "TASK")
+                        new_entry = pd.DataFrame([{
+                            "task_id": task_id,
+                            "task_name": new_task_name,
+                            "status": new_status,
+                            "assigned_to": new_assigned_to,
+                            "due_date": new_due_date.isoformat(),
+                            "description": new_description,
+                            "input_pending": new_input_pending,
+                            "is_esg_project": new_is_esg_project # NEW
+                        }])
+                        append_data(PROJECTS_FILE, new_entry)
+                        st.success(f"Project/Task '{new_task_name}' added successfully!")
+                        st.rerun()
                     else:
-                        st.markdown(f"#### Edit Project/Task: {selected_task['task_name']}")
-                        with st.form("edit_project_form"):
-                            edit_task_name = st.text_input("Task Name", value=selected_task['task_name'], key="edit_task_name")
-                            edit_description = st.text_area("Description", value=selected_task['description'], key="edit_task_description")
-                            edit_status = st.selectbox("Status", ["Not Started", "In Progress", "Completed", "On Hold", "Input Pending"], index=["Not Started", "In Progress", "Completed", "On Hold", "Input Pending"].index(selected_task['status']), key="edit_task_status")
-                            edit_assigned_to = st.text_input("Assigned To (Name/Role)", value=selected_task['assigned_to'], key="edit_task_assignee")
+                        st.error("Please fill in Task Name and Assigned To.")
+
+            st.markdown("### Existing Projects/Tasks")
+        
+            # Filter projects for non-OEM users
+            if user_role == "OEM":
+                display_projects_df = projects_df
+            elif user_role in ["Supplier A", "Supplier B"]:
+                display_projects_df = projects_df[projects_df['assigned_to'] == user_role]
+                if display_projects_df.empty:
+                    st.info(f"No projects/tasks assigned to {user_role}.")
+            else: # For Auditor, etc. just show all but no edit/delete
+                display_projects_df = projects_df
+
+            # Apply search and filter to project data
+            display_projects_df = apply_search_and_filter(display_projects_df, "project_search", "project_advanced_search")
+
+            if not display_projects_df.empty:
+                paged_dataframe(display_projects_df, "project_table")
+
+                if user_role in ["OEM", "Supplier A", "Supplier B"]: # Only allow editing/deleting for OEM or the specific supplier
+                    selected_task_id = st.selectbox("Select Task ID to Edit/Delete", [''] + display_projects_df['task_id'].tolist(), key="select_task_edit_del", persist_state="session")
+
+                    if selected_task_id:
+                        selected_task = projects_df[projects_df['task_id'] == selected_task_id].iloc[0]
+
+                        # Check if the task is assigned to the logged-in supplier, if applicable
+                        if user_role != "OEM" and selected_task['assigned_to'] != user_role:
+                            st.warning(f"You ({user_role}) do not have permission to edit this task as it is assigned to {selected_task['assigned_to']}.")
+                        else:
+                            st.markdown(f"#### Edit Project/Task: {selected_task['task_name']}")
+                            with st.form("edit_project_form"):
+                                edit_task_name = st.text_input("Task Name", value=selected_task['task_name'], key="edit_task_name")
+                                edit_description = st.text_area("Description", value=selected_task['description'], key="edit_task_description")
+                                edit_status = st.selectbox("Status", ["Not Started", "In Progress", "Completed", "On Hold", "Input Pending"], index=["Not Started", "In Progress", "Completed", "On Hold", "Input Pending"].index(selected_task['status']), key="edit_task_status")
+                                edit_assigned_to = st.text_input("Assigned To (Name/Role)", value=selected_task['assigned_to'], key="edit_task_assignee")
                             
-                            try:
-                                default_due = datetime.strptime(str(selected_task['due_date']), '%Y-%m-%d').date()
-                            except (ValueError, TypeError):
-                                default_due = datetime.today().date()
-                            edit_due_date = st.date_input("Due Date", value=default_due, key="edit_task_due_date")
-                            edit_input_pending = st.checkbox("Input Pending from Supplier?", value=bool(selected_task['input_pending']), key="edit_task_input_pending")
-                            # --- NEW: is_esg_project for editing ---
-                            edit_is_esg_project = st.checkbox("Is this an ESG-related project?", value=bool(selected_task['is_esg_project']), key="edit_task_esg_project")
-
-
-                            update_project_btn = st.form_submit_button("Update Project/Task")
-                            delete_project_btn = st.form_submit_button("Delete Project/Task")
-
-                            if update_project_btn:
-                                idx = projects_df[projects_df['task_id'] == selected_task_id].index[0]
-                                projects_df.loc[idx] = {
-                                    "task_id": selected_task_id,
-                                    "task_name": edit_task_name,
-                                    "status": edit_status,
-                                    "assigned_to": edit_assigned_to,
-                                    "due_date": edit_due_date.isoformat(),
-                                    "description": edit_description,
-                                    "input_pending": edit_input_pending,
-                                    "is_esg_project": edit_is_esg_project # NEW
-                                }
-                                update_data(PROJECTS_FILE, projects_df)
-                                st.success(f"Project/Task '{edit_task_name}' updated successfully!")
-                                st.rerun()
+                                default_due = date_or_today(selected_task['due_date'])
+                                edit_due_date = st.date_input("Due Date", value=default_due, key="edit_task_due_date")
+                                edit_input_pending = st.checkbox("Input Pending from Supplier?", value=is_checked(selected_task['input_pending']), key="edit_task_input_pending")
+                                # --- NEW: is_esg_project for editing ---
+                                edit_is_esg_project = st.checkbox("Is this an ESG-related project?", value=is_checked(selected_task['is_esg_project']), key="edit_task_esg_project")
+
+
+                                update_project_btn = st.form_submit_button("Update Project/Task")
+                                delete_project_btn = st.form_submit_button("Delete Project/Task")
+                                form_base_row("edit_project_form", selected_task, update_project_btn or delete_project_btn)
+
+                                if update_project_btn:
+                                    if save_row_change(PROJECTS_FILE, selected_task_id, "edit_project_form", {
+                                        "task_name": edit_task_name,
+                                        "status": edit_status,
+                                        "assigned_to": edit_assigned_to,
+                                        "due_date": edit_due_date.isoformat(),
+                                        "description": edit_description,
+                                        "input_pending": edit_input_pending,
+                                        "is_esg_project": edit_is_esg_project # NEW
+                                    }):
+                                        st.success(f"Project/Task '{edit_task_name}' updated successfully!")
+                                        st.rerun()
                             
-                            if delete_project_btn:
-                                projects_df = projects_df[projects_df['task_id'] != selected_task_id]
-                                update_data(PROJECTS_FILE, projects_df)
-                                st.warning(f"Project/Task '{selected_task['task_name']}' deleted.")
-                                st.rerun()
-            else:
-                st.info("Select a project/task above to see details or edit/delete options.")
-        else:
-            if user_role in ["Supplier A", "Supplier B"]:
-                st.info(f"No projects/tasks currently assigned to {user_role}.")
+                                if delete_project_btn:
+                                    if save_row_change(PROJECTS_FILE, selected_task_id, "edit_project_form"):
+                                        st.warning(f"Project/Task '{selected_task['task_name']}' deleted.")
+                                        st.rerun()
+                else:
+                    st.info("Select a project/task above to see details or edit/delete options.")
             else:
-                st.info("No projects/tasks added yet.")
+                if user_role in ["Supplier A", "Supplier B"]:
+                    st.info(f"No projects/tasks currently assigned to {user_role}.")
+                else:
+                    st.info("No projects/tasks added yet.")
 
 
 # --- Audit Management Module ---
-with tabs[4]: # Corresponding to "📋 Audit Management"
-    st.subheader("Audit Management")
-    st.markdown("Manage audit points, track their status, and assign resolutions.")
-
-    audits_df = load_data(AUDITS_FILE, columns=audit_columns)
-
-    if user_role not in ["OEM", "Auditor"]:
-        st.warning("🔒 You must be logged in as 'OEM' or 'Auditor' to manage audits.")
-    else:
-        st.markdown("### Add New Audit Point")
-        with st.form("new_audit_form"):
-            new_point_description = st.text_area("Audit Point Description", key="new_audit_desc")
-            new_status = st.selectbox("Status", ["Open", "In Progress", "Closed", "Requires Supplier Input"], key="new_audit_status")
-            new_assignee = st.text_input("Assignee (Name/Role)", key="new_audit_assignee")
-            new_due_date = st.date_input("Due Date", value=datetime.today() + timedelta(days=14), key="new_audit_due_date")
-            new_resolution = st.text_area("Resolution Notes (Optional)", key="new_audit_res")
-            new_input_pending_audit = st.checkbox("Input Pending from Supplier?", value=False, key="new_audit_input_pending")
-
-            submit_audit = st.form_submit_button("Add Audit Point")
-
-            if submit_audit:
-                if new_point_description and new_assignee:
-                    audit_id = "AUDIT" + str(len(audits_df) + 1).zfill(4)
-                    new_entry = pd.DataFrame([{
-                        "audit_id": audit_id,
-                        "point_description": new_point_description,
-                        "status": new_status,
-                        "assignee": new_assignee,
-                        "due_date": new_due_date.isoformat(),
-                        "resolution": new_resolution,
-                        "input_pending": new_input_pending_audit
-                    }])
-                    append_data(AUDITS_FILE, new_entry)
-                    st.success(f"Audit point added successfully: '{new_point_description[:30]}...'")
-                    st.rerun()
-                else:
-                    st.error("Please fill in Audit Point Description and Assignee.")
+if tabs[4].open: # Only the selected module runs; the others keep their widget state
+    with tabs[4], module_timer(tab_titles[4]): # Corresponding to "📋 Audit Management"
+        st.subheader("Audit Management")
+        st.markdown("Manage audit points, track their status, and assign resolutions.")
+
+        audits_df = load_data(AUDITS_FILE, columns=audit_columns)
+
+        if user_role not in ["OEM", "Auditor"]:
+            st.warning("🔒 You must be logged in as 'OEM' or 'Auditor' to manage audits.")
+        else:
+            st.markdown("### Add New Audit Point")
+            with st.form("new_audit_form"):
+                new_point_description = st.text_area("Audit Point Description", key="new_audit_desc")
+                new_status = st.selectbox("Status", ["Open", "In Progress", "Closed", "Requires Supplier Input"], key="new_audit_status")
+                new_assignee = st.text_input("Assignee (Name/Role)", key="new_audit_assignee")
+                new_due_date = st.date_input("Due Date", value=datetime.today() + timedelta(days=14), key="new_audit_due_date")
+                new_resolution = st.text_area("Resolution Notes (Optional)", key="new_audit_res")
+                new_input_pending_audit = st.checkbox("Input Pending from Supplier?", value=False, key="new_audit_input_pending")
+
+                submit_audit = st.form_submit_button("Add Audit Point")
+
+                if submit_audit:
+                    if new_point_description and new_assignee:
+                        audit_id = allocate_id(AUDITS_FILE, "AUDIT")
+                        new_entry = pd.DataFrame([{
+                            "audit_id": audit_id,
+                            "point_description": new_point_description,
+                            "status": new_status,
+                            "assignee": new_assignee,
+                            "due_date": new_due_date.isoformat(),
+                            "resolution": new_resolution,
+                            "input_pending": new_input_pending_audit
+                        }])
+                        append_data(AUDITS_FILE, new_entry)
+                        st.success(f"Audit point added successfully: '{new_point_description[:30]}...'")
+                        st.rerun()
+                    else:
+                        st.error("Please fill in Audit Point Description and Assignee.")
         
-        st.markdown("### Existing Audit Points")
+            st.markdown("### Existing Audit Points")
         
-        # Filter audits for non-OEM/Auditor roles (e.g., Suppliers can see audits assigned to them)
-        if user_role == "OEM" or user_role == "Auditor":
-            display_audits_df = audits_df
-        elif user_role in ["Supplier A", "Supplier B"]:
-            display_audits_df = audits_df[audits_df['assignee'] == user_role]
-            if display_audits_df.empty:
-                st.info(f"No audit points assigned to {user_role}.")
-        else: # For other roles, just show all but no edit/delete
-            display_audits_df = audits_df
-
-        # Apply search and filter to audit data
-        display_audits_df = apply_search_and_filter(display_audits_df, "audit_search", "audit_advanced_search")
-
-        if not display_audits_df.empty:
-            st.dataframe(display_audits_df, use_container_width=True, hide_index=True)
-
-            if user_role == "OEM" or user_role == "Auditor": # Only allow editing/deleting for OEM and Auditor
-                selected_audit_id = st.selectbox("Select Audit ID to Edit/Delete", [''] + display_audits_df['audit_id'].tolist(), key="select_audit_edit_del")
-
-                if selected_audit_id:
-                    selected_audit = audits_df[audits_df['audit_id'] == selected_audit_id].iloc[0]
-                    st.markdown(f"#### Edit Audit Point: {selected_audit['point_description'][:50]}...")
-                    with st.form("edit_audit_form"):
-                        edit_point_description = st.text_area("Audit Point Description", value=selected_audit['point_description'], key="edit_audit_desc")
-                        edit_status = st.selectbox("Status", ["Open", "In Progress", "Closed", "Requires Supplier Input"], index=["Open", "In Progress", "Closed", "Requires Supplier Input"].index(selected_audit['status']), key="edit_audit_status")
-                        edit_assignee = st.text_input("Assignee (Name/Role)", value=selected_audit['assignee'], key="edit_audit_assignee")
+            # Filter audits for non-OEM/Auditor roles (e.g., Suppliers can see audits assigned to them)
+            if user_role == "OEM" or user_role == "Auditor":
+                display_audits_df = audits_df
+            elif user_role in ["Supplier A", "Supplier B"]:
+                display_audits_df = audits_df[audits_df['assignee'] == user_role]
+                if display_audits_df.empty:
+                    st.info(f"No audit points assigned to {user_role}.")
+            else: # For other roles, just show all but no edit/delete
+                display_audits_df = audits_df
+
+            # Apply search and filter to audit data
+            display_audits_df = apply_search_and_filter(display_audits_df, "audit_search", "audit_advanced_search")
+
+            if not display_audits_df.empty:
+                paged_dataframe(display_audits_df, "audit_table")
+
+                if user_role == "OEM" or user_role == "Auditor": # Only allow editing/deleting for OEM and Auditor
+                    selected_audit_id = st.selectbox("Select Audit ID to Edit/Delete", [''] + display_audits_df['audit_id'].tolist(), key="select_audit_edit_del", persist_state="session")
+
+                    if selected_audit_id:
+                        selected_audit = audits_df[audits_df['audit_id'] == selected_audit_id].iloc[0]
+                        st.markdown(f"#### Edit Audit Point: {selected_audit['point_description'][:50]}...")
+                        with st.form("edit_audit_form"):
+                            edit_point_description = st.text_area("Audit Point Description", value=selected_audit['point_description'], key="edit_audit_desc")
+                            edit_status = st.selectbox("Status", ["Open", "In Progress", "Closed", "Requires Supplier Input"], index=["Open", "In Progress", "Closed", "Requires Supplier Input"].index(selected_audit['status']), key="edit_audit_status")
+                            edit_assignee = st.text_input("Assignee (Name/Role)", value=selected_audit['assignee'], key="edit_audit_assignee")
                         
-                        try:
-                            default_audit_due = datetime.strptime(str(selected_audit['due_date']), '%Y-%m-%d').date()
-                        except (ValueError, TypeError):
-                            default_audit_due = datetime.today().date()
-                        edit_due_date = st.date_input("Due Date", value=default_audit_due, key="edit_audit_due_date")
-                        edit_resolution = st.text_area("Resolution Notes", value=selected_audit['resolution'], key="edit_audit_res")
-                        edit_input_pending_audit = st.checkbox("Input Pending from Supplier?", value=bool(selected_audit['input_pending']), key="edit_audit_input_pending")
-
-                        update_audit_btn = st.form_submit_button("Update Audit Point")
-                        delete_audit_btn = st.form_submit_button("Delete Audit Point")
-
-                        if update_audit_btn:
-                            idx = audits_df[audits_df['audit_id'] == selected_audit_id].index[0]
-                            audits_df.loc[idx] = {
-                                "audit_id": selected_audit_id,
-                                "point_description": edit_point_description,
-                                "status": edit_status,
-                                "assignee": edit_assignee,
-                                "due_date": edit_due_date.isoformat(),
-                                "resolution": edit_resolution,
-                                "input_pending": edit_input_pending_audit
-                            }
-                            update_data(AUDITS_FILE, audits_df)
-                            st.success(f"Audit point '{edit_point_description[:30]}...' updated successfully!")
-                            st.rerun()
+                            default_audit_due = date_or_today(selected_audit['due_date'])
+                            edit_due_date = st.date_input("Due Date", value=default_audit_due, key="edit_audit_due_date")
+                            edit_resolution = st.text_area("Resolution Notes", value=selected_audit['resolution'], key="edit_audit_res")
+                            edit_input_pending_audit = st.checkbox("Input Pending from Supplier?", value=is_checked(selected_audit['input_pending']), key="edit_audit_input_pending")
+
+                            update_audit_btn = st.form_submit_button("Update Audit Point")
+                            delete_audit_btn = st.form_submit_button("Delete Audit Point")
+                            form_base_row("edit_audit_form", selected_audit, update_audit_btn or delete_audit_btn)
+
+                            if update_audit_btn:
+                                if save_row_change(AUDITS_FILE, selected_audit_id, "edit_audit_form", {
+                                    "point_description": edit_point_description,
+                                    "status": edit_status,
+                                    "assignee": edit_assignee,
+                                    "due_date": edit_due_date.isoformat(),
+                                    "resolution": edit_resolution,
+                                    "input_pending": edit_input_pending_audit
+                                }):
+                                    st.success(f"Audit point '{edit_point_description[:30]}...' updated successfully!")
+                                    st.rerun()
                         
-                        if delete_audit_btn:
-                            audits_df = audits_df[audits_df['audit_id'] != selected_audit_id]
-                            update_data(AUDITS_FILE, audits_df)
-                            st.warning(f"Audit point '{selected_audit['point_description'][:30]}...' deleted.")
-                            st.rerun()
-            else:
-                st.info("Select an audit point above to see details.")
-        else:
-            if user_role in ["Supplier A", "Supplier B"]:
-                st.info(f"No audit points currently assigned to {user_role}.")
+                            if delete_audit_btn:
+                                if save_row_change(AUDITS_FILE, selected_audit_id, "edit_audit_form"):
+                                    st.warning(f"Audit point '{selected_audit['point_description'][:30]}...' deleted.")
+                                    st.rerun()
+                else:
+                    st.info("Select an audit point above to see details.")
             else:
-                st.info("No audit points added yet.")
+                if user_role in ["Supplier A", "Supplier B"]:
+                    st.info(f"No audit points currently assigned to {user_role}.")
+                else:
+                    st.info("No audit points added yet.")
 
 
 # --- File Management Module ---
-with tabs[5]: # Corresponding to "📁 File Management"
-    st.subheader("File Management")
-    st.markdown("Upload, download, and manage important documents.")
-
-    files_df = st.session_state.files_df # Use session state for files_df
-    file_comments_df = st.session_state.file_comments_df # Use session state for comments_df
+if tabs[5].open: # Only the selected module runs; the others keep their widget state
+    with tabs[5], module_timer(tab_titles[5]): # Corresponding to "📁 File Management"
+        st.subheader("File Management")
+        st.markdown("Upload, download, and manage important documents.")
 
-    if user_role not in ["OEM", "Supplier A", "Supplier B", "Auditor"]:
-        st.warning("🔒 You must be logged in as 'OEM', 'Supplier', or 'Auditor' to access File Management.")
-    else:
-        st.markdown("### Upload New File")
-        uploaded_file = st.file_uploader("Choose a file", type=["pdf", "doc", "docx", "txt", "csv", "xlsx", "png", "jpg", "jpeg"])
+        files_df = st.session_state.files_df # Use session state for files_df
+        file_comments_df = st.session_state.file_comments_df # Use session state for comments_df
 
-        if uploaded_file is not None:
-            file_details = {"FileName": uploaded_file.name, "FileType": uploaded_file.type, "FileSize": uploaded_file.size}
-            
-            # Create a unique filename to prevent overwrites
-            unique_filename = f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{uploaded_file.name}"
-            save_path = os.path.join(DATA_DIR, "uploaded_files", unique_filename) # Store in a subfolder
-
-            # Ensure the subfolder exists
-            os.makedirs(os.path.join(DATA_DIR, "uploaded_files"), exist_ok=True)
-
-            with open(save_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
-            
-            file_id = "FILE" + str(len(files_df) + 1).zfill(4) # Add file_id for better management if needed
-            new_file_entry = pd.DataFrame([{
-                "filename": uploaded_file.name,
-                "type": uploaded_file.type,
-                "size": uploaded_file.size,
-                "uploader": user_role,
-                "timestamp": datetime.now().isoformat(),
-                "path": save_path
-            }])
-            append_data(FILES_FILE, new_file_entry)
-            st.session_state.files_df = load_data(FILES_FILE, columns=["filename", "type", "size", "uploader", "timestamp", "path"]) # Reload
-            st.success(f"File '{uploaded_file.name}' uploaded successfully!")
-            st.rerun()
-
-        st.markdown("### Existing Files")
-
-        # Display files relevant to the user role
-        if user_role == "OEM" or user_role == "Auditor":
-            display_files_df = files_df
-        else: # Suppliers can only see files they uploaded
-            display_files_df = files_df[files_df['uploader'] == user_role]
-            if display_files_df.empty:
-                st.info(f"No files uploaded by {user_role}.")
-
-        display_files_df = apply_search_and_filter(display_files_df, "file_search", "file_advanced_search")
-
-        if not display_files_df.empty:
-            st.dataframe(display_files_df, use_container_width=True, hide_index=True)
-
-            selected_file_name = st.selectbox("Select a file to view comments or download", [''] + display_files_df['filename'].tolist(), key="select_file_for_action")
-
-            if selected_file_name:
-                selected_file_row = display_files_df[display_files_df['filename'] == selected_file_name].iloc[0]
-                
-                st.markdown(f"#### Actions for: {selected_file_name}")
-                col_file_actions1, col_file_actions2 = st.columns(2)
+        if user_role not in ["OEM", "Supplier A", "Supplier B", "Auditor"]:
+            st.warning("🔒 You must be logged in as 'OEM', 'Supplier', or 'Auditor' to access File Management.")
+        else:
+            st.markdown("### Upload New File")
+            uploaded_file = st.file_uploader("Choose a file", type=["pdf", "doc", "docx", "txt", "csv", "xlsx", "png", "jpg", "jpeg"])
+
+            if uploaded_file is not None:
+                file_details = {"FileName": uploaded_file.name, "FileType": uploaded_file.type, "FileSize": uploaded_file.size}
+
+                # Hash and copy the upload chunk by chunk; identical content is stored only once
+                staged_blob = blobstore.stage(uploaded_file, BLOB_DIR)
+                file_id = allocate_id(FILES_FILE, "FILE")
+                new_file_entry = pd.DataFrame([{
+                    "file_id": file_id,
+                    "filename": uploaded_file.name,
+                    "type": uploaded_file.type,
+                    "size": staged_blob.size,
+                    "uploader": user_role,
+                    "timestamp": datetime.now().isoformat(),
+                    "content_hash": staged_blob.digest
+                }])
+                with table_lock(FILES_FILE): # A delete can't drop the blob between commit and append
+                    staged_blob.commit()
+                    append_data(FILES_FILE, new_file_entry)
+                st.session_state.files_df = load_data(FILES_FILE, columns=file_columns) # Reload
+                st.success(f"File '{uploaded_file.name}' uploaded successfully!")
+                st.rerun()
+
+            st.markdown("### Existing Files")
+
+            # Display files relevant to the user role
+            if user_role == "OEM" or user_role == "Auditor":
+                display_files_df = files_df
+            else: # Suppliers can only see files they uploaded
+                display_files_df = files_df[files_df['uploader'] == user_role]
+                if display_files_df.empty:
+                    st.info(f"No files uploaded by {user_role}.")
+
+            display_files_df = apply_search_and_filter(display_files_df, "file_search", "file_advanced_search")
+
+            if not display_files_df.empty:
+                paged_dataframe(display_files_df, "file_table")
+
+                selected_file_name = st.selectbox("Select a file to view comments or download", [''] + display_files_df['filename'].tolist(), key="select_file_for_action", persist_state="session")
+
+                if selected_file_name:
+                    selected_file_row = display_files_df[display_files_df['filename'] == selected_file_name].iloc[0]
                 
-                with col_file_actions1:
-                    try:
-                        with open(selected_file_row['path'], "rb") as f:
-                            st.download_button(
-                                label=f"Download {selected_file_name}",
-                                data=f,
-                                file_name=selected_file_name,
-                                mime=selected_file_row['type']
-                            )
-                    except FileNotFoundError:
-                        st.error("File not found on server. It might have been moved or deleted.")
+                    st.markdown(f"#### Actions for: {selected_file_name}")
+                    col_file_actions1, col_file_actions2 = st.columns(2)
                 
-                with col_file_actions2:
-                    if st.button(f"Delete {selected_file_name}", key="delete_file_btn"):
-                        # Ensure actual file is deleted
+                    with col_file_actions1:
                         try:
-                            os.remove(selected_file_row['path'])
-                            files_df = files_df[files_df['filename'] != selected_file_name]
-                            update_data(FILES_FILE, files_df)
-                            st.session_state.files_df = files_df # Update session state
-                            # Also delete associated comments
-                            st.session_state.file_comments_df = st.session_state.file_comments_df[st.session_state.file_comments_df['file_name'] != selected_file_name]
-                            update_data(FILE_COMMENTS_FILE, st.session_state.file_comments_df)
-                            st.warning(f"File '{selected_file_name}' and its comments deleted.")
-                            st.rerun()
+                            with open_stored_file(selected_file_row) as f:
+                                st.download_button(
+                                    label=f"Download {selected_file_name}",
+                                    data=f,
+                                    file_name=selected_file_name,
+                                    mime=selected_file_row['type']
+                                )
                         except FileNotFoundError:
-                            st.warning(f"File '{selected_file_name}' not found on disk, removing from record only.")
-                            files_df = files_df[files_df['filename'] != selected_file_name]
-                            update_data(FILES_FILE, files_df)
-                            st.session_state.files_df = files_df
-                            st.session_state.file_comments_df = st.session_state.file_comments_df[st.session_state.file_comments_df['file_name'] != selected_file_name]
-                            update_data(FILE_COMMENTS_FILE, st.session_state.file_comments_df)
-                            st.rerun()
-                        except Exception as e:
-                            st.error(f"Error deleting file: {e}")
-
-                st.markdown(f"---")
-                st.markdown(f"#### Comments for {selected_file_name}")
-
-                current_file_comments = file_comments_df[file_comments_df['file_name'] == selected_file_name]
-
-                if not current_file_comments.empty:
-                    # Display top-level comments first
-                    top_level_comments = current_file_comments[current_file_comments['parent_comment_id'].isna()]
+                            st.error("File not found on server. It might have been moved or deleted.")
+                
+                    with col_file_actions2:
+                        if st.button(f"Delete {selected_file_name}", key="delete_file_btn"):
+                            # Ensure actual file is deleted
+                            try:
+                                # Delete from the latest records, not this session's copy, so others' uploads survive
+                                if not delete_stored_file(selected_file_row):
+                                    st.error(f"No record of '{selected_file_name}' was found, so nothing was deleted. It may have been deleted already.")
+                                else:
+                                    st.session_state.files_df = load_data(FILES_FILE, columns=file_columns) # Reload
+                                    # Also delete associated comments
+                                    delete_file_comments(selected_file_name)
+                                    st.session_state.file_comments_df = st.session_state.file_comments_df[st.session_state.file_comments_df['file_name'] != selected_file_name]
+                                    st.warning(f"File '{selected_file_name}' and its comments deleted.")
+                                    st.rerun()
+                            except FileNotFoundError:
+                                st.warning(f"File '{selected_file_name}' not found on disk, removing from record only.")
+                                delete_row(FILES_FILE, selected_file_row['file_id'])
+                                st.session_state.files_df = load_data(FILES_FILE, columns=file_columns)
+                                delete_file_comments(selected_file_name)
+                                st.session_state.file_comments_df = st.session_state.file_comments_df[st.session_state.file_comments_df['file_name'] != selected_file_name]
+                                st.rerun()
+                            except Exception as e:
+                                st.error(f"Error deleting file: {e}")
+
+                    st.markdown(f"---")
+                    st.markdown(f"#### Comments for {selected_file_name}")
+
+                    current_file_comments = file_comments_df[file_comments_df['file_name'] == selected_file_name]
+
+                    if not current_file_comments.empty:
+                        # Display top-level comments first
+                        top_level_comments = current_file_comments[current_file_comments['parent_comment_id'].isna()]
                     
-                    for idx, comment in top_level_comments.iterrows():
-                        st.markdown(f"""
+                        for idx, comment in top_level_comments.iterrows():
+                            st.markdown(f"""
                             <div class="comment-card">
                                 <div class="comment-meta">
                                     <strong>{comment['author']}</strong> commented on {pd.to_datetime(comment['timestamp']).strftime('%Y-%m-%d %H:%M')}
                                 </div>
                                 <div class="comment-body">{comment['comment_text']}</div>
-                                {'<div class="comment-meta">Mentions: ' + ', '.join(eval(comment['mentions'])) + '</div>' if comment['mentions'] and eval(comment['mentions']) else ''}
+                                {'<div class="comment-meta">Mentions: ' + ', '.join(comment['mentions']) + '</div>' if comment['mentions'] else ''}
                             </div>
                         """, unsafe_allow_html=True)
                         
-                        # Display replies to this comment
-                        replies = current_file_comments[current_file_comments['parent_comment_id'] == comment['comment_id']]
-                        if not replies.empty:
-                            st.markdown('<div class="reply-to-comment">', unsafe_allow_html=True)
-                            st.markdown("##### Replies:")
-                            for ridx, reply in replies.iterrows():
-                                st.markdown(f"""
+                            # Display replies to this comment
+                            replies = current_file_comments[current_file_comments['parent_comment_id'] == comment['comment_id']]
+                            if not replies.empty:
+                                st.markdown('<div class="reply-to-comment">', unsafe_allow_html=True)
+                                st.markdown("##### Replies:")
+                                for ridx, reply in replies.iterrows():
+                                    st.markdown(f"""
                                     <div class="comment-card">
                                         <div class="comment-meta">
                                             <strong>{reply['author']}</strong> replied on {pd.to_datetime(reply['timestamp']).strftime('%Y-%m-%d %H:%M')}
                                         </div>
                                         <div class="comment-body">{reply['comment_text']}</div>
-                                        {'<div class="comment-meta">Mentions: ' + ', '.join(eval(reply['mentions'])) + '</div>' if reply['mentions'] and eval(reply['mentions']) else ''}
+                                        {'<div class="comment-meta">Mentions: ' + ', '.join(reply['mentions']) + '</div>' if reply['mentions'] else ''}
                                     </div>
                                 """, unsafe_allow_html=True)
-                            st.markdown('</div>', unsafe_allow_html=True)
-                else:
-                    st.info("No comments for this file yet.")
+                                st.markdown('</div>', unsafe_allow_html=True)
+                    else:
+                        st.info("No comments for this file yet.")
                 
-                st.markdown("---")
-                st.markdown("#### Add a New Comment")
-                with st.form(key=f"add_comment_to_{selected_file_name}"):
-                    comment_text = st.text_area("Your Comment", key=f"comment_text_{selected_file_name}")
+                    st.markdown("---")
+                    st.markdown("#### Add a New Comment")
+                    with st.form(key=f"add_comment_to_{selected_file_name}"):
+                        comment_text = st.text_area("Your Comment", key=f"comment_text_{selected_file_name}")
                     
-                    # Allow mentioning roles or specific suppliers/OEM
-                    all_mentionable_roles = user_roles + supplier_df['supplier_name'].tolist() + ['OEM']
-                    selected_mentions = st.multiselect("Mention (Optional)", all_mentionable_roles, key=f"mentions_{selected_file_name}")
-
-                    add_comment_btn = st.form_submit_button("Post Comment")
-
-                    if add_comment_btn:
-                        if comment_text:
-                            comment_id = "COMM" + str(len(file_comments_df) + 1).zfill(4)
-                            new_comment = pd.DataFrame([{
-                                "comment_id": comment_id,
-                                "file_name": selected_file_name,
-                                "parent_comment_id": None, # Top-level comment
-                                "author": user_role,
-                                "timestamp": datetime.now().isoformat(),
-                                "comment_text": comment_text,
-                                "mentions": str(selected_mentions) # Store as string representation of list
-                            }])
-                            append_data(FILE_COMMENTS_FILE, new_comment)
-                            st.session_state.file_comments_df = load_data(FILE_COMMENTS_FILE, columns=file_comment_columns) # Reload
-                            st.session_state.file_comments_df['mentions'] = st.session_state.file_comments_df['mentions'].apply(lambda x: eval(x) if isinstance(x, str) else [])
-                            st.success("Comment added!")
-                            st.rerun()
-                        else:
-                            st.warning("Comment cannot be empty.")
-        else:
-            st.info("No files uploaded yet.")
+                        # Allow mentioning roles or specific suppliers/OEM
+                        all_mentionable_roles = user_roles + supplier_names() + ['OEM']
+                        selected_mentions = st.multiselect("Mention (Optional)", all_mentionable_roles, key=f"mentions_{selected_file_name}")
+
+                        add_comment_btn = st.form_submit_button("Post Comment")
+
+                        if add_comment_btn:
+                            if comment_text:
+                                comment_id = allocate_id(FILE_COMMENTS_FILE, "COMM")
+                                new_comment = pd.DataFrame([{
+                                    "comment_id": comment_id,
+                                    "file_name": selected_file_name,
+                                    "parent_comment_id": None, # Top-level comment
+                                    "author": user_role,
+                                    "timestamp": datetime.now().isoformat(),
+                                    "comment_text": comment_text,
+                                    "mentions": selected_mentions # Stored as a JSON array
+                                }])
+                                append_data(FILE_COMMENTS_FILE, new_comment)
+                                st.session_state.file_comments_df = load_data(FILE_COMMENTS_FILE, columns=file_comment_columns) # Reload
+                                st.success("Comment added!")
+                                st.rerun()
+                            else:
+                                st.warning("Comment cannot be empty.")
+            else:
+                st.info("No files uploaded yet.")
 
 
 # --- Mailbox Module ---
-with tabs[6]: # Corresponding to "📧 Mailbox"
-    st.subheader("Mailbox")
-    st.markdown("Communicate securely with OEM, suppliers, and auditors.")
-
-    notifications_df = st.session_state.notifications_df
-
-    st.markdown('<div class="mailbox-container">', unsafe_allow_html=True)
-
-    # Mailbox Navigation
-    col_nav1, col_nav2, col_nav3 = st.columns(3)
-    with col_nav1:
-        if st.button("Inbox", key="inbox_btn"):
-            st.session_state.mailbox_view = "inbox"
-            st.session_state.selected_notification_id = None
-    with col_nav2:
-        if st.button("Sent", key="sent_btn"):
-            st.session_state.mailbox_view = "sent"
-            st.session_state.selected_notification_id = None
-    with col_nav3:
-        if st.button("Compose", key="compose_btn"):
-            st.session_state.mailbox_view = "compose"
-            st.session_state.selected_notification_id = None
-
-    st.markdown("---")
-
-    if st.session_state.mailbox_view == "inbox":
-        st.markdown("### Inbox")
-        # Filter messages received by the current user_role or specific supplier name
-        if user_role in ["OEM", "Auditor"]: # OEMs and Auditors receive messages addressed to their role
-            my_inbox = notifications_df[(notifications_df['recipient_role'] == user_role) | (notifications_df['recipient_role'].isin(user_roles) & (notifications_df['sender_role'] != user_role))]
-        else: # Suppliers receive messages specifically addressed to their name
-            my_inbox = notifications_df[notifications_df['recipient_role'] == user_role]
+if tabs[6].open: # Only the selected module runs; the others keep their widget state
+    with tabs[6], module_timer(tab_titles[6]): # Corresponding to "📧 Mailbox"
+        st.subheader("Mailbox")
+        st.markdown("Communicate securely with OEM, suppliers, and auditors.")
+
+        notifications_df = st.session_state.notifications_df
+
+        st.markdown('<div class="mailbox-container">', unsafe_allow_html=True)
+
+        # Mailbox Navigation
+        col_nav1, col_nav2, col_nav3 = st.columns(3)
+        with col_nav1:
+            if st.button("Inbox", key="inbox_btn"):
+                st.session_state.mailbox_view = "inbox"
+                st.session_state.selected_notification_id = None
+        with col_nav2:
+            if st.button("Sent", key="sent_btn"):
+                st.session_state.mailbox_view = "sent"
+                st.session_state.selected_notification_id = None
+        with col_nav3:
+            if st.button("Compose", key="compose_btn"):
+                st.session_state.mailbox_view = "compose"
+                st.session_state.selected_notification_id = None
+
+        st.markdown("---")
+
+        if st.session_state.mailbox_view == "inbox":
+            st.markdown("### Inbox")
+            # Filter messages received by the current user_role or specific supplier name
+            if user_role in ["OEM", "Auditor"]: # OEMs and Auditors receive messages addressed to their role
+                my_inbox = notifications_df[(notifications_df['recipient_role'] == user_role) | (notifications_df['recipient_role'].isin(user_roles) & (notifications_df['sender_role'] != user_role))]
+            else: # Suppliers receive messages specifically addressed to their name
+                my_inbox = notifications_df[notifications_df['recipient_role'] == user_role]
         
-        # Filter out replies for initial view (only show top-level messages)
-        my_inbox = my_inbox[my_inbox['parent_notification_id'].isna()].sort_values(by="timestamp", ascending=False)
+            # Filter out replies for initial view (only show top-level messages)
+            my_inbox = my_inbox[my_inbox['parent_notification_id'].isna()].sort_values(by="timestamp", ascending=False)
 
-        if not my_inbox.empty:
-            for idx, message in my_inbox.iterrows():
-                is_unread = (message['status'] != 'Read')
-                card_class = "message-card unread" if is_unread else "message-card"
+            if not my_inbox.empty:
+                for idx, message in my_inbox.iterrows():
+                    is_unread = (message['status'] != 'Read')
+                    card_class = "message-card unread" if is_unread else "message-card"
                 
-                # Display clickable message card
-                st.markdown(f"""
+                    # Display clickable message card
+                    st.markdown(f"""
                     <div class="{card_class}" onclick="
                         const el = document.getElementById('notification_{message['notification_id']}');
                         if (el) el.click();
@@ -1732,23 +2038,23 @@ with tabs[6]: # Corresponding to "📧 Mailbox"
                     </div>
                 """, unsafe_allow_html=True)
                 
-                # Hidden button to trigger Streamlit state change on click
-                if st.button(f"view_msg_{message['notification_id']}", key=f"view_msg_btn_{message['notification_id']}", help="Click to view message details", use_container_width=False):
-                    st.session_state.selected_notification_id = message['notification_id']
-                    st.session_state.mailbox_view = "view_message"
-                    st.rerun()
-        else:
-            st.info("Your inbox is empty.")
+                    # Hidden button to trigger Streamlit state change on click
+                    if st.button(f"view_msg_{message['notification_id']}", key=f"view_msg_btn_{message['notification_id']}", help="Click to view message details", use_container_width=False):
+                        st.session_state.selected_notification_id = message['notification_id']
+                        st.session_state.mailbox_view = "view_message"
+                        st.rerun()
+            else:
+                st.info("Your inbox is empty.")
 
-    elif st.session_state.mailbox_view == "sent":
-        st.markdown("### Sent Messages")
-        my_sent_messages = notifications_df[notifications_df['sender_role'] == user_role].sort_values(by="timestamp", ascending=False)
-        # Filter out replies for initial view (only show top-level messages)
-        my_sent_messages = my_sent_messages[my_sent_messages['parent_notification_id'].isna()]
+        elif st.session_state.mailbox_view == "sent":
+            st.markdown("### Sent Messages")
+            my_sent_messages = notifications_df[notifications_df['sender_role'] == user_role].sort_values(by="timestamp", ascending=False)
+            # Filter out replies for initial view (only show top-level messages)
+            my_sent_messages = my_sent_messages[my_sent_messages['parent_notification_id'].isna()]
 
-        if not my_sent_messages.empty:
-            for idx, message in my_sent_messages.iterrows():
-                st.markdown(f"""
+            if not my_sent_messages.empty:
+                for idx, message in my_sent_messages.iterrows():
+                    st.markdown(f"""
                     <div class="message-card" onclick="
                         const el = document.getElementById('notification_{message['notification_id']}');
                         if (el) el.click();
@@ -1763,56 +2069,53 @@ with tabs[6]: # Corresponding to "📧 Mailbox"
                     </div>
                 """, unsafe_allow_html=True)
                 
-                if st.button(f"view_sent_msg_{message['notification_id']}", key=f"view_sent_msg_btn_{message['notification_id']}", help="Click to view message details", use_container_width=False):
-                    st.session_state.selected_notification_id = message['notification_id']
-                    st.session_state.mailbox_view = "view_message"
-                    st.rerun()
-        else:
-            st.info("You haven't sent any messages yet.")
-
-    elif st.session_state.mailbox_view == "compose":
-        st.markdown("### Compose New Message")
-        with st.form("new_message_form"):
-            recipient_options = [r for r in user_roles if r != user_role] + supplier_df['supplier_name'].tolist() # Allow sending to roles or specific suppliers
-            new_recipient = st.selectbox("Recipient", [''] + sorted(list(set(recipient_options))), key="new_msg_recipient")
-            new_subject = st.text_input("Subject", key="new_msg_subject")
-            new_message_body = st.text_area("Message", height=200, key="new_msg_body")
+                    if st.button(f"view_sent_msg_{message['notification_id']}", key=f"view_sent_msg_btn_{message['notification_id']}", help="Click to view message details", use_container_width=False):
+                        st.session_state.selected_notification_id = message['notification_id']
+                        st.session_state.mailbox_view = "view_message"
+                        st.rerun()
+            else:
+                st.info("You haven't sent any messages yet.")
+
+        elif st.session_state.mailbox_view == "compose":
+            st.markdown("### Compose New Message")
+            with st.form("new_message_form"):
+                recipient_options = [r for r in user_roles if r != user_role] + supplier_names() # Allow sending to roles or specific suppliers
+                new_recipient = st.selectbox("Recipient", [''] + sorted(list(set(recipient_options))), key="new_msg_recipient", persist_state="session")
+                new_subject = st.text_input("Subject", key="new_msg_subject", persist_state="session")
+                new_message_body = st.text_area("Message", height=200, key="new_msg_body", persist_state="session")
             
-            send_message_btn = st.form_submit_button("Send Message")
-
-            if send_message_btn:
-                if new_recipient and new_subject and new_message_body:
-                    notification_id = "NOTIF" + str(len(notifications_df) + 1).zfill(4)
-                    new_entry = pd.DataFrame([{
-                        "notification_id": notification_id,
-                        "sender_role": user_role,
-                        "recipient_role": new_recipient,
-                        "subject": new_subject,
-                        "message": new_message_body,
-                        "timestamp": datetime.now().isoformat(),
-                        "status": "Sent",
-                        "parent_notification_id": None
-                    }])
-                    append_data(NOTIFICATIONS_FILE, new_entry)
-                    st.session_state.notifications_df = load_data(NOTIFICATIONS_FILE, columns=notification_columns) # Reload
-                    st.success("Message sent successfully!")
-                    st.session_state.mailbox_view = "sent" # Go to sent items after sending
-                    st.rerun()
-                else:
-                    st.error("Please fill in Recipient, Subject, and Message.")
+                send_message_btn = st.form_submit_button("Send Message")
 
-    elif st.session_state.mailbox_view == "view_message":
-        if st.session_state.selected_notification_id:
-            selected_message = notifications_df[notifications_df['notification_id'] == st.session_state.selected_notification_id].iloc[0]
+                if send_message_btn:
+                    if new_recipient and new_subject and new_message_body:
+                        notification_id = allocate_id(NOTIFICATIONS_FILE, "NOTIF")
+                        new_entry = pd.DataFrame([{
+                            "notification_id": notification_id,
+                            "sender_role": user_role,
+                            "recipient_role": new_recipient,
+                            "subject": new_subject,
+                            "message": new_message_body,
+                            "timestamp": datetime.now().isoformat(),
+                            "status": "Sent",
+                            "parent_notification_id": None
+                        }])
+                        append_data(NOTIFICATIONS_FILE, new_entry)
+                        st.session_state.notifications_df = load_data(NOTIFICATIONS_FILE, columns=notification_columns) # Reload
+                        st.success("Message sent successfully!")
+                        st.session_state.mailbox_view = "sent" # Go to sent items after sending
+                        st.rerun()
+                    else:
+                        st.error("Please fill in Recipient, Subject, and Message.")
 
-            # Mark as read if it's an inbox message
-            if selected_message['recipient_role'] == user_role and selected_message['status'] != 'Read':
-                idx = notifications_df[notifications_df['notification_id'] == st.session_state.selected_notification_id].index[0]
-                notifications_df.loc[idx, 'status'] = 'Read'
-                update_data(NOTIFICATIONS_FILE, notifications_df)
-                st.session_state.notifications_df = notifications_df # Update session state
+        elif st.session_state.mailbox_view == "view_message":
+            if st.session_state.selected_notification_id:
+                selected_message = notifications_df[notifications_df['notification_id'] == st.session_state.selected_notification_id].iloc[0]
 
-            st.markdown(f"""
+                # Mark as read if it's an inbox message
+                if selected_message['recipient_role'] == user_role and selected_message['status'] != 'Read':
+                    set_notification_status(st.session_state.selected_notification_id, 'Read')
+
+                st.markdown(f"""
                 <div class="message-detail-view">
                     <h4>Subject: {selected_message['subject']}</h4>
                     <p><strong>From:</strong> {selected_message['sender_role']}</p>
@@ -1823,133 +2126,124 @@ with tabs[6]: # Corresponding to "📧 Mailbox"
                 </div>
             """, unsafe_allow_html=True)
 
-            # Display replies (if any)
-            st.markdown("<div class='reply-list'>", unsafe_allow_html=True)
-            replies_to_message = notifications_df[
-                notifications_df['parent_notification_id'] == st.session_state.selected_notification_id
-            ].sort_values(by='timestamp', ascending=True)
+                # Display replies (if any)
+                st.markdown("<div class='reply-list'>", unsafe_allow_html=True)
+                replies_to_message = notifications_df[
+                    notifications_df['parent_notification_id'] == st.session_state.selected_notification_id
+                ].sort_values(by='timestamp', ascending=True)
 
-            if not replies_to_message.empty:
-                st.markdown("<h5>Conversation History:</h5>")
-                for _, reply in replies_to_message.iterrows():
-                    st.markdown(f"""
+                if not replies_to_message.empty:
+                    st.markdown("<h5>Conversation History:</h5>")
+                    for _, reply in replies_to_message.iterrows():
+                        st.markdown(f"""
                         <div class="single-reply">
                             <div class="reply-meta">From: {reply['sender_role']} on {pd.to_datetime(reply['timestamp']).strftime('%Y-%m-%d %H:%M')}</div>
                             <div>{reply['message']}</div>
                         </div>
                     """, unsafe_allow_html=True)
-            st.markdown("</div>", unsafe_allow_html=True)
+                st.markdown("</div>", unsafe_allow_html=True)
 
-            # Reply section (only if recipient or sender matches current user)
-            if user_role == selected_message['recipient_role'] or user_role == selected_message['sender_role']:
-                st.markdown("<div class='reply-section'>", unsafe_allow_html=True)
-                with st.form("reply_message_form", clear_on_submit=True):
-                    reply_text = st.text_area("Reply to this message:", height=100, key="reply_text_area")
+                # Reply section (only if recipient or sender matches current user)
+                if user_role == selected_message['recipient_role'] or user_role == selected_message['sender_role']:
+                    st.markdown("<div class='reply-section'>", unsafe_allow_html=True)
+                    with st.form("reply_message_form", clear_on_submit=True):
+                        reply_text = st.text_area("Reply to this message:", height=100, key="reply_text_area", persist_state="session")
                     
-                    if st.form_submit_button("Send Reply"):
-                        if reply_text:
-                            reply_id = "NOTIF" + str(len(notifications_df) + 1).zfill(4)
-                            reply_entry = pd.DataFrame([{
-                                "notification_id": reply_id,
-                                "sender_role": user_role,
-                                "recipient_role": selected_message['sender_role'] if user_role == selected_message['recipient_role'] else selected_message['recipient_role'], # Reply to sender if you are recipient, else to recipient
-                                "subject": f"Re: {selected_message['subject']}",
-                                "message": reply_text,
-                                "timestamp": datetime.now().isoformat(),
-                                "status": "Sent",
-                                "parent_notification_id": selected_message['notification_id']
-                            }])
-                            append_data(NOTIFICATIONS_FILE, reply_entry)
-                            st.session_state.notifications_df = load_data(NOTIFICATIONS_FILE, columns=notification_columns) # Reload
+                        if st.form_submit_button("Send Reply"):
+                            if reply_text:
+                                reply_id = allocate_id(NOTIFICATIONS_FILE, "NOTIF")
+                                reply_entry = pd.DataFrame([{
+                                    "notification_id": reply_id,
+                                    "sender_role": user_role,
+                                    "recipient_role": selected_message['sender_role'] if user_role == selected_message['recipient_role'] else selected_message['recipient_role'], # Reply to sender if you are recipient, else to recipient
+                                    "subject": f"Re: {selected_message['subject']}",
+                                    "message": reply_text,
+                                    "timestamp": datetime.now().isoformat(),
+                                    "status": "Sent",
+                                    "parent_notification_id": selected_message['notification_id']
+                                }])
+                                append_data(NOTIFICATIONS_FILE, reply_entry)
+                                st.session_state.notifications_df = load_data(NOTIFICATIONS_FILE, columns=notification_columns) # Reload
                             
-                            # Update original message status to 'Replied' if current user is the recipient
-                            if user_role == selected_message['recipient_role']:
-                                idx = notifications_df[notifications_df['notification_id'] == selected_message['notification_id']].index[0]
-                                notifications_df.loc[idx, 'status'] = 'Replied'
-                                update_data(NOTIFICATIONS_FILE, notifications_df)
-                                st.session_state.notifications_df = notifications_df # Update session state
-
-                            st.success("Reply sent!")
-                            st.rerun() # Rerun to show new reply and update status
-                        else:
-                            st.warning("Reply cannot be empty.")
-                st.markdown("</div>", unsafe_allow_html=True)
+                                # Update original message status to 'Replied' if current user is the recipient
+                                if user_role == selected_message['recipient_role']:
+                                    set_notification_status(selected_message['notification_id'], 'Replied')
+
+                                st.success("Reply sent!")
+                                st.rerun() # Rerun to show new reply and update status
+                            else:
+                                st.warning("Reply cannot be empty.")
+                    st.markdown("</div>", unsafe_allow_html=True)
+                else:
+                    st.info("You can only reply to messages you sent or received.")
             else:
-                st.info("You can only reply to messages you sent or received.")
-        else:
-            st.warning("No message selected.")
+                st.warning("No message selected.")
 
-    st.markdown('</div>', unsafe_allow_html=True)
+        st.markdown('</div>', unsafe_allow_html=True)
 
 
 # --- Calendar Module ---
-with tabs[7]: # Corresponding to "🗓️ Calendar"
-    st.subheader("Event Calendar")
-    st.markdown("View upcoming events, meetings, and deadlines.")
-
-    events_df = st.session_state.events_df
-
-    if user_role not in ["OEM", "Supplier A", "Supplier B", "Auditor"]:
-        st.warning("🔒 You must be logged in as 'OEM', 'Supplier', or 'Auditor' to view the Calendar.")
-    else:
-        st.markdown("### Create New Event")
-        with st.form("new_event_form"):
-            new_event_title = st.text_input("Event Title", key="new_event_title")
-            new_event_description = st.text_area("Description", key="new_event_desc")
-            
-            col_event_date1, col_event_date2 = st.columns(2)
-            with col_event_date1:
-                new_event_start_date = st.date_input("Start Date", value=datetime.today(), key="new_event_start_date")
-            with col_event_date2:
-                new_event_end_date = st.date_input("End Date", value=datetime.today() + timedelta(hours=1), key="new_event_end_date") # Default to same day
-
-            # Attendees can be roles or specific supplier names
-            all_attendee_options = user_roles + supplier_df['supplier_name'].tolist()
-            new_event_attendees = st.multiselect("Attendees (Roles or Specific Suppliers)", sorted(list(set(all_attendee_options))), key="new_event_attendees")
-
-            submit_event = st.form_submit_button("Add Event")
-
-            if submit_event:
-                if new_event_title and new_event_start_date and new_event_end_date:
-                    event_id = "EVENT" + str(len(events_df) + 1).zfill(4)
-                    new_entry = pd.DataFrame([{
-                        "event_id": event_id,
-                        "title": new_event_title,
-                        "description": new_event_description,
-                        "start_date": new_event_start_date.isoformat(),
-                        "end_date": new_event_end_date.isoformat(),
-                        "attendees": str(new_event_attendees), # Store list as string
-                        "created_by": user_role,
-                        "timestamp": datetime.now().isoformat()
-                    }])
-                    append_data(EVENTS_FILE, new_entry)
-                    st.session_state.events_df = load_data(EVENTS_FILE, columns=event_columns) # Reload
-                    # Ensure 'attendees' column is parsed as list when reloaded
-                    st.session_state.events_df['attendees'] = st.session_state.events_df['attendees'].apply(lambda x: eval(x) if isinstance(x, str) else [])
-                    st.success(f"Event '{new_event_title}' added successfully!")
-                    st.rerun()
-                else:
-                    st.error("Please fill in Event Title, Start Date, and End Date.")
+if tabs[7].open: # Only the selected module runs; the others keep their widget state
+    with tabs[7], module_timer(tab_titles[7]): # Corresponding to "🗓️ Calendar"
+        st.subheader("Event Calendar")
+        st.markdown("View upcoming events, meetings, and deadlines.")
 
-        st.markdown("### Upcoming Events")
+        events_df = st.session_state.events_df
 
-        if not events_df.empty:
-            # Convert date columns to datetime objects
-            events_df['start_date'] = pd.to_datetime(events_df['start_date'], errors='coerce')
-            events_df['end_date'] = pd.to_datetime(events_df['end_date'], errors='coerce')
+        if user_role not in ["OEM", "Supplier A", "Supplier B", "Auditor"]:
+            st.warning("🔒 You must be logged in as 'OEM', 'Supplier', or 'Auditor' to view the Calendar.")
+        else:
+            st.markdown("### Create New Event")
+            with st.form("new_event_form"):
+                new_event_title = st.text_input("Event Title", key="new_event_title")
+                new_event_description = st.text_area("Description", key="new_event_desc")
             
-            # Filter events for current user
-            # User is an attendee if their role is in the 'attendees' list or their specific supplier name is in it
-            user_specific_events = events_df[
-                events_df['attendees'].apply(lambda x: user_role in x if isinstance(x, list) else False)
-            ].copy() # Use .copy() to avoid SettingWithCopyWarning
+                col_event_date1, col_event_date2 = st.columns(2)
+                with col_event_date1:
+                    new_event_start_date = st.date_input("Start Date", value=datetime.today(), key="new_event_start_date")
+                with col_event_date2:
+                    new_event_end_date = st.date_input("End Date", value=datetime.today() + timedelta(hours=1), key="new_event_end_date") # Default to same day
+
+                # Attendees can be roles or specific supplier names
+                all_attendee_options = user_roles + supplier_names()
+                new_event_attendees = st.multiselect("Attendees (Roles or Specific Suppliers)", sorted(list(set(all_attendee_options))), key="new_event_attendees")
+
+                submit_event = st.form_submit_button("Add Event")
+
+                if submit_event:
+                    if new_event_title and new_event_start_date and new_event_end_date:
+                        event_id = allocate_id(EVENTS_FILE, "EVENT")
+                        new_entry = pd.DataFrame([{
+                            "event_id": event_id,
+                            "title": new_event_title,
+                            "description": new_event_description,
+                            "start_date": new_event_start_date.isoformat(),
+                            "end_date": new_event_end_date.isoformat(),
+                            "attendees": new_event_attendees, # Stored as a JSON array
+                            "created_by": user_role,
+                            "timestamp": datetime.now().isoformat()
+                        }])
+                        append_data(EVENTS_FILE, new_entry)
+                        st.session_state.events_df = load_data(EVENTS_FILE, columns=event_columns) # Reload
+                        st.success(f"Event '{new_event_title}' added successfully!")
+                        st.rerun()
+                    else:
+                        st.error("Please fill in Event Title, Start Date, and End Date.")
 
-            # Filter for upcoming events
-            upcoming_events = user_specific_events[user_specific_events['end_date'] >= datetime.now()].sort_values(by='start_date', ascending=True)
+            st.markdown("### Upcoming Events")
 
-            if not upcoming_events.empty:
-                for idx, event in upcoming_events.iterrows():
-                    st.markdown(f"""
+            if not events_df.empty:
+                # Filter events for current user
+                # User is an attendee if their role is in the 'attendees' list or their specific supplier name is in it
+                attendee_rows = list_membership(EVENTS_FILE, events_df, 'attendees') # attendee -> event rows, built once per data version
+                user_specific_events = events_df.loc[attendee_rows.get(user_role, [])]
+
+                # Filter for upcoming events
+                upcoming_events = user_specific_events[user_specific_events['end_date'] >= datetime.now()].sort_values(by='start_date', ascending=True)
+
+                if not upcoming_events.empty:
+                    for idx, event in upcoming_events.iterrows():
+                        st.markdown(f"""
                         <div class="message-card">
                             <h5>🗓️ {event['title']}</h5>
                             <p><strong>Description:</strong> {event['description']}</p>
@@ -1958,8 +2252,16 @@ with tabs[7]: # Corresponding to "🗓️ Calendar"
                             <p><strong>Created By:</strong> {event['created_by']}</p>
                         </div>
                     """, unsafe_allow_html=True)
+                else:
+                    st.info(f"No upcoming events found for {user_role}.")
             else:
-                st.info(f"No upcoming events found for {user_role}.")
-        else:
-            st.info("No events added yet.")
+                st.info("No events added yet.")
+
 
+# --- Shared Data Cache Diagnostics ---
+cache_info = cache_stats()
+st.sidebar.caption(
+    f"Data cache: {cache_info['hits']} hits / {cache_info['misses']} misses · "
+    f"{cache_info['tables']} tables, {cache_info['bytes'] / 1e6:.1f} MB shared across sessions"
+)
+show_rerun_timing(tab_titles)
@@ -0,0 +1,69 @@
+"""Before/after benchmark for storing uploads in the content-addressed blob store.
+
+Writes a synthetic upload (default 200 MB) the way File Management used to
+(read the whole file into memory, write it under a timestamped name) and
+through blobstore.stage + commit, reporting time and peak Python memory. The
+same content is then stored again to show it is deduplicated.
+
+    python benchmarks/bench_blobstore.py --mb 200
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import blobstore  # noqa: E402
+
+
+def measured(label, fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{label:<45} {elapsed * 1000:>10.1f} ms {peak / 1e6:>10.1f} MB peak")
+
+
+def disk_usage(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mb", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        upload = os.path.join(data_dir, "upload.bin")
+        with open(upload, "wb") as f:
+            for _ in range(args.mb):
+                f.write(os.urandom(1024 * 1024))
+        print(f"{args.mb} MB upload, {blobstore.CHUNK_SIZE // 1024} KB chunks\n")
+
+        legacy_dir = os.path.join(data_dir, "uploaded_files")
+        os.makedirs(legacy_dir)
+
+        def write_whole_file(copy):
+            with open(upload, "rb") as src, open(os.path.join(legacy_dir, f"{copy}_upload.bin"), "wb") as f:
+                f.write(src.read())
+
+        blob_dir = os.path.join(data_dir, "blobs")
+
+        def store_blob():
+            with open(upload, "rb") as src:
+                blobstore.stage(src, blob_dir).commit()
+
+        measured("before: read whole file + write", lambda: write_whole_file(1))
+        measured("before: same file uploaded again", lambda: write_whole_file(2))
+        measured("after: blobstore stage + commit", store_blob)
+        measured("after: same content uploaded again", store_blob)
+        print(f"\n{'disk used, before (2 uploads)':<45} {disk_usage(legacy_dir) / 1e6:>10.1f} MB")
+        print(f"{'disk used, after (2 uploads)':<45} {disk_usage(blob_dir) / 1e6:>10.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Before/after benchmark for the OEM Dashboard's charts (charts.py).
+
+Builds a synthetic supplier table (default 1M rows) and times the six
+dashboard charts as st.plotly_chart sends them: built, validated and turned
+into JSON. Before: Plotly Express over the whole frame, so the histogram and
+box plots carry every value. After: bins, quartiles and counts computed on the
+server, with the figure cached per table version and theme. The payload size
+is printed alongside.
+
+    python benchmarks/bench_dashboard_charts.py --rows 1000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+import plotly
+import plotly.express as px
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import charts  # noqa: E402
+import kpis  # noqa: E402
+import storage  # noqa: E402
+from bench_schema import SUPPLIER_SCHEMA  # noqa: E402
+from bench_snapshots import build_table  # noqa: E402
+
+THEME = "plotly_dark"
+AGGREGATES = {
+    "risk_levels": kpis.CountBy("risk_level"),
+    "agreement_statuses": kpis.CountBy("agreement_status", missing="Unknown"),
+    "spend_by_category": kpis.SumBy("annual_spend_usd", "primary_product_category"),
+}
+
+
+def sent(figure):
+    """What st.plotly_chart does with a figure: validate it and serialize it."""
+    figure = plotly.tools.return_figure_from_figure_or_data(figure, validate_figure=True)
+    return plotly.io.to_json(figure, validate=False)
+
+
+def before(df, view):
+    """The dashboard's old per-render charts."""
+    status_counts = pd.DataFrame(list(view["agreement_statuses"].items()), columns=["Status", "Count"])
+    risk_counts = pd.DataFrame(list(view["risk_levels"].items()), columns=["Risk Level", "Count"])
+    spend = pd.DataFrame(list(view["spend_by_category"].items()), columns=["primary_product_category", "annual_spend_usd"])
+    figures = [
+        px.pie(status_counts, values="Count", names="Status", hole=0.3, template=THEME),
+        px.histogram(df, x="last_audit_score", nbins=10, template=THEME),
+        px.box(df, y="on_time_delivery_rate", template=THEME),
+        px.box(df, y="quality_reject_rate", template=THEME),
+        px.pie(risk_counts, values="Count", names="Risk Level", hole=0.3, template=THEME),
+        px.bar(spend, x="primary_product_category", y="annual_spend_usd", template=THEME),
+    ]
+    return [sent(figure) for figure in figures]
+
+
+def after(df, path, view):
+    figures = [
+        charts.pie(path, view.version, view["agreement_statuses"], "Status", "Agreement Status", THEME),
+        charts.histogram(df, "last_audit_score", 10, "Last Audit Scores", "Audit Score", "#1890FF", THEME),
+        charts.box(df, "on_time_delivery_rate", "On-Time Delivery Rate", "#52C41A", THEME),
+        charts.box(df, "quality_reject_rate", "Quality Reject Rate", "#FF4D4F", THEME),
+        charts.pie(path, view.version, view["risk_levels"], "Risk Level", "Risk Levels", THEME, order=["Low", "Medium", "High"]),
+        charts.bar(path, view.version, view["spend_by_category"], "Product Category", "Annual Spend (USD)", "Spend", THEME),
+    ]
+    return [sent(figure) for figure in figures]
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    size = sum(len(spec) for spec in result) / 1e6
+    print(f"{label:<44} {(time.perf_counter() - start) * 1000:>10.1f} ms {size:>10.2f} MB sent")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        path = os.path.join(data_dir, "supplier_dummy_data.csv")
+        build_table(path, args.rows)
+        if storage.get_engine().name == "sqlite":
+            storage.migrate_csv_to_sqlite(data_dir)
+        df = storage.load_data(path, SUPPLIER_SCHEMA)
+        view = kpis.kpi_view(path, SUPPLIER_SCHEMA, "dashboard", AGGREGATES)
+        print(f"engine={storage.get_engine().name}, {args.rows:,} supplier rows\n")
+
+        timed("before: every render", lambda: before(df, view))
+        timed("after: first render (aggregates, builds)", lambda: after(df, path, view))
+        timed("after: every later render", lambda: after(df, path, view))
+
+        storage.upsert_row(path, "SUP0000001", {"last_audit_score": 0})
+        df = storage.load_data(path, SUPPLIER_SCHEMA) # The dashboard reloads the frame after a write anyway
+        view = kpis.kpi_view(path, SUPPLIER_SCHEMA, "dashboard", AGGREGATES)
+        timed("after: render after a write", lambda: after(df, path, view))
+        timed("after: the render after that", lambda: after(df, path, view))
+
+
+if __name__ == "__main__":
+    main()
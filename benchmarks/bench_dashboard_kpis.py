@@ -0,0 +1,105 @@
+"""Before/after benchmark for the OEM Dashboard's supplier aggregates (kpis.kpi_view).
+
+Builds a synthetic supplier table (default 1M rows) and times what a
+dashboard render aggregates. Before: means, value counts, spend per category,
+badge counts and alert lists recomputed from the frame on every render.
+After: the KPI view, computed once and then updated by each write, so a
+render reads a few numbers and small dicts.
+
+    python benchmarks/bench_dashboard_kpis.py --rows 1000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import kpis  # noqa: E402
+import storage  # noqa: E402
+from bench_schema import SUPPLIER_SCHEMA  # noqa: E402
+from bench_snapshots import build_table  # noqa: E402
+
+AGGREGATES = {
+    "suppliers": kpis.Count(),
+    "avg_on_time_delivery": kpis.Mean("on_time_delivery_rate"),
+    "avg_quality_reject": kpis.Mean("quality_reject_rate"),
+    "risk_levels": kpis.CountBy("risk_level"),
+    "agreement_statuses": kpis.CountBy("agreement_status", missing="Unknown"),
+    "spend_by_category": kpis.SumBy("annual_spend_usd", "primary_product_category"),
+    "otd_champions": kpis.Count("on_time_delivery_rate >= 98.0"),
+    "quality_stars": kpis.Count("quality_reject_rate <= 0.1"),
+    "audit_excellence": kpis.Count("last_audit_score = 100"),
+    "low_risk_partners": kpis.Count('risk_level = "Low"'),
+    "high_reject": kpis.Keys("quality_reject_rate > 1.5"),
+    "pending_renewal": kpis.Keys('agreement_status = "Pending Renewal"'),
+    "reviews": kpis.KeysBy("last_performance_review_date"),
+}
+
+
+def before(df):
+    """The dashboard's old per-render aggregation."""
+    now = datetime.now()
+    return {
+        "suppliers": len(df),
+        "avg_on_time_delivery": df["on_time_delivery_rate"].mean(),
+        "avg_quality_reject": df["quality_reject_rate"].mean(),
+        "risk_levels": df["risk_level"].value_counts().to_dict(),
+        "agreement_statuses": df["agreement_status"].astype(str).replace("nan", "Unknown").value_counts().to_dict(),
+        "spend_by_category": df.groupby("primary_product_category", observed=True)["annual_spend_usd"].sum().to_dict(),
+        "otd_champions": int((df["on_time_delivery_rate"] >= 98.0).sum()),
+        "quality_stars": int((df["quality_reject_rate"] <= 0.1).sum()),
+        "audit_excellence": int((df["last_audit_score"] == 100).sum()),
+        "low_risk_partners": int((df["risk_level"] == "Low").sum()),
+        "high_reject": len(df[df["quality_reject_rate"] > 1.5]),
+        "pending_renewal": len(df[df["agreement_status"] == "Pending Renewal"]),
+        "overdue_reviews": len(df[(now - df["last_performance_review_date"]).dt.days > 365]),
+    }
+
+
+def after(path):
+    view = kpis.kpi_view(path, SUPPLIER_SCHEMA, "dashboard", AGGREGATES)
+    today = pd.Timestamp.today().normalize()
+    found = {name: view[name] for name in AGGREGATES if name != "reviews"}
+    found["overdue_reviews"] = view.count("reviews", None, today - pd.Timedelta(days=365))
+    return found
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"{label:<44} {(time.perf_counter() - start) * 1000:>10.1f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        path = os.path.join(data_dir, "supplier_dummy_data.csv")
+        build_table(path, args.rows)
+        if storage.get_engine().name == "sqlite":
+            storage.migrate_csv_to_sqlite(data_dir)
+        df = storage.load_data(path, SUPPLIER_SCHEMA)
+        print(f"engine={storage.get_engine().name}, {args.rows:,} supplier rows\n")
+
+        expected = timed("before: every render", lambda: before(df))
+        timed("after: first render (computes the view)", lambda: after(path))
+        found = timed("after: every later render", lambda: after(path))
+        for name in ("suppliers", "otd_champions", "quality_stars", "high_reject", "pending_renewal", "overdue_reviews"):
+            assert found[name] == expected[name], name
+        assert abs(found["avg_on_time_delivery"] - expected["avg_on_time_delivery"]) < 1e-6
+
+        timed("after: upsert_row (view updated)", lambda: storage.upsert_row(path, "SUP0000001", {"quality_reject_rate": 2.5}))
+        timed("after: another upsert_row", lambda: storage.upsert_row(path, "SUP0000002", {"risk_level": "High"}))
+        found = timed("after: render after the writes", lambda: after(path))
+        assert found["high_reject"] >= expected["high_reject"]
+
+
+if __name__ == "__main__":
+    main()
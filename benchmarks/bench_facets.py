@@ -0,0 +1,74 @@
+"""Before/after benchmark for the "Advanced Search & Filters" expander (facets.column_facet).
+
+Builds a synthetic supplier table (default 1M rows) and times what the
+expander computes on every rerun: which columns are filterable, plus the
+values or range of the chosen column. Before: unique()/min()/max() over the
+frame each time. After: the table's facets, counted once and then kept current
+through writes.
+
+    python benchmarks/bench_facets.py --rows 1000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import facets  # noqa: E402
+import storage  # noqa: E402
+from bench_schema import SUPPLIER_SCHEMA  # noqa: E402
+from bench_snapshots import build_table  # noqa: E402
+
+
+def before(df, column):
+    """The expander's old per-rerun work."""
+    filterable = [col for col in df.columns if pd.api.types.is_string_dtype(df[col]) or len(df[col].unique()) <= 20]
+    values = sorted(str(val) for val in df[column].dropna().unique().tolist())
+    return filterable, values, float(df["annual_spend_usd"].min()), float(df["annual_spend_usd"].max())
+
+
+def after(df, column):
+    column_facets = {col: facets.column_facet(df, col) for col in df.columns}
+    filterable = [col for col in df.columns if pd.api.types.is_string_dtype(df[col])
+                  or (column_facets[col].distinct is not None and column_facets[col].distinct <= 20)]
+    values = sorted(str(val) for val in column_facets[column].values())
+    return filterable, values, column_facets["annual_spend_usd"].min, column_facets["annual_spend_usd"].max
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"{label:<44} {(time.perf_counter() - start) * 1000:>10.1f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        path = os.path.join(data_dir, "supplier_dummy_data.csv")
+        build_table(path, args.rows)
+        if storage.get_engine().name == "sqlite":
+            storage.migrate_csv_to_sqlite(data_dir)
+        df = storage.load_data(path, SUPPLIER_SCHEMA)
+        print(f"{args.rows:,} supplier rows, {len(df.columns)} columns\n")
+
+        expected = timed("before: every rerun", lambda: before(df, "risk_level"))
+        timed("after: first rerun (counts every column)", lambda: after(df, "risk_level"))
+        found = timed("after: every later rerun", lambda: after(df, "risk_level"))
+        assert found[0] == expected[0] and found[1] == expected[1] and found[2:] == expected[2:]
+
+        timed("after: upsert_row (facets updated)", lambda: storage.upsert_row(path, "SUP0000001", {"risk_level": "Critical"}))
+        timed("after: another upsert_row", lambda: storage.upsert_row(path, "SUP0000002", {"annual_spend_usd": 1}))
+        df = storage.load_data(path, SUPPLIER_SCHEMA)
+        found = timed("after: next rerun", lambda: after(df, "risk_level"))
+        assert "Critical" in found[1]
+
+
+if __name__ == "__main__":
+    main()
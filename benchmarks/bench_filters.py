@@ -0,0 +1,76 @@
+"""Before/after benchmark for compound filter expressions (filters.filter_rows).
+
+Builds a synthetic supplier table (default 1M rows) and times "High risk AND
+spend > 500k AND contract ends in 2025 or later". Before: one column filter per
+rerun, each re-filtering from scratch, as the single-column filter was used.
+After: the expression compiled to one mask, first evaluated over the table
+and then served from the per-version cache (also for a searched subset).
+
+    python benchmarks/bench_filters.py --rows 1000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import filters  # noqa: E402
+import search  # noqa: E402
+import storage  # noqa: E402
+from bench_schema import SUPPLIER_SCHEMA  # noqa: E402
+from bench_snapshots import build_table  # noqa: E402
+
+EXPRESSION = 'risk_level in ("High", "Medium") and annual_spend_usd > 500k and contract_end_date >= "2025-01-01"'
+
+
+def before(df):
+    """Three reruns, each applying the filters chosen so far to the whole frame."""
+    steps = [
+        lambda frame: frame[frame["risk_level"].astype(str).isin(["High", "Medium"])],
+        lambda frame: frame[(frame["annual_spend_usd"] > 500_000)],
+        lambda frame: frame[frame["contract_end_date"] >= pd.Timestamp("2025-01-01")],
+    ]
+    for rerun in range(1, len(steps) + 1):
+        filtered = df
+        for step in steps[:rerun]:
+            filtered = step(filtered)
+    return filtered
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"{label:<48} {(time.perf_counter() - start) * 1000:>10.1f} ms {len(result):>10,} rows")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        path = os.path.join(data_dir, "supplier_dummy_data.csv")
+        build_table(path, args.rows)
+        if storage.get_engine().name == "sqlite":
+            storage.migrate_csv_to_sqlite(data_dir)
+        df = storage.load_data(path, SUPPLIER_SCHEMA)
+        print(f"{args.rows:,} supplier rows\n{EXPRESSION}\n")
+
+        expected = timed("before: three reruns, filtering from scratch", lambda: before(df))
+        timed("after: parse + evaluate (first time)", lambda: filters.filter_rows(df, EXPRESSION))
+        found = timed("after: every later rerun (cached)", lambda: filters.filter_rows(df, EXPRESSION))
+        assert found.index.equals(expected.index)
+        hits = search.search_rows(df, "global")
+        timed(f"after: within {len(hits):,} search hits", lambda: filters.filter_rows(hits, EXPRESSION))
+
+        storage.upsert_row(path, "SUP0000001", {"risk_level": "High"})
+        df = storage.load_data(path, SUPPLIER_SCHEMA)
+        timed("after: first rerun after a write", lambda: filters.filter_rows(df, EXPRESSION))
+
+
+if __name__ == "__main__":
+    main()
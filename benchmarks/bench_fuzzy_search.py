@@ -0,0 +1,76 @@
+"""Benchmark for fuzzy supplier search (search.fuzzy_rows) at 1M suppliers.
+
+Builds a synthetic supplier table, times building the trigram index over
+supplier_name, contact_person, email and account_manager on the first
+misspelled search, then the top-k lookups for a few misspellings and the
+lookup after a write (the index takes the write in, it is not rebuilt).
+
+    python benchmarks/bench_fuzzy_search.py --rows 1000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import search  # noqa: E402
+import storage  # noqa: E402
+from bench_schema import SUPPLIER_SCHEMA  # noqa: E402
+from bench_snapshots import build_table  # noqa: E402
+
+COLUMNS = ["supplier_name", "contact_person", "email", "account_manager"]
+QUERIES = ["Precison Manufacturing", "globl parts 4242", "alice smth", "techsolutons@example", "Sara Le"]
+
+
+def timed(fn, repeat=1):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=search.FUZZY_LIMIT)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        path = os.path.join(data_dir, "supplier_dummy_data.csv")
+        build_table(path, args.rows)
+        df = pd.read_csv(path)
+        df["supplier_name"] = df["supplier_name"] + " " + rng.integers(0, 100_000, len(df)).astype(str)
+        df.to_csv(path, index=False)
+        if storage.get_engine().name == "sqlite":
+            storage.migrate_csv_to_sqlite(data_dir)
+
+        df = storage.load_data(path, SUPPLIER_SCHEMA)
+        print(f"engine={storage.get_engine().name}, {len(df):,} supplier rows, top {args.limit}\n")
+        build, _ = timed(lambda: search.fuzzy_rows(df, "x", COLUMNS, args.limit))
+        print(f"trigram index build (first fuzzy search)    {build:>10.0f} ms\n")
+
+        print(f"{'query':<26} {'lookup':>10}  best match")
+        for query in QUERIES:
+            after, found = timed(lambda: search.fuzzy_rows(df, query, COLUMNS, args.limit), repeat=3)
+            best = found.iloc[0][COLUMNS].tolist() if len(found) else "-"
+            print(f"{query!r:<26} {after:>7.1f} ms  {best}")
+
+        index = search.table_index(df, search.TrigramIndex, COLUMNS)
+        write, _ = timed(lambda: storage.upsert_row(path, "SUP0000001", {"supplier_name": "Precison Manufacturing 7"}))
+        df = storage.load_data(path, SUPPLIER_SCHEMA)
+        after, found = timed(lambda: search.fuzzy_rows(df, "Precison Manufacturing 7", COLUMNS, args.limit))
+        assert search.table_index(df, search.TrigramIndex, COLUMNS) is index, "index was rebuilt"
+        assert found.iloc[0]["supplier_id"] == "SUP0000001"
+        print(f"\nupsert_row + index update                   {write:>10.1f} ms")
+        print(f"next fuzzy search (no rebuild)              {after:>10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Before/after benchmark for the dashboard's co-pilot insights served by the background scheduler (scheduler.py).
+
+Builds a synthetic supplier table (default 1M rows) and times dashboard
+renders interleaved with writes, reporting the median and p99. Before: the
+render evaluates the rules itself, so the first render after each write pays
+for bringing them up to date. After: the render reads the scheduler's latest
+snapshot while the scheduler refreshes it in the background.
+
+    python benchmarks/bench_insight_scheduler.py --rows 1000000 --renders 20
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import rules  # noqa: E402
+import scheduler  # noqa: E402
+import storage  # noqa: E402
+from bench_copilot_rules import supplier_rules  # noqa: E402
+from bench_snapshots import build_table  # noqa: E402
+
+
+def renders(label, path, count, render):
+    """Times count renders, each right after a write to the table. Returns when the last write finished."""
+    seconds = []
+    for i in range(count):
+        storage.upsert_row(path, f"SUP{i + 1:07d}", {"quality_reject_rate": 2.5 + i})
+        written = start = time.perf_counter()
+        render()
+        seconds.append(time.perf_counter() - start)
+    p50, p99 = np.percentile(seconds, [50, 99]) * 1000
+    print(f"{label:<44} p50 {p50:>9.2f} ms   p99 {p99:>9.2f} ms")
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--renders", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        path = os.path.join(data_dir, "supplier_dummy_data.csv")
+        build_table(path, args.rows)
+        if storage.get_engine().name == "sqlite":
+            storage.migrate_csv_to_sqlite(data_dir)
+        print(f"engine={storage.get_engine().name}, {args.rows:,} supplier rows\n")
+
+        rules.evaluate(supplier_rules(path)) # Both sides start from built views
+        renders("before: render after a write", path, args.renders, lambda: rules.evaluate(supplier_rules(path)))
+
+        insights = scheduler.scheduler_for(supplier_rules(path), os.path.join(data_dir, "insights_snapshot.json"))
+        start = time.perf_counter()
+        insights.latest()
+        print(f"{'after: first snapshot (background)':<44} {(time.perf_counter() - start) * 1000:>13.1f} ms")
+        written = renders("after: render after a write", path, args.renders, lambda: insights.latest().results)
+
+        deadline = written + 60
+        while not insights.latest().is_current() and time.perf_counter() < deadline:
+            time.sleep(0.01)
+        caught_up = time.perf_counter()
+        found = insights.latest().results
+        assert all(f"SUP{i + 1:07d}" in found["high_reject_suppliers"] for i in range(args.renders))
+        print(f"{'after: snapshot current, from the last write':<44} {(caught_up - written) * 1000:>13.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Benchmark for the KPI history store (history.py) behind the dashboard's trend charts.
+
+Records a synthetic history (default 100k suppliers over two years, about 1%
+of them changing each day) and times the range queries and charts a render
+needs. Before this store there was no history to chart: each supplier row is
+overwritten in place. For scale, the size of a plain layout is printed too:
+a float64 row per supplier per day, with its ID, as a pandas frame would hold it.
+
+    python benchmarks/bench_kpi_history.py --suppliers 100000 --days 730
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import plotly
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import charts  # noqa: E402
+import history  # noqa: E402
+
+METRICS = ["on_time_delivery_rate", "quality_reject_rate", "annual_spend_usd", "last_audit_score", "ESG_score"]
+THEME = "plotly_dark"
+
+
+def suppliers(count, rng):
+    return pd.DataFrame({
+        "supplier_id": [f"SUP{i:07d}" for i in range(count)],
+        "on_time_delivery_rate": rng.uniform(80, 100, count).round(1),
+        "quality_reject_rate": rng.uniform(0, 3, count).round(2),
+        "annual_spend_usd": rng.integers(10_000, 5_000_000, count),
+        "last_audit_score": rng.integers(50, 101, count),
+        "ESG_score": rng.uniform(40, 100, count).round(1),
+        "risk_level": rng.choice(["Low", "Medium", "High"], count),
+    })
+
+
+def drift(df, rng, share=0.01):
+    """About share of the suppliers get new delivery and reject rates."""
+    changed = rng.random(len(df)) < share
+    df.loc[changed, "on_time_delivery_rate"] = rng.uniform(80, 100, changed.sum()).round(1)
+    df.loc[changed, "quality_reject_rate"] = rng.uniform(0, 3, changed.sum()).round(2)
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"{label:<48} {(time.perf_counter() - start) * 1000:>10.1f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--suppliers", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=730)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        kpis = history.KPIHistory(os.path.join(data_dir, "kpi_history"), os.path.join(data_dir, "supplier_dummy_data.csv"), None,
+                                  METRICS, totals=["annual_spend_usd"], mix=("risk_level", ["Low", "Medium", "High"]))
+        df = suppliers(args.suppliers, rng)
+        days = pd.date_range(end=pd.Timestamp.today().normalize(), periods=args.days)
+        start = time.perf_counter()
+        for day in days:
+            drift(df, rng)
+            kpis.record(day, df)
+        seconds = time.perf_counter() - start
+        print(f"{args.suppliers:,} suppliers, {args.days} daily snapshots recorded in {seconds:.1f} s "
+              f"({seconds / args.days * 1000:.0f} ms a day)\n")
+
+        size = sum(entry.stat().st_size for entry in os.scandir(kpis.history_dir))
+        plain = args.suppliers * args.days * (len(METRICS) * 8 + 8 + 8) # float64 metrics, a day and an ID reference per row
+        print(f"{'store size':<48} {size / 1e6:>10.1f} MB")
+        print(f"{'plain daily rows (float64)':<48} {plain / 1e6:>10.1f} MB\n")
+
+        plotly.io.to_json(charts.trend(kpis.network_path, None, kpis.network()[["suppliers"]], "warm-up", "", "", THEME)) # Plotly's one-time setup
+        for label, span in [("last 90 days", 90), ("last year", 365), ("two years", 730)]:
+            begin = days[-1] - pd.Timedelta(days=span)
+            frame, resolution = timed(f"network trend, {label}", lambda: kpis.trend(begin))
+            figure = timed(f"  figure ({resolution}, {len(frame)} points) sent", lambda: plotly.io.to_json(charts.trend(
+                kpis.network_path, None, frame[["on_time_delivery_rate"]], label, "OTD", "%", THEME)))
+        supplier_id = f"SUP{args.suppliers // 2:07d}"
+        frame, resolution = timed("one supplier's trend, two years", lambda: kpis.trend(days[-1] - pd.Timedelta(days=730), supplier_id=supplier_id))
+        assert frame["on_time_delivery_rate"].notna().all()
+        assert len(figure) < 100_000
+
+
+if __name__ == "__main__":
+    main()
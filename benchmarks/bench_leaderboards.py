@@ -0,0 +1,93 @@
+"""Before/after benchmark for the dashboard's leaderboards and badges (kpis.TopK and kpis.Badges).
+
+Builds a synthetic supplier table (default 1M rows) and times what a
+dashboard render needs: the top 10 suppliers by spend, audit score, on-time
+delivery and ESG score, the four badge counts and one page of the badge table.
+Before: four full sorts and a copy of the frame with four badge columns added.
+After: top-k lists and badge bitsets kept in a KPI view and updated by each
+write, so a render reads 10 keys per leaderboard and four counts.
+
+    python benchmarks/bench_leaderboards.py --rows 1000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import kpis  # noqa: E402
+import storage  # noqa: E402
+from bench_schema import SUPPLIER_SCHEMA  # noqa: E402
+from bench_snapshots import build_table  # noqa: E402
+
+LEADERS = {"top_spend": "annual_spend_usd", "top_audit_score": "last_audit_score",
+           "top_on_time_delivery": "on_time_delivery_rate", "top_esg_score": "esg_compliance_score"}
+BADGES = {
+    "OTD Champion": "on_time_delivery_rate >= 98.0",
+    "Quality Star": "quality_reject_rate <= 0.1",
+    "Audit Excellence": "last_audit_score = 100",
+    "Low Risk Partner": 'risk_level = "Low"',
+}
+AGGREGATES = {"badges": kpis.Badges(BADGES), **{name: kpis.TopK(column, 10) for name, column in LEADERS.items()}}
+PAGE = 50
+
+
+def before(df):
+    """The dashboard's old per-render leaderboards and badge columns."""
+    leaders = {name: df.sort_values(by=column, ascending=False).head(10)["supplier_id"].tolist()
+               for name, column in LEADERS.items()}
+    gamified = df.copy()
+    gamified["OTD Champion"] = gamified["on_time_delivery_rate"] >= 98.0
+    gamified["Quality Star"] = gamified["quality_reject_rate"] <= 0.1
+    gamified["Audit Excellence"] = gamified["last_audit_score"] == 100
+    gamified["Low Risk Partner"] = gamified["risk_level"] == "Low"
+    counts = {name: int(gamified[name].sum()) for name in BADGES}
+    return leaders, counts, gamified.head(PAGE)
+
+
+def after(df, path):
+    view = kpis.kpi_view(path, SUPPLIER_SCHEMA, "leaderboards", AGGREGATES)
+    leaders = {name: view.keys(name) for name in LEADERS}
+    page = df.head(PAGE)
+    return leaders, view["badges"], page.assign(**view.flags("badges", page["supplier_id"].tolist()))
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"{label:<44} {(time.perf_counter() - start) * 1000:>10.1f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        path = os.path.join(data_dir, "supplier_dummy_data.csv")
+        build_table(path, args.rows)
+        if storage.get_engine().name == "sqlite":
+            storage.migrate_csv_to_sqlite(data_dir)
+        df = storage.load_data(path, SUPPLIER_SCHEMA)
+        print(f"engine={storage.get_engine().name}, {args.rows:,} supplier rows\n")
+
+        expected = timed("before: every render", lambda: before(df))
+        timed("after: first render (builds the view)", lambda: after(df, path))
+        found = timed("after: every later render", lambda: after(df, path))
+        assert found[1] == expected[1]
+        assert (found[2][list(BADGES)].to_numpy(dtype=bool) == expected[2][list(BADGES)].to_numpy(dtype=bool)).all()
+        for name, column in LEADERS.items(): # Ties may be ordered differently, and missing values aren't ranked
+            values = df.set_index("supplier_id")[column]
+            assert values[found[0][name]].tolist() == values[expected[0][name]].dropna().tolist(), name
+
+        storage.upsert_row(path, found[0]["top_spend"][-1], {"notes": "warm-up"}) # The csv engine indexes keys on the first write
+        leader = found[0]["top_spend"][0]
+        timed("after: upsert_row (view updated)", lambda: storage.upsert_row(path, leader, {"annual_spend_usd": 0, "risk_level": "High"}))
+        found = timed("after: render after the write", lambda: after(df, path))
+        assert leader not in found[0]["top_spend"]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Before/after benchmark for the tabs' tables (paging.page / paged_dataframe).
+
+Builds a synthetic supplier table (default 1M rows) and compares what one rerun
+sends to the browser: the whole frame, as st.dataframe used to get it, against
+one sorted page. Serialization is Streamlit's own (convert_pandas_df_to_arrow_bytes).
+
+    python benchmarks/bench_paging.py --rows 1000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import paging  # noqa: E402
+import search  # noqa: E402
+import storage  # noqa: E402
+from bench_schema import SUPPLIER_SCHEMA  # noqa: E402
+from bench_snapshots import build_table  # noqa: E402
+from streamlit.dataframe_util import convert_pandas_df_to_arrow_bytes  # noqa: E402
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = (time.perf_counter() - start) * 1000
+    size = f"{len(result) / 1e6:>9.2f} MB" if isinstance(result, bytes) else ""
+    print(f"{label:<48} {elapsed:>10.1f} ms {size}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        path = os.path.join(data_dir, "supplier_dummy_data.csv")
+        build_table(path, args.rows)
+        df = storage.load_data(path, SUPPLIER_SCHEMA)
+        print(f"{args.rows:,} supplier rows, page size {paging.PAGE_SIZE}\n")
+
+        timed("before: serialize the whole frame", lambda: convert_pandas_df_to_arrow_bytes(df))
+        timed("after: first page, table order", lambda: convert_pandas_df_to_arrow_bytes(paging.page(df, 0)))
+        timed("after: sort by annual_spend_usd (first time)", lambda: paging.page(df, 0, "annual_spend_usd", False))
+        timed("after: same page again (cached)", lambda: paging.page(df, 0, "annual_spend_usd", False))
+        timed("after: page 500 of the same order", lambda: paging.page(df, 499, "annual_spend_usd", False))
+        found = search.search_rows(df, "global")
+        timed(f"after: page 2 of {len(found):,} search hits, sorted", lambda: paging.page(found, 1, "annual_spend_usd", False))
+        timed("after: serialize one sorted page", lambda: convert_pandas_df_to_arrow_bytes(paging.page(df, 499, "annual_spend_usd", False)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Before/after benchmark for the composite supplier risk score (risk.py).
+
+Builds a synthetic supplier table (default 1M rows) and times scoring every
+supplier. Before: the score computed supplier by supplier in Python. After:
+one vectorized pass over the factor columns, done by load_data once per table
+version. Then a write: it rescores only the row written, which keeps a KPI view
+over the score (mean, high-risk count, riskiest suppliers) current.
+
+    python benchmarks/bench_risk_score.py --rows 1000000
+"""
+import argparse
+import math
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import risk  # noqa: E402
+import storage  # noqa: E402
+from bench_schema import SUPPLIER_SCHEMA  # noqa: E402
+from bench_snapshots import build_table  # noqa: E402
+from kpis import Count, Mean, TopK, kpi_view  # noqa: E402
+
+
+def before(df, model):
+    """Scores each supplier on its own, as a per-row function would."""
+    scores = []
+    columns = list(model.weights)
+    for row in df[columns].itertuples(index=False):
+        total = weight = 0.0
+        for column, value in zip(columns, row):
+            if pd.isna(value):
+                continue
+            best, worst, scale = risk.FACTORS[column][1:]
+            if scale == "days_left":
+                value = math.floor((value - model.day) / pd.Timedelta(days=1))
+            elif scale == "log10":
+                value = math.log10(max(value, 1))
+            total += min(max((value - best) / (worst - best), 0), 1) * model.weights[column]
+            weight += model.weights[column]
+        scores.append(round(100 * total / weight, 1) if weight else np.nan)
+    return np.array(scores)
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"{label:<44} {(time.perf_counter() - start) * 1000:>10.1f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        path = os.path.join(data_dir, "supplier_dummy_data.csv")
+        build_table(path, args.rows)
+        if storage.get_engine().name == "sqlite":
+            storage.migrate_csv_to_sqlite(data_dir)
+        df = storage.load_data(path, SUPPLIER_SCHEMA)
+        print(f"engine={storage.get_engine().name}, {args.rows:,} supplier rows\n")
+
+        model = risk.risk_model(path)
+        expected = timed("before: score each supplier in Python", lambda: before(df, model))
+        scores = timed("after: one vectorized pass", lambda: model.score(df))
+        assert np.allclose(scores, expected, equal_nan=True)
+        scored = timed("after: load_data, parsed and scored (once)", lambda: storage.load_data(path, SUPPLIER_SCHEMA))
+        assert np.allclose(scored[risk.RISK_COLUMN].to_numpy(), expected, equal_nan=True)
+
+        aggregates = {"mean": Mean(risk.RISK_COLUMN), "high": Count(f"{risk.RISK_COLUMN} >= 50"),
+                      "riskiest": TopK(risk.RISK_COLUMN, 10)}
+        view = timed("after: KPI view over the score (once)", lambda: kpi_view(path, SUPPLIER_SCHEMA, "risk", aggregates))
+        storage.upsert_row(path, "SUP0000002", {"notes": "warm-up"}) # The first write builds the key index
+        timed("after: upsert_row (rescores the one row)", lambda: storage.upsert_row(
+            path, "SUP0000001", {"on_time_delivery_rate": 50.0, "quality_reject_rate": 9.0, "last_audit_score": 10}))
+        view = timed("after: KPI view after the write", lambda: kpi_view(path, SUPPLIER_SCHEMA, "risk", aggregates))
+        assert view.keys("riskiest")[0] == "SUP0000001"
+        scored = storage.load_data(path, SUPPLIER_SCHEMA)[risk.RISK_COLUMN]
+        assert abs(view["mean"] - scored.mean()) < 1e-6 and view["high"] == int((scored >= 50).sum())
+        print(f"\nmean score {view['mean']:.1f}, {view['high']:,} suppliers at 50 or above")
+
+
+if __name__ == "__main__":
+    main()
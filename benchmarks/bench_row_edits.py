@@ -0,0 +1,63 @@
+"""Before/after benchmark for single-row edits on a large supplier table.
+
+Builds a synthetic supplier table (default 1M rows) and times editing and
+deleting one supplier the way the edit forms used to (rewrite the whole table
+with update_data) against the row-level upsert_row / delete_row.
+
+    python benchmarks/bench_row_edits.py --rows 1000000 --engine csv
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import storage  # noqa: E402
+from bench_snapshots import build_table  # noqa: E402
+
+
+def timed(label, fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<45} {best * 1000:>10.1f} ms")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--engine", choices=sorted(storage.ENGINES), default="csv")
+    args = parser.parse_args()
+    os.environ[storage.STORAGE_ENGINE_ENV] = args.engine
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        path = os.path.join(data_dir, "supplier_dummy_data.csv")
+        build_table(path, args.rows)
+        storage.initialize_csv(path, [])
+        print(f"engine={args.engine}, {args.rows:,} supplier rows\n")
+        key = f"SUP{args.rows // 2:07d}"
+        edits = iter(range(10**6))
+
+        def rewrite_table():
+            df = storage.load_data(path)
+            df.loc[df["supplier_id"] == key, "notes"] = f"edit {next(edits)}"
+            storage.update_data(path, df)
+
+        before = timed("before: load + update_data (whole table)", rewrite_table, repeat=2)
+        row = storage.get_row(path, key)
+        timed("after: get_row", lambda: storage.get_row(path, key))
+        after = timed("after: upsert_row", lambda: storage.upsert_row(path, key, {"notes": f"edit {next(edits)}"}))
+        timed("after: upsert_row with expected-row check",
+              lambda: storage.upsert_row(path, key, {"notes": row["notes"]}, expected=storage.get_row(path, key)))
+        print(f"{'':<45} {before / after:>10.1f}x faster than before")
+        keys = iter(range(1, args.rows))
+        timed("after: delete_row", lambda: storage.delete_row(path, f"SUP{next(keys):07d}"))
+        assert storage.get_row(path, key)["notes"] == row["notes"]
+
+
+if __name__ == "__main__":
+    main()
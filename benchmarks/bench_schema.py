@@ -0,0 +1,70 @@
+"""Before/after benchmark for typed table schemas.
+
+Builds a synthetic supplier table (default 1M rows) and compares loading it
+untyped, then parsing the dashboard's date column on every rerun, with loading
+it once through the supplier schema (datetime64, nullable booleans, categories).
+
+    python benchmarks/bench_schema.py --rows 1000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import storage  # noqa: E402
+from bench_snapshots import build_table  # noqa: E402
+
+# Mirrors supplier_columns in app.py.
+SUPPLIER_SCHEMA = {
+    "supplier_id": "str", "supplier_name": "str", "contact_person": "str", "email": "str", "phone": "str",
+    "agreement_status": "category", "last_audit_score": "int", "notes": "str",
+    "primary_product_category": "category", "on_time_delivery_rate": "float", "quality_reject_rate": "float",
+    "risk_level": "category", "certification": "category", "annual_spend_usd": "int", "last_performance_review_date": "date",
+    "supplier_city": "category", "supplier_country": "category", "payment_terms": "category",
+    "contract_start_date": "date", "contract_end_date": "date", "supplier_tier": "category", "ESG_score": "float",
+    "account_manager": "category", "onboarding_date": "date",
+    "esg_compliance_score": "int", "emissions_target_met": "bool",
+}
+
+
+def megabytes(df):
+    return df.memory_usage(index=True, deep=True).sum() / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        path = os.path.join(data_dir, "supplier_dummy_data.csv")
+        build_table(path, args.rows)
+        print(f"{args.rows:,} supplier rows\n")
+
+        untyped = storage.load_data(path, columns=list(SUPPLIER_SCHEMA))
+        start = time.perf_counter()
+        pd.to_datetime(untyped["last_performance_review_date"], errors="coerce")
+        per_rerun = time.perf_counter() - start
+
+        start = time.perf_counter()
+        typed = storage.load_data(path, columns=SUPPLIER_SCHEMA)
+        parse_once = time.perf_counter() - start
+        start = time.perf_counter()
+        typed = storage.load_data(path, columns=SUPPLIER_SCHEMA)
+        cached = time.perf_counter() - start
+
+        print(f"{'before: pd.to_datetime on every rerun':<45} {per_rerun * 1000:>10.1f} ms")
+        print(f"{'after: load + parse schema (once per version)':<45} {parse_once * 1000:>10.1f} ms")
+        print(f"{'after: cached typed load (every rerun)':<45} {cached * 1000:>10.1f} ms")
+        print(f"{'before: untyped frame':<45} {megabytes(untyped):>10.1f} MB")
+        print(f"{'after: typed frame':<45} {megabytes(typed):>10.1f} MB")
+        for col in ["agreement_status", "risk_level", "supplier_tier", "last_performance_review_date", "emissions_target_met"]:
+            print(f"  {col:<43} {str(untyped[col].dtype):>12} -> {typed[col].dtype}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Before/after benchmark for the tabs' "Search..." box (apply_search_and_filter).
+
+Builds synthetic supplier, asset, project, audit and file tables (default 100k
+rows each) and times one search keystroke the way the helper used to run it
+(row-wise apply) against search.search_mask: the first search after a write
+builds the per-row text, later keystrokes reuse it.
+
+    python benchmarks/bench_search.py --rows 100000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import search  # noqa: E402
+import storage  # noqa: E402
+from bench_snapshots import build_table  # noqa: E402
+
+WORDS = ["Lathe", "Press", "Gauge", "Robot", "Welder", "Plant 2", "Detroit", "Review", "ISO 9001", "Supplier A", "Supplier B", "OEM"]
+
+
+def synthetic(rows, columns, rng):
+    """A table of random word/date/flag values for the given columns."""
+    data = {}
+    for col in columns:
+        if col.endswith("_id"):
+            data[col] = [f"{col[:3].upper()}{i:07d}" for i in range(1, rows + 1)]
+        elif "date" in col or col == "timestamp":
+            data[col] = (pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 700, rows), unit="D")).strftime("%Y-%m-%d")
+        elif col in ("input_pending", "is_esg_project"):
+            data[col] = rng.choice(["True", "False"], rows)
+        elif col == "size":
+            data[col] = rng.integers(1_000, 10_000_000, rows)
+        else:
+            data[col] = np.char.add(rng.choice(WORDS, rows), rng.integers(0, 5000, rows).astype(str))
+    return pd.DataFrame(data)
+
+
+TABLES = {
+    "assets": ["asset_id", "asset_name", "location", "status", "eol_date", "calibration_date", "notes", "supplier", "last_active_date"],
+    "project_tasks": ["task_id", "task_name", "status", "assigned_to", "due_date", "description", "input_pending", "is_esg_project"],
+    "audit_points": ["audit_id", "point_description", "status", "assignee", "due_date", "resolution", "input_pending"],
+    "uploaded_files": ["file_id", "filename", "type", "size", "uploader", "timestamp", "path"],
+}
+QUERIES = {"supplier_dummy_data": "precision", "assets": "lathe12", "project_tasks": "review4", "audit_points": "iso 9001", "uploaded_files": "robot77"}
+
+
+def row_wise(df, query):
+    """The old implementation of the search box."""
+    return df[df.apply(lambda row: row.astype(str).str.lower().str.contains(query).any(), axis=1)]
+
+
+def timed(fn, repeat=1):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        build_table(os.path.join(data_dir, "supplier_dummy_data.csv"), args.rows)
+        for table, columns in TABLES.items():
+            synthetic(args.rows, columns, rng).to_csv(os.path.join(data_dir, f"{table}.csv"), index=False)
+
+        print(f"{args.rows:,} rows per table\n")
+        print(f"{'table':<22} {'before':>12} {'after (cold)':>14} {'after (warm)':>14} {'matches':>9}")
+        for table, query in QUERIES.items():
+            df = storage.load_data(os.path.join(data_dir, f"{table}.csv"))
+            before, expected = timed(lambda: row_wise(df, query))
+            cold, _ = timed(lambda: df[search.search_mask(df, query)])
+            warm, found = timed(lambda: df[search.search_mask(df, query)], repeat=5)
+            assert found.index.equals(expected.index), table
+            print(f"{table:<22} {before:>9.0f} ms {cold:>11.0f} ms {warm:>11.1f} ms {len(found):>9,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Benchmark for the inverted search index at supplier-table scale (search.search_rows).
+
+Builds a synthetic supplier table (default 1M rows), then times typing a query
+one keystroke at a time against a per-row text scan (the per-version cached
+text the search box used before the index), and the cost of keeping the index
+current: a write followed by the next keystroke must not rebuild it.
+
+    python benchmarks/bench_search_index.py --rows 1000000
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import search  # noqa: E402
+import storage  # noqa: E402
+from bench_schema import SUPPLIER_SCHEMA  # noqa: E402
+from bench_snapshots import build_table  # noqa: E402
+
+QUERY = "global detr"
+
+
+def scan(df, query):
+    """Word-prefix search by scanning the cached per-row text."""
+    text = search.row_search_text(df)
+    mask = pd.Series(True, index=df.index)
+    for term in search.query_terms(query):
+        mask &= text.str.contains(r"(?:^|[\W_])" + re.escape(term), regex=True)
+    return df[mask]
+
+
+def timed(fn, repeat=1):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        path = os.path.join(data_dir, "supplier_dummy_data.csv")
+        build_table(path, args.rows)
+        df = pd.read_csv(path)
+        df["supplier_name"] = df["supplier_name"] + " " + rng.integers(0, 100_000, len(df)).astype(str)
+        df.to_csv(path, index=False)
+        if storage.get_engine().name == "sqlite":
+            storage.migrate_csv_to_sqlite(data_dir)
+
+        df = storage.load_data(path, SUPPLIER_SCHEMA)
+        print(f"engine={storage.get_engine().name}, {len(df):,} supplier rows\n")
+        build, _ = timed(lambda: search.search_rows(df, "x"))
+        print(f"index build (first search after start-up)   {build:>10.0f} ms\n")
+
+        print(f"{'keystroke':<18} {'scan (warm)':>12} {'index':>10} {'matches':>9}")
+        for end in range(1, len(QUERY) + 1):
+            query = QUERY[:end]
+            if query.endswith(" "):
+                continue
+            before, expected = timed(lambda: scan(df, query), repeat=3)
+            after, found = timed(lambda: search.search_rows(df, query), repeat=3)
+            assert found.index.equals(expected.index), query
+            print(f"{query!r:<18} {before:>9.1f} ms {after:>7.2f} ms {len(found):>9,}")
+
+        index = search.table_index(df)
+        write, _ = timed(lambda: storage.append_data(path, pd.DataFrame([{"supplier_id": "SUPNEW", "supplier_name": "Global Detroit New"}])))
+        edit, _ = timed(lambda: storage.upsert_row(path, "SUP0000001", {"supplier_name": "Renamed Global Detroit"}))
+        df = storage.load_data(path, SUPPLIER_SCHEMA)
+        after, found = timed(lambda: search.search_rows(df, QUERY))
+        assert search.table_index(df) is index, "index was rebuilt"
+        assert {"SUPNEW", "SUP0000001"} <= set(found["supplier_id"])
+        print(f"\nappend_data + index update                  {write:>10.1f} ms")
+        print(f"upsert_row + index update                   {edit:>10.1f} ms")
+        print(f"next keystroke (no rebuild)                 {after:>10.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
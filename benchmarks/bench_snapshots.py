@@ -0,0 +1,73 @@
+"""Before/after benchmark for Parquet snapshots with column projection.
+
+Builds a synthetic supplier table (default 1M rows) from data/supplier_dummy_data.csv
+and compares parsing the whole CSV, as load_data used to, with reading only the
+columns a dashboard card renders from the table's snapshot.
+
+    python benchmarks/bench_snapshots.py --rows 1000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import storage  # noqa: E402
+
+SEED_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "supplier_dummy_data.csv")
+
+CARDS = {
+    "reject-rate card": ["quality_reject_rate"],
+    "spend chart": ["annual_spend_usd", "primary_product_category"],
+    "OTD + reject cards": ["supplier_name", "on_time_delivery_rate", "quality_reject_rate", "last_performance_review_date"],
+}
+
+
+def build_table(path, rows):
+    seed = pd.read_csv(SEED_FILE)
+    df = seed.iloc[np.arange(rows) % len(seed)].reset_index(drop=True)
+    df["supplier_id"] = [f"SUP{i:07d}" for i in range(1, rows + 1)]
+    df.to_csv(path, index=False)
+
+
+def timed(label, fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    mb = result.memory_usage(index=True, deep=True).sum() / 1e6
+    print(f"{label:<45} {best * 1000:>10.1f} ms {mb:>10.1f} MB")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        path = os.path.join(data_dir, "supplier_dummy_data.csv")
+        build_table(path, args.rows)
+        print(f"{args.rows:,} supplier rows, CSV {os.path.getsize(path) / 1e6:.0f} MB\n")
+        engine = storage.CSVEngine()
+
+        before = timed("before: pd.read_csv (all columns)", lambda: pd.read_csv(path))
+
+        start = time.perf_counter()
+        engine.load(path, ["supplier_id"])
+        print(f"{'snapshot build (once per CSV change)':<45} {(time.perf_counter() - start) * 1000:>10.1f} ms "
+              f"{os.path.getsize(storage.snapshot_path(path)) / 1e6:>10.1f} MB on disk")
+
+        timed("after: snapshot, all columns", lambda: engine.load(path))
+        for card, columns in CARDS.items():
+            after = timed(f"after: snapshot, {card}", lambda: engine.load(path, columns))
+            print(f"{'':<45} {before / after:>10.1f}x faster than before")
+
+
+if __name__ == "__main__":
+    main()
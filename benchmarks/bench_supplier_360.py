@@ -0,0 +1,90 @@
+"""Before/after benchmark for the Supplier 360 lookups (joins.related_rows).
+
+Builds a synthetic assets table (default 1M rows, spread over 10,000
+suppliers) and an events table with attendee lists, and times finding one
+supplier's rows in both. Before: a scan of each table, as the tabs filter
+them. After: the join indexes, built on first use and then kept current
+through writes, plus fetching the matching rows by primary key.
+
+    python benchmarks/bench_supplier_360.py --rows 1000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import joins  # noqa: E402
+import storage  # noqa: E402
+
+SUPPLIERS = 10_000
+ASSET_SCHEMA = {"asset_id": "str", "asset_name": "str", "status": "category", "supplier": "str"}
+EVENT_SCHEMA = {"event_id": "str", "title": "str", "attendees": "list", "created_by": "category"}
+
+
+def build_tables(data_dir, rows):
+    rng = np.random.default_rng(0)
+    names = np.array([f"Supplier {i:05d}" for i in range(SUPPLIERS)], dtype=object)
+    pd.DataFrame({
+        "asset_id": [f"AST{i:07d}" for i in range(rows)], "asset_name": [f"Asset {i}" for i in range(rows)],
+        "status": rng.choice(["Active", "Idle", "Maintenance"], rows), "supplier": names[rng.integers(0, SUPPLIERS, rows)],
+    }).to_csv(os.path.join(data_dir, "assets.csv"), index=False)
+    events = rows // 5
+    attendees = ['["OEM", "' + name + '"]' for name in names[rng.integers(0, SUPPLIERS, events)]]
+    pd.DataFrame({
+        "event_id": [f"EVT{i:07d}" for i in range(events)], "title": [f"Review {i}" for i in range(events)],
+        "attendees": attendees, "created_by": "OEM",
+    }).to_csv(os.path.join(data_dir, "events.csv"), index=False)
+
+
+def before(assets, events, name):
+    """Scans both tables for the supplier, as each tab's filter does."""
+    wanted = joins.normalize(name)
+    found_assets = assets[assets["supplier"].astype("string").str.strip().str.casefold() == wanted]
+    found_events = events[events["attendees"].map(lambda people: any(joins.normalize(person) == wanted for person in people))]
+    return len(found_assets), len(found_events)
+
+
+def after(assets_path, events_path, name):
+    return (len(joins.related_rows(assets_path, ["supplier"], [name], ASSET_SCHEMA)),
+            len(joins.related_rows(events_path, ["attendees", "created_by"], [name], EVENT_SCHEMA)))
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"{label:<44} {(time.perf_counter() - start) * 1000:>10.1f} ms  {result}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        build_tables(data_dir, args.rows)
+        if storage.get_engine().name == "sqlite":
+            storage.migrate_csv_to_sqlite(data_dir)
+        assets_path, events_path = os.path.join(data_dir, "assets.csv"), os.path.join(data_dir, "events.csv")
+        assets = storage.load_data(assets_path, ASSET_SCHEMA)
+        events = storage.load_data(events_path, EVENT_SCHEMA)
+        print(f"engine={storage.get_engine().name}, {len(assets):,} assets, {len(events):,} events, {SUPPLIERS:,} suppliers\n")
+
+        expected = timed("before: scan both tables", lambda: before(assets, events, "Supplier 00042"))
+        timed("after: build join indexes (first lookup)", lambda: after(assets_path, events_path, "Supplier 00042"))
+        found = timed("after: lookup", lambda: after(assets_path, events_path, "Supplier 00042"))
+        assert found == expected
+        timed("after: lookup, another supplier", lambda: after(assets_path, events_path, "supplier 09999"))
+
+        timed("after: upsert_row (indexes updated)", lambda: storage.upsert_row(assets_path, "AST0000001", {"supplier": "Supplier 00042"}))
+        found = timed("after: lookup after the write", lambda: after(assets_path, events_path, "Supplier 00042"))
+        assert found[0] in (expected[0], expected[0] + 1)
+
+
+if __name__ == "__main__":
+    main()
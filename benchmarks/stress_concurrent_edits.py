@@ -0,0 +1,132 @@
+"""Multi-process stress test for the table write paths.
+
+Several processes edit different suppliers of the same table at once, the way
+two OEM users save the edit form together, while other processes append rows
+(with IDs from the shared allocator) and read the table. At the end every edit
+must be present (no lost updates), every event ID unique, and no reader may
+ever have seen a truncated table.
+
+    python benchmarks/stress_concurrent_edits.py --writers 8 --edits 25
+    python benchmarks/stress_concurrent_edits.py --unsafe   # old behaviour: whole-table saves, no version check
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import storage  # noqa: E402
+
+
+def edit_supplier(file_path, supplier_id, edits, unsafe, results):
+    """Increments one supplier's edit_count `edits` times, retrying stale saves."""
+    retries = 0
+    for _ in range(edits):
+        while True:
+            if unsafe:
+                df = storage.load_data(file_path)
+                df.loc[df["supplier_id"] == supplier_id, "edit_count"] += 1
+                storage.update_data(file_path, df)
+                break
+            row = storage.get_row(file_path, supplier_id)
+            try:
+                storage.upsert_row(file_path, supplier_id, {"edit_count": int(row["edit_count"]) + 1}, expected=row)
+                break
+            except storage.StaleVersionError:
+                retries += 1
+    results.put(("retries", retries))
+
+
+def append_events(file_path, count, results):
+    """Appends events one by one, plus one bulk insert of a reserved block of IDs."""
+    for _ in range(count - 10):
+        storage.append_data(file_path, pd.DataFrame([{"event_id": storage.allocate_id(file_path, "EVENT"), "title": "stress"}]))
+    event_ids = storage.allocate_ids(file_path, "EVENT", 10)
+    storage.append_data(file_path, pd.DataFrame({"event_id": event_ids, "title": "stress"}))
+    results.put(("appended", count))
+
+
+def read_table(file_path, expected_rows, stop, results):
+    """Reads the table as fast as possible, counting reads that saw a partial table."""
+    reads = torn = 0
+    while not stop.is_set():
+        try:
+            rows = len(storage.load_data(file_path))
+        except Exception: # A half-written file fails to parse
+            rows = -1
+        reads += 1
+        torn += rows != expected_rows
+    results.put(("reads", reads))
+    results.put(("torn", torn))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--edits", type=int, default=25, help="Edits per writer")
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--appends", type=int, default=200, help="Rows appended by each of two appender processes")
+    parser.add_argument("--engine", choices=sorted(storage.ENGINES), default="csv")
+    parser.add_argument("--unsafe", action="store_true", help="Rewrite the whole table without a version check, as the edit forms used to")
+    args = parser.parse_args()
+    os.environ[storage.STORAGE_ENGINE_ENV] = args.engine
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        suppliers_file = os.path.join(data_dir, "supplier_dummy_data.csv")
+        events_file = os.path.join(data_dir, "events.csv")
+        supplier_ids = [f"SUP{i:04d}" for i in range(1, args.writers + 1)]
+        storage.initialize_csv(suppliers_file, ["supplier_id", "supplier_name", "edit_count"])
+        storage.update_data(suppliers_file, pd.DataFrame({"supplier_id": supplier_ids, "supplier_name": supplier_ids, "edit_count": 0}))
+        storage.initialize_csv(events_file, ["event_id", "title"])
+
+        results = multiprocessing.Queue()
+        stop = multiprocessing.Event()
+        writers = [
+            multiprocessing.Process(target=edit_supplier, args=(suppliers_file, supplier_id, args.edits, args.unsafe, results))
+            for supplier_id in supplier_ids
+        ]
+        appenders = [multiprocessing.Process(target=append_events, args=(events_file, args.appends, results)) for _ in range(2)]
+        readers = [
+            multiprocessing.Process(target=read_table, args=(suppliers_file, len(supplier_ids), stop, results))
+            for _ in range(args.readers)
+        ]
+
+        start = time.perf_counter()
+        for process in readers + writers + appenders:
+            process.start()
+        for process in writers + appenders:
+            process.join()
+        stop.set()
+        for process in readers:
+            process.join()
+        elapsed = time.perf_counter() - start
+
+        totals = {}
+        while not results.empty():
+            name, value = results.get()
+            totals[name] = totals.get(name, 0) + value
+
+        final_df = storage.load_data(suppliers_file)
+        lost_edits = int((args.edits - final_df["edit_count"]).clip(lower=0).sum())
+        event_ids = storage.load_data(events_file)["event_id"]
+        appended = len(event_ids)
+        duplicate_ids = int(event_ids.duplicated().sum())
+
+        print(f"engine={args.engine} writers={args.writers} edits/writer={args.edits} "
+              f"{'UNSAFE (whole-table saves, no version check)' if args.unsafe else 'row-level upserts'}  {elapsed:.1f}s")
+        print(f"  stale saves retried: {totals.get('retries', 0)}")
+        print(f"  lost edits:          {lost_edits} of {args.writers * args.edits}")
+        print(f"  appended rows:       {appended} of {2 * args.appends}")
+        print(f"  duplicate event IDs: {duplicate_ids}")
+        print(f"  reads / torn reads:  {totals.get('reads', 0)} / {totals.get('torn', 0)}")
+        failed = lost_edits or appended != 2 * args.appends or duplicate_ids or totals.get("torn", 0)
+        print("FAIL" if failed else "PASS")
+        sys.exit(1 if failed and not args.unsafe else 0)
+
+
+if __name__ == "__main__":
+    main()
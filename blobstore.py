@@ -0,0 +1,148 @@
+"""Content-addressed store for uploaded files.
+
+Each upload is streamed in fixed-size chunks into a temp file while it is
+hashed, then committed as ``<blob dir>/<first 2 hex>/<sha256>``. Identical
+content is stored once, however many times (or by whomever) it is uploaded;
+the files table references blobs by their hash in ``content_hash``.
+
+Memory used per upload is bounded by the chunk size, not the file size.
+Commit a staged blob and write the row that references it under the files
+table's lock (``storage.table_lock``), and delete rows and unreferenced blobs
+under the same lock, so a blob is never removed while a new row points at it.
+
+Files uploaded before the blob store existed can be moved into it with
+``python blobstore.py import --data-dir data``.
+"""
+import argparse
+import hashlib
+import os
+import uuid
+
+import pandas as pd
+
+import storage
+
+CHUNK_SIZE = int(os.environ.get("ZENOVA_BLOB_CHUNK_BYTES", 1024 * 1024))
+BLOB_DIR_NAME = "blobs"
+
+
+# --- Paths ---
+def blob_path(blob_dir, digest):
+    """Returns where the blob with this sha256 hex digest is stored."""
+    return os.path.join(blob_dir, digest[:2], digest)
+
+
+def exists(blob_dir, digest):
+    return bool(digest) and os.path.exists(blob_path(blob_dir, digest))
+
+
+# --- Writing ---
+class StagedBlob:
+    """An upload written to a temp file and hashed, waiting to be committed."""
+
+    def __init__(self, blob_dir, temp_path, digest, size):
+        self.blob_dir = blob_dir
+        self.temp_path = temp_path
+        self.digest = digest
+        self.size = size
+
+    def commit(self):
+        """Moves the upload into the store; returns False if the same content was already there."""
+        target = blob_path(self.blob_dir, self.digest)
+        try:
+            if os.path.exists(target):
+                return False
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(self.temp_path, target)
+            return True
+        finally:
+            self.discard()
+
+    def discard(self):
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+
+def stage(stream, blob_dir, chunk_size=CHUNK_SIZE):
+    """Copies a binary stream into a temp file in chunks, hashing as it goes. Returns a StagedBlob."""
+    temp_dir = os.path.join(blob_dir, "tmp")
+    os.makedirs(temp_dir, exist_ok=True)
+    temp_path = os.path.join(temp_dir, uuid.uuid4().hex)
+    sha256 = hashlib.sha256()
+    size = 0
+    try:
+        with open(temp_path, "wb") as f:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                sha256.update(chunk)
+                f.write(chunk)
+                size += len(chunk)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return StagedBlob(blob_dir, temp_path, sha256.hexdigest(), size)
+
+
+def put(stream, blob_dir, chunk_size=CHUNK_SIZE):
+    """Stores a stream and returns (digest, size). Prefer stage + commit under the files lock."""
+    staged = stage(stream, blob_dir, chunk_size)
+    staged.commit()
+    return staged.digest, staged.size
+
+
+# --- Reading & Deleting ---
+def open_blob(blob_dir, digest):
+    """Opens a stored blob for reading in binary mode."""
+    return open(blob_path(blob_dir, digest), "rb")
+
+
+def remove(blob_dir, digest):
+    """Deletes a blob; call only once no file row references it."""
+    try:
+        os.remove(blob_path(blob_dir, digest))
+    except FileNotFoundError:
+        pass
+
+
+# --- Importing Pre-Blob-Store Uploads ---
+def import_legacy_files(files_file, blob_dir):
+    """Moves files referenced by path in the files table into the store. Returns the number imported."""
+    imported = 0
+    with storage.table_lock(files_file):
+        storage.backfill_ids(files_file, "FILE") # Uploads this old may predate file_id
+        files_df = storage.load_data(files_file)
+        if "path" not in files_df.columns:
+            return 0
+        has_hash = files_df["content_hash"].notna() if "content_hash" in files_df.columns else pd.Series(False, index=files_df.index)
+        for _, row in files_df[~has_hash & files_df["path"].notna()].iterrows():
+            if not os.path.exists(row["path"]):
+                continue
+            with open(row["path"], "rb") as f:
+                staged = stage(f, blob_dir)
+            created = staged.commit()
+            try:
+                storage.upsert_row(files_file, row["file_id"], {"content_hash": staged.digest, "size": staged.size, "path": None})
+            except BaseException:
+                if created: # No row points at it
+                    remove(blob_dir, staged.digest)
+                raise
+            os.remove(row["path"])
+            imported += 1
+    return imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Zenova SRP upload store maintenance")
+    parser.add_argument("command", choices=["import"], help="import: move pre-blob-store uploads into the store")
+    parser.add_argument("--data-dir", default="data")
+    args = parser.parse_args()
+    files_file = os.path.join(args.data_dir, "uploaded_files.csv")
+    count = import_legacy_files(files_file, os.path.join(args.data_dir, BLOB_DIR_NAME))
+    print(f"Imported {count} files into {os.path.join(args.data_dir, BLOB_DIR_NAME)}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Dashboard charts drawn from server-side aggregates and cached per data version and theme.
+
+Plotly Express histograms and box plots carry every raw value to the browser,
+which binned or summarized them there: a million suppliers meant a million
+points per chart. Here the server computes the bins, quartiles and counts, the
+figure is built from those few numbers, and it is cached per table version,
+chart and theme for all sessions. A repeat render is a cache hit, and the
+payload is the same few kilobytes however large the table grows.
+
+Figures are cached as Figure objects rather than their JSON dicts:
+st.plotly_chart serializes a Figure as it is, but validates a dict afresh on
+every render, which costs more than building these small figures.
+"""
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+import storage
+
+MARGIN = dict(l=20, r=20, t=30, b=20)
+MAX_OUTLIERS = 200 # Box plots draw at most this many outlying points, spread over their range
+
+
+def cached_figure(file_path, version, name, theme, build):
+    """Returns build(theme)'s figure, built once per table version, chart and theme and shared by all sessions.
+
+    name identifies the chart and its settings; version is the table version
+    the figure's data was read at (a frame's table_version, or a KPI view's).
+    Without a version the figure is built on every call.
+    """
+    if version is None:
+        return build(theme)
+    return storage.cached_derived(file_path, (storage.get_engine().name, version), ("figure", name, theme), lambda: build(theme))
+
+
+def _frame_figure(df, name, theme, build):
+    """Caches a figure drawn from df under df's table version; frames without one are drawn every time."""
+    source, version = df.attrs.get("source"), df.attrs.get("table_version")
+    if source is None or version is None:
+        return build(theme)
+    return cached_figure(source[0], version, name + (str(source),), theme, build)
+
+
+def _values(series):
+    """The column's non-missing values as floats."""
+    values = pd.to_numeric(series, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    return values[~np.isnan(values)]
+
+
+# --- Charts from a Table's Column ---
+def histogram(df, column, nbins, title, label, color, theme, height=300):
+    """Histogram of a numeric column of df's table, binned on the server into nbins equal-width bars."""
+    def build(theme):
+        values = _values(df[column])
+        counts, edges = np.histogram(values, bins=nbins) if len(values) else (np.zeros(0), np.zeros(1))
+        fig = go.Figure(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges), marker_color=color,
+                               customdata=np.column_stack([edges[:-1], edges[1:]]) if len(counts) else None,
+                               hovertemplate=f"{label}: %{{customdata[0]:.4g}}-%{{customdata[1]:.4g}}<br>count: %{{y}}<extra></extra>"))
+        fig.update_layout(title=title, template=theme, xaxis_title_text=label, yaxis_title_text="count",
+                          bargap=0.1, margin=MARGIN, height=height)
+        return fig
+    return _frame_figure(df, ("histogram", column, nbins, title, label, color, height), theme, build)
+
+
+def box(df, column, title, color, theme, height=250):
+    """Box plot of a numeric column of df's table from its quartiles and whiskers (1.5 IQR), computed on the server."""
+    def build(theme):
+        values = np.sort(_values(df[column]))
+        fig = go.Figure()
+        if len(values):
+            q1, median, q3 = np.percentile(values, [25, 50, 75])
+            inside = values[(values >= q1 - 1.5 * (q3 - q1)) & (values <= q3 + 1.5 * (q3 - q1))]
+            fig.add_trace(go.Box(x=[column], q1=[q1], median=[median], q3=[q3], lowerfence=[inside[0]], upperfence=[inside[-1]],
+                                 mean=[values.mean()], name=column, marker_color=color, boxpoints=False))
+            outliers = values[(values < inside[0]) | (values > inside[-1])]
+            if len(outliers) > MAX_OUTLIERS: # Evenly spaced in sorted order, so the extremes stay
+                outliers = outliers[np.linspace(0, len(outliers) - 1, MAX_OUTLIERS).round().astype(int)]
+            if len(outliers):
+                fig.add_trace(go.Scatter(x=[column] * len(outliers), y=outliers, mode="markers", marker_color=color,
+                                         name="outliers", showlegend=False))
+        fig.update_layout(title=title, template=theme, yaxis_title_text=column, margin=MARGIN, height=height)
+        return fig
+    return _frame_figure(df, ("box", column, title, color, height), theme, build)
+
+
+# --- Charts from Aggregates ---
+def pie(file_path, version, counts, label, title, theme, order=None, color_map=None, height=300):
+    """Donut chart of counts (value -> count), e.g. a KPI view's CountBy; version is the view's."""
+    def build(theme):
+        frame = pd.DataFrame(list(counts.items()), columns=[label, "Count"])
+        if order is not None:
+            frame[label] = pd.Categorical(frame[label], categories=order, ordered=True)
+            frame = frame.sort_values(label)
+        else:
+            frame = frame.sort_values("Count", ascending=False, kind="stable")
+        fig = px.pie(frame, values="Count", names=label, title=title, hole=0.3, template=theme,
+                     **(dict(color=label, color_discrete_map=color_map) if color_map else {}))
+        fig.update_traces(textposition="inside", textinfo="percent+label")
+        fig.update_layout(showlegend=True, margin=MARGIN, height=height)
+        return fig
+    return cached_figure(file_path, version, ("pie", label, title, tuple(order or ()), repr(color_map), height), theme, build)
+
+
+def bar(file_path, version, totals, x_label, y_label, title, theme, height=300):
+    """Bar chart of totals (category -> total), largest first; version is the KPI view's."""
+    def build(theme):
+        frame = pd.DataFrame(list(totals.items()), columns=[x_label, y_label]).sort_values(y_label, ascending=False, kind="stable")
+        fig = px.bar(frame, x=x_label, y=y_label, title=title, color_discrete_sequence=px.colors.qualitative.Plotly, template=theme)
+        fig.update_layout(xaxis_title_text=x_label, yaxis_title_text=y_label, margin=MARGIN, height=height)
+        return fig
+    return cached_figure(file_path, version, ("bar", x_label, y_label, title, height), theme, build)
+
+
+# --- Charts from KPI History ---
+def trend(file_path, version, frame, name, title, y_label, theme, area=False, height=300):
+    """Line chart (stacked areas if area) of a KPI history series: frame is indexed by day, one trace per column.
+
+    file_path and version are the history's (history.KPIHistory.network_path and version()); name
+    identifies the series drawn, e.g. its period and resolution.
+    """
+    def build(theme):
+        fig = go.Figure([go.Scatter(x=frame.index, y=frame[column], name=str(column), mode="lines",
+                                    stackgroup="total" if area else None) for column in frame.columns])
+        fig.update_layout(title=title, template=theme, yaxis_title_text=y_label, margin=MARGIN, height=height,
+                          showlegend=len(frame.columns) > 1)
+        return fig
+    return cached_figure(file_path, version, ("trend", name, title, y_label, area, height), theme, build)
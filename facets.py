@@ -0,0 +1,175 @@
+"""Per-column statistics ("facets") for the "Advanced Search & Filters" expander.
+
+For every column of a table: how many distinct values it has, how often each
+of them occurs (its top values), and for numeric columns the min, max and a
+histogram. They are computed once per table and column from the shared cached
+frame, reused by all sessions, and kept current from the writes storage
+reports (rows added, and the old rows of upserts and deletes), so a write
+costs a few dict updates rather than a recount.
+"""
+import os
+import threading
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+import storage
+
+MAX_TRACKED_VALUES = 1000 # Columns with more distinct values keep no per-value counts
+HISTOGRAM_BINS = 20
+
+
+def _hashable(series):
+    """Returns series with list cells (and other unhashable objects) as their text."""
+    return series.astype("string") if series.dtype == object else series
+
+
+class ColumnFacet:
+    """Statistics of one column, built from a Series and updated with rows added or removed."""
+
+    def __init__(self, series):
+        series = _hashable(series)
+        self.numeric = pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+        self.rows = len(series)
+        self.missing = int(series.isna().sum())
+        counts = series.value_counts(dropna=True, sort=False)
+        counts = counts[counts > 0] # Categoricals list unused categories too
+        # value -> rows, or None when the column has too many distinct values to track
+        self.counts = counts.to_dict() if len(counts) <= MAX_TRACKED_VALUES else None
+        self.stale = False # Set when a write moved the min/max or left the histogram's range
+        if self.numeric:
+            self._describe_numbers(series)
+
+    def _describe_numbers(self, series):
+        values = series.dropna().to_numpy(dtype=float)
+        self.min = float(values.min()) if len(values) else None
+        self.max = float(values.max()) if len(values) else None
+        if len(values):
+            self.bins, self.edges = np.histogram(values, bins=HISTOGRAM_BINS)
+        else:
+            self.bins, self.edges = np.zeros(0, dtype=np.int64), np.zeros(0)
+        self.stale = False
+
+    @property
+    def distinct(self):
+        """Number of distinct values, or None if there are more than MAX_TRACKED_VALUES."""
+        return None if self.counts is None else len(self.counts)
+
+    def values(self):
+        """The distinct values (tracked columns only)."""
+        return list(self.counts or ())
+
+    def top_values(self, limit=10):
+        """The most common values with their row counts, most common first (tracked columns only)."""
+        return pd.Series(self.counts or {}, dtype="Int64").sort_values(ascending=False, kind="stable").head(limit)
+
+    def histogram(self):
+        """Row counts per bin, labelled by each bin's lower edge (numeric columns only)."""
+        return pd.Series(self.bins, index=[f"{edge:,.4g}" for edge in self.edges[:-1]], name="rows")
+
+    def update(self, series, sign):
+        """Counts the values of series in (sign=1) or out (sign=-1)."""
+        # A write touches a few rows, so plain Python beats pandas' per-call overhead here
+        values = [value for value in _hashable(series).tolist() if not pd.isna(value)]
+        self.rows += sign * len(series)
+        self.missing += sign * (len(series) - len(values))
+        if self.counts is not None:
+            for value, count in Counter(values).items():
+                remaining = self.counts.get(value, 0) + sign * count
+                if remaining > 0:
+                    self.counts[value] = remaining
+                else:
+                    self.counts.pop(value, None)
+            if len(self.counts) > MAX_TRACKED_VALUES:
+                self.counts = None
+        if self.numeric and values and not self.stale:
+            numbers = np.array(values, dtype=float)
+            if sign > 0:
+                self.min = numbers.min() if self.min is None else min(self.min, numbers.min())
+                self.max = numbers.max() if self.max is None else max(self.max, numbers.max())
+            elif self.min in numbers or self.max in numbers:
+                self.stale = True
+            if not len(self.edges) or numbers.min() < self.edges[0] or numbers.max() > self.edges[-1]:
+                self.stale = True
+            else:
+                self.bins = self.bins + sign * np.histogram(numbers, bins=self.edges)[0]
+
+
+class TableFacets:
+    """The facets of one table's columns, built column by column as they are asked for."""
+
+    def __init__(self, version, schema):
+        self.version = version
+        self.schema = schema # load_data's columns argument, for typing written rows
+        self.columns = {} # column -> ColumnFacet
+        self._guard = threading.Lock()
+
+    def column(self, column, frame):
+        """Returns the column's facet; frame is the table at this version, for building it."""
+        with self._guard:
+            facet = self.columns.get(column)
+            if facet is None:
+                facet = self.columns[column] = ColumnFacet(frame[column])
+            elif facet.stale:
+                facet._describe_numbers(frame[column])
+            return facet
+
+    def update(self, version, added=None, removed=None):
+        """Records one write: added and removed are frames of rows put in or taken out."""
+        with self._guard:
+            for rows, sign in ((removed, -1), (added, 1)):
+                if rows is None or rows.empty:
+                    continue
+                for column, facet in self.columns.items():
+                    facet.update(rows[column] if column in rows.columns else pd.Series(None, index=rows.index), sign)
+            self.version = version
+
+
+_tables = {} # (abspath, load_data source) -> TableFacets
+_tables_guard = threading.Lock()
+
+
+def _apply(facets, change):
+    """Applies one write to a table's facets; a replaced table is counted afresh on the next use instead."""
+    if change["op"] == "replace":
+        return False
+    old_rows = change.get("old_rows") or []
+    if change["op"] == "upsert":
+        added = pd.DataFrame([change["row"]] if change["row"] is not None else [])
+    else:
+        added = change.get("rows", pd.DataFrame())
+    # Typed in one frame: the old rows first, then the new ones
+    rows = storage.typed_rows(pd.concat([pd.DataFrame(old_rows), added], ignore_index=True), facets.schema)
+    facets.update(change["version"], added=rows.iloc[len(old_rows):], removed=rows.iloc[:len(old_rows)])
+    return True
+
+
+def _on_change(file_path, change):
+    storage.follow_change(_tables, _tables_guard, file_path, change, _apply)
+
+
+storage.on_change(_on_change)
+
+
+def column_facet(df, column):
+    """Returns the facet of column in df's table, cached per table version and shared by all sessions.
+
+    The statistics are of the whole table even when df is a searched or
+    filtered part of it. Frames that cannot be traced to a table version
+    (or columns computed after loading) are described directly.
+    """
+    source, version = df.attrs.get("source"), df.attrs.get("table_version")
+    if source is None or version is None:
+        return ColumnFacet(df[column])
+    file_path, columns, usecols = source
+    key = (os.path.abspath(file_path), str(source))
+    with storage.table_lock(file_path): # No write can slip between counting and registering
+        full_df = storage.load_data(file_path, columns=columns, usecols=usecols)
+        if full_df.attrs.get("table_version") != version or column not in full_df.columns:
+            return ColumnFacet(df[column])
+        with _tables_guard:
+            facets = _tables.get(key)
+            if facets is None or facets.version != version:
+                facets = _tables[key] = TableFacets(version, columns)
+        return facets.column(column, full_df)
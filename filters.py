@@ -0,0 +1,341 @@
+"""Compound filter expressions for the tabs' tables, compiled to one vectorized mask.
+
+An expression combines conditions on a table's columns with ``and``, ``or``,
+``not`` and parentheses, e.g.::
+
+    risk_level = "High" and annual_spend_usd > 1M and contract_end_date within 90 days
+
+Conditions:
+
+* ``column = value`` (also ``!=``, ``<``, ``<=``, ``>``, ``>=``). Text is
+  compared ignoring case. Numbers may end in k, M or B. Dates are written
+  "YYYY-MM-DD", or ``today`` with an optional ``+ N`` / ``- N`` days.
+* ``column in ("A", "B")``
+* ``column contains "text"``
+* ``column within N days`` (from today up to N days ahead)
+* ``column is empty`` / ``column is not empty``
+
+Rows whose value is missing never match a comparison. An expression is parsed
+once, evaluated over the whole table in a single pass of column operations,
+and the matching rows are cached per table version for all sessions, so
+reruns and other users with the same filter reuse the result until the table
+is written (or, for one counting from today, until the date changes).
+"""
+import os
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+import storage
+
+MAX_CACHED_RESULTS = 64
+
+_TOKEN = re.compile(r"""\s*(?:
+    (?P<number>\d[\d_]*(?:\.\d+)?)(?P<scale>[kKmMbB])?(?![\w.])
+  | (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+  | (?P<op><=|>=|!=|=|<|>|\(|\)|,|\+|-)
+  | (?P<name>`[^`]+`|[A-Za-z_]\w*)
+)""", re.VERBOSE)
+_SCALES = {"k": 1e3, "m": 1e6, "b": 1e9}
+_KEYWORDS = {"and", "or", "not", "in", "contains", "within", "days", "day", "is", "empty", "today", "true", "false"}
+_COMPARISONS = {"=", "!=", "<", "<=", ">", ">="}
+
+
+class FilterError(ValueError):
+    """An expression that cannot be parsed, or does not fit the table's columns."""
+
+
+# --- Parsing ---
+def _tokenize(text):
+    tokens, position = [], 0
+    text = text.rstrip()
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if match is None or match.end() == position:
+            raise FilterError(f"Unexpected '{text[position:].strip()[:20]}' at character {position + 1}")
+        if match.group("number") is not None:
+            number = float(match.group("number").replace("_", ""))
+            number *= _SCALES.get((match.group("scale") or "").lower(), 1)
+            tokens.append(("number", number))
+        elif match.group("string") is not None:
+            tokens.append(("string", re.sub(r"\\(.)", r"\1", match.group("string")[1:-1])))
+        elif match.group("op") is not None:
+            tokens.append(("op", match.group("op")))
+        elif match.group("name").startswith("`"):
+            tokens.append(("name", match.group("name")[1:-1]))
+        elif match.group("name").lower() in _KEYWORDS:
+            tokens.append(("keyword", match.group("name").lower()))
+        else:
+            tokens.append(("name", match.group("name")))
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    """Recursive descent over the tokens; builds a tree of tuples, e.g. ("and", left, right)."""
+
+    def __init__(self, text):
+        self.tokens = _tokenize(text)
+        self.position = 0
+
+    def peek(self, kind=None, value=None):
+        if self.position >= len(self.tokens):
+            return None
+        token = self.tokens[self.position]
+        if (kind is None or token[0] == kind) and (value is None or token[1] == value):
+            return token
+        return None
+
+    def take(self, kind=None, value=None, expected=None):
+        token = self.peek(kind, value)
+        if token is None:
+            found = self.tokens[self.position][1] if self.position < len(self.tokens) else "the end"
+            raise FilterError(f"Expected {expected or value or kind}, found '{found}'")
+        self.position += 1
+        return token[1]
+
+    def parse(self):
+        tree = self.either()
+        if self.position < len(self.tokens):
+            raise FilterError(f"Unexpected '{self.tokens[self.position][1]}'; join conditions with 'and' or 'or'")
+        return tree
+
+    def either(self):
+        tree = self.both()
+        while self.peek("keyword", "or"):
+            self.position += 1
+            tree = ("or", tree, self.both())
+        return tree
+
+    def both(self):
+        tree = self.negation()
+        while self.peek("keyword", "and"):
+            self.position += 1
+            tree = ("and", tree, self.negation())
+        return tree
+
+    def negation(self):
+        if self.peek("keyword", "not"):
+            self.position += 1
+            return ("not", self.negation())
+        if self.peek("op", "("):
+            self.position += 1
+            tree = self.either()
+            self.take("op", ")")
+            return tree
+        return self.condition()
+
+    def condition(self):
+        column = self.take("name", expected="a column name")
+        if self.peek("op") and self.peek("op")[1] in _COMPARISONS:
+            return ("compare", column, self.take("op"), self.value())
+        keyword = self.take("keyword", expected="a comparison (=, !=, <, >, in, contains, within, is)")
+        if keyword == "in":
+            self.take("op", "(")
+            values = [self.value()]
+            while self.peek("op", ","):
+                self.position += 1
+                values.append(self.value())
+            self.take("op", ")")
+            return ("in", column, tuple(values))
+        if keyword == "contains":
+            return ("contains", column, self.take("string", expected="quoted text"))
+        if keyword == "within":
+            days = self.take("number", expected="a number of days")
+            if not self.peek("keyword", "days"):
+                self.take("keyword", "day")
+            else:
+                self.position += 1
+            return ("within", column, days)
+        if keyword == "is":
+            negated = bool(self.peek("keyword", "not"))
+            self.position += negated
+            self.take("keyword", "empty")
+            return ("not", ("empty", column)) if negated else ("empty", column)
+        raise FilterError(f"Expected a comparison after '{column}', found '{keyword}'")
+
+    def value(self):
+        if self.peek("op", "-") and self.position + 1 < len(self.tokens) and self.tokens[self.position + 1][0] == "number":
+            self.position += 1
+            return -self.take("number")
+        if self.peek("keyword", "today"):
+            self.position += 1
+            days = 0
+            if self.peek("op", "+") or self.peek("op", "-"):
+                sign = 1 if self.take("op") == "+" else -1
+                days = sign * self.take("number", expected="a number of days")
+            return ("today", days)
+        if self.peek("keyword", "true") or self.peek("keyword", "false"):
+            return self.take("keyword") == "true"
+        if self.peek("number") or self.peek("string"):
+            return self.take()
+        raise FilterError("Expected a value: a number, quoted text, true/false or today")
+
+
+@lru_cache(maxsize=256)
+def parse(text):
+    """Returns the parsed tree of a filter expression, or None for a blank one. Raises FilterError."""
+    if not text or not text.strip():
+        return None
+    return _Parser(text).parse()
+
+
+def referenced_columns(expression):
+    """The column names an expression refers to."""
+    def walk(tree):
+        if tree is None:
+            return set()
+        if tree[0] in ("and", "or"):
+            return walk(tree[1]) | walk(tree[2])
+        if tree[0] == "not":
+            return walk(tree[1])
+        return {tree[1]}
+    return walk(parse(expression))
+
+
+def _uses_today(tree):
+    """Whether tree counts from today's date (``today`` or ``within``), so its result changes at midnight."""
+    kind = tree[0]
+    if kind in ("and", "or"):
+        return _uses_today(tree[1]) or _uses_today(tree[2])
+    if kind == "not":
+        return _uses_today(tree[1])
+    if kind == "within":
+        return True
+    if kind == "in":
+        return any(isinstance(value, tuple) for value in tree[2])
+    return kind == "compare" and isinstance(tree[3], tuple)
+
+
+# --- Compiling to a Mask ---
+def _is_text(series):
+    return isinstance(series.dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(series) or series.dtype == object
+
+
+def _text_mask(series, predicate):
+    """Applies predicate (lower-cased text -> bools) once per category, or once over the column's text."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        matches = np.asarray(predicate(pd.Series(series.cat.categories.astype(str), dtype="string").str.lower()), dtype=bool)
+        codes = series.cat.codes.to_numpy()
+        return np.where(codes >= 0, matches[codes] if len(matches) else False, False)
+    return np.asarray(predicate(series.astype("string").str.lower()), dtype=bool)
+
+
+def _bools(result):
+    """A comparison's result as a plain bool array; missing values do not match."""
+    return pd.Series(result).fillna(False).to_numpy(dtype=bool)
+
+
+def _operand(series, column, value):
+    """Converts a parsed value to compare against series, or raises FilterError if it does not fit."""
+    if isinstance(value, tuple): # ("today", days)
+        value = pd.Timestamp.today().normalize() + pd.Timedelta(days=value[1])
+    if pd.api.types.is_datetime64_any_dtype(series):
+        try:
+            return pd.Timestamp(value) if not isinstance(value, (bool, float)) else None
+        except ValueError:
+            return None
+    if pd.api.types.is_bool_dtype(series):
+        return value if isinstance(value, bool) else None
+    if pd.api.types.is_numeric_dtype(series):
+        return value if isinstance(value, float) else None
+    if isinstance(value, pd.Timestamp):
+        return None
+    return str(value).lower() if not isinstance(value, float) or not value.is_integer() else str(int(value))
+
+
+def _fitted(series, column, value):
+    operand = _operand(series, column, value)
+    if operand is None:
+        shown = "today" if isinstance(value, tuple) else repr(value)
+        raise FilterError(f"{shown} cannot be compared with '{column}' ({series.dtype})")
+    return operand
+
+
+_OPERATORS = {
+    "=": lambda a, b: a == b, "!=": lambda a, b: a != b, "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b, ">": lambda a, b: a > b, ">=": lambda a, b: a >= b,
+}
+
+
+def _mask(tree, df):
+    kind = tree[0]
+    if kind in ("and", "or"):
+        left, right = _mask(tree[1], df), _mask(tree[2], df)
+        return left & right if kind == "and" else left | right
+    if kind == "not":
+        return ~_mask(tree[1], df)
+    column = tree[1]
+    if column not in df.columns:
+        raise FilterError(f"No column named '{column}'")
+    series = df[column]
+    if kind == "empty":
+        missing = series.isna().to_numpy(dtype=bool)
+        return missing | _text_mask(series, lambda text: text == "") if _is_text(series) else missing
+    if kind == "contains":
+        needle = tree[2].lower()
+        return _text_mask(series, lambda text: text.str.contains(needle, regex=False).fillna(False))
+    if kind == "within":
+        if not pd.api.types.is_datetime64_any_dtype(series):
+            raise FilterError(f"'within' needs a date column; '{column}' is {series.dtype}")
+        today = pd.Timestamp.today().normalize()
+        return _bools((series >= today) & (series <= today + pd.Timedelta(days=tree[2])))
+    if kind == "in":
+        values = [_fitted(series, column, value) for value in tree[2]]
+        if _is_text(series):
+            return _text_mask(series, lambda text: text.isin(values).fillna(False))
+        return _bools(series.isin(values))
+    operator, operand = tree[2], _fitted(series, column, tree[3])
+    if _is_text(series):
+        return _text_mask(series, lambda text: _OPERATORS[operator](text, operand).fillna(False))
+    return _bools(_OPERATORS[operator](series, operand))
+
+
+def evaluate(df, expression):
+    """Returns a bool array marking the rows of df that match expression. Raises FilterError."""
+    tree = parse(expression)
+    if tree is None:
+        return np.ones(len(df), dtype=bool)
+    return _mask(tree, df)
+
+
+# --- Result Cache ---
+_results = OrderedDict() # (table, engine, version, source, expression tree, day or None) -> bool array over the table, least recently used first
+_results_guard = threading.Lock()
+
+
+def filter_rows(df, expression):
+    """Returns the rows of df matching expression (all of df for a blank one). Raises FilterError.
+
+    For frames read through storage.load_data the whole table is evaluated
+    once per table version and expression (and day, for one counting from
+    today); a searched or filtered df takes its rows from that result.
+    """
+    tree = parse(expression)
+    if tree is None:
+        return df
+    full_df = storage.source_frame(df)
+    if full_df is None:
+        return df[_mask(tree, df)]
+    key = (os.path.abspath(df.attrs["source"][0]), storage.get_engine().name, df.attrs["table_version"],
+           str(df.attrs["source"]), repr(tree), pd.Timestamp.today().normalize() if _uses_today(tree) else None)
+    with _results_guard:
+        mask = _results.get(key)
+        if mask is not None:
+            _results.move_to_end(key)
+    if mask is None:
+        mask = _mask(tree, full_df)
+        with _results_guard:
+            _results[key] = mask
+            # Results for older table versions, or counted from an earlier day, are never asked for again.
+            for stale in [k for k in _results if k[0] == key[0] and (k[2] != key[2] or key[5] is not None and k[5] not in (None, key[5]))]:
+                del _results[stale]
+            while len(_results) > MAX_CACHED_RESULTS:
+                _results.popitem(last=False)
+    if len(df) == len(full_df) and df.index.equals(full_df.index):
+        return df[mask]
+    return df[mask[full_df.index.get_indexer(df.index)]]
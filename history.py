@@ -0,0 +1,271 @@
+"""Daily KPI history of the supplier table, in a compact columnar store for the dashboard's trend charts.
+
+A snapshot records one day's KPIs: each supplier's metrics, and network-wide
+figures (supplier count, metric means, totals and a category mix). Supplier
+IDs are dictionary-encoded: the IDs are listed once in ids.json, and rows
+carry an int32 code. Values are float32.
+
+Supplier rows are kept in one file per month, sorted by supplier and day. A
+supplier gets a row at its first snapshot of the month and afterwards only
+when its values change, so an unchanged supplier costs one row a month. A
+deleted supplier gets a row of missing values. The network figures are one
+small file of one row per day.
+
+Range queries pick their resolution from the span: daily up to
+DAILY_MAX_DAYS, weekly up to WEEKLY_MAX_DAYS, monthly beyond. Each point is
+the mean over its period, so a chart draws at most a few hundred points
+however long the history gets.
+
+The app records today's snapshot on a background job (scheduler.PeriodicJob)
+at start and every ZENOVA_HISTORY_INTERVAL_SECONDS, so a day keeps the last
+state recorded before midnight. Recording holds a storage.table_lock on the
+history directory's ids.json, so app processes sharing a data directory take
+turns.
+"""
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+import storage
+
+RECORD_INTERVAL_SECONDS = float(os.environ.get("ZENOVA_HISTORY_INTERVAL_SECONDS", 3600)) # How often today's snapshot is refreshed
+DAILY_MAX_DAYS = 92
+WEEKLY_MAX_DAYS = 731
+RESOLUTIONS = {"daily": None, "weekly": "W-MON", "monthly": "MS"}
+EPOCH = pd.Timestamp("1970-01-01")
+
+
+def _day_number(day):
+    return int((pd.Timestamp(day).normalize() - EPOCH).days)
+
+
+def _days(numbers):
+    return EPOCH + pd.to_timedelta(np.asarray(numbers, dtype=np.int64), unit="D")
+
+
+def _write_npz(path, arrays):
+    """Writes arrays to path through a temp file, so readers never see a partial one."""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _read_npz(path):
+    try:
+        with np.load(path) as saved:
+            return {name: saved[name] for name in saved.files}
+    except FileNotFoundError:
+        return None
+
+
+def resolution_for(start, end):
+    """The resolution a chart of [start, end] is drawn at."""
+    span = (pd.Timestamp(end) - pd.Timestamp(start)).days
+    return "daily" if span <= DAILY_MAX_DAYS else "weekly" if span <= WEEKLY_MAX_DAYS else "monthly"
+
+
+def downsample(frame, resolution):
+    """frame (indexed by day) as means per week (from Monday) or month; daily is returned as it is."""
+    rule = RESOLUTIONS[resolution]
+    if rule is None or frame.empty:
+        return frame
+    return frame.resample(rule, label="left", closed="left").mean().dropna(how="all")
+
+
+class KPIHistory:
+    """The KPI history of the table at file_path (load_data columns as given), kept in history_dir.
+
+    metrics are numeric columns recorded per supplier, with their means
+    recorded network-wide; totals are columns whose network sums are
+    recorded too, and mix is (column, values): the network's row count per value.
+    """
+
+    def __init__(self, history_dir, file_path, columns, metrics, totals=(), mix=None):
+        self.history_dir = history_dir
+        self.file_path = file_path
+        self.columns = columns
+        self.metrics = list(metrics)
+        self.totals = list(totals)
+        self.mix = mix
+
+    # --- Paths ---
+    @property
+    def ids_path(self):
+        return os.path.join(self.history_dir, "ids.json")
+
+    @property
+    def network_path(self):
+        return os.path.join(self.history_dir, "network.npz")
+
+    def month_path(self, day):
+        return os.path.join(self.history_dir, f"suppliers-{pd.Timestamp(day):%Y-%m}.npz")
+
+    def version(self):
+        """Changes whenever a snapshot is recorded; None before the first one."""
+        try:
+            return os.stat(self.network_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def network_columns(self):
+        columns = ["suppliers"] + self.metrics + [f"{column} total" for column in self.totals]
+        if self.mix:
+            columns += [f"{self.mix[0]}: {value}" for value in self.mix[1]]
+        return columns
+
+    # --- Recording ---
+    def _codes(self, ids):
+        """Dictionary codes for ids, adding IDs not seen before to ids.json."""
+        try:
+            with open(self.ids_path, "r", encoding="utf-8") as f:
+                known = json.load(f)
+        except FileNotFoundError:
+            known = []
+        index = pd.Index(known)
+        new_ids = pd.Index(ids).difference(index) if len(index) else pd.Index(ids).unique()
+        if len(new_ids):
+            known += new_ids.tolist()
+            index = pd.Index(known)
+            tmp_path = f"{self.ids_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(known, f)
+                os.replace(tmp_path, self.ids_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        return index.get_indexer(ids).astype(np.int32), index
+
+    def record(self, day=None, df=None):
+        """Records the table's KPIs for day (default today), replacing that day's snapshot if there is one.
+
+        df is the table as load_data returns it (default: loaded here). Days
+        are recorded in order: one before the month's last snapshot is refused.
+        """
+        day = pd.Timestamp(day if day is not None else pd.Timestamp.today()).normalize()
+        primary_key = storage.table_spec(self.file_path)["primary_key"]
+        if df is None:
+            usecols = [primary_key] + list(dict.fromkeys(self.metrics + self.totals + ([self.mix[0]] if self.mix else [])))
+            df = storage.load_data(self.file_path, columns=self.columns, usecols=usecols)
+        os.makedirs(self.history_dir, exist_ok=True)
+        # Held across processes too: two app processes recording at once would otherwise hand out the same codes
+        with storage.table_lock(self.ids_path):
+            codes, _ = self._codes(df[primary_key].astype(str).tolist())
+            values = np.column_stack([pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=np.float32, na_value=np.nan)
+                                      if column in df.columns else np.full(len(df), np.nan, dtype=np.float32)
+                                      for column in self.metrics]).reshape(len(df), len(self.metrics))
+            self._record_suppliers(day, codes, values)
+            self._record_network(day, df)
+
+    def _record_suppliers(self, day, codes, values):
+        path = self.month_path(day)
+        number = _day_number(day)
+        saved = _read_npz(path)
+        if saved is None:
+            saved = {"code": np.zeros(0, dtype=np.int32), "day": np.zeros(0, dtype=np.int32),
+                     "values": np.zeros((0, len(self.metrics)), dtype=np.float32)}
+        elif saved["day"].size and saved["day"].max() > number:
+            raise ValueError(f"History for {day:%Y-%m-%d} comes before the last recorded day of its month")
+        keep = saved["day"] < number # Re-recording a day replaces it
+        month_codes, month_days, month_values = saved["code"][keep], saved["day"][keep], self._aligned(saved, keep)
+
+        # Each supplier's latest values this month (rows are sorted by code, then day)
+        last = np.flatnonzero(np.r_[month_codes[1:] != month_codes[:-1], True]) if month_codes.size else np.zeros(0, dtype=int)
+        size = int(max(codes.max(initial=-1), month_codes.max(initial=-1))) + 1
+        previous = np.full((size, len(self.metrics)), np.nan, dtype=np.float32)
+        seen = np.zeros(size, dtype=bool)
+        previous[month_codes[last]] = month_values[last]
+        seen[month_codes[last]] = True
+
+        same = seen[codes] & ((previous[codes] == values) | (np.isnan(previous[codes]) & np.isnan(values))).all(axis=1)
+        gone = np.setdiff1d(month_codes[last][~np.isnan(month_values[last]).all(axis=1)], codes) # Deleted since
+        new_codes = np.concatenate([codes[~same], gone.astype(np.int32)])
+        new_values = np.concatenate([values[~same], np.full((len(gone), len(self.metrics)), np.nan, dtype=np.float32)])
+
+        all_codes = np.concatenate([month_codes, new_codes])
+        all_days = np.concatenate([month_days, np.full(len(new_codes), number, dtype=np.int32)])
+        order = np.lexsort((all_days, all_codes))
+        _write_npz(path, {"code": all_codes[order], "day": all_days[order],
+                          "values": np.concatenate([month_values, new_values])[order],
+                          "metrics": np.array(self.metrics)})
+
+    def _aligned(self, saved, keep):
+        """The saved values' columns in the order of self.metrics (missing for metrics added since)."""
+        names = saved["metrics"].tolist() if "metrics" in saved else self.metrics
+        values = saved["values"][keep]
+        return np.column_stack([values[:, names.index(metric)] if metric in names else np.full(len(values), np.nan, dtype=np.float32)
+                                for metric in self.metrics]).reshape(len(values), len(self.metrics))
+
+    def _record_network(self, day, df):
+        row = {"suppliers": len(df)}
+        for column in self.metrics:
+            row[column] = pd.to_numeric(df[column], errors="coerce").mean() if column in df.columns else np.nan
+        for column in self.totals:
+            row[f"{column} total"] = pd.to_numeric(df[column], errors="coerce").sum() if column in df.columns else np.nan
+        if self.mix:
+            counts = df[self.mix[0]].astype(object).value_counts() if self.mix[0] in df.columns else pd.Series(dtype=int)
+            row.update({f"{self.mix[0]}: {value}": counts.get(value, 0) for value in self.mix[1]})
+
+        frame = self.network()
+        frame.loc[day] = [row.get(column, np.nan) for column in frame.columns]
+        frame = frame.sort_index()
+        _write_npz(self.network_path, {"day": np.array([_day_number(d) for d in frame.index], dtype=np.int32),
+                                       **{column: frame[column].to_numpy(dtype=np.float32) for column in frame.columns}})
+
+    # --- Range Queries ---
+    def network(self, start=None, end=None):
+        """The network-wide figures per recorded day within [start, end], indexed by day."""
+        saved = _read_npz(self.network_path)
+        columns = self.network_columns()
+        if saved is None:
+            return pd.DataFrame(columns=columns, index=pd.DatetimeIndex([], name="day"), dtype=np.float32)
+        frame = pd.DataFrame({column: saved[column] if column in saved else np.full(len(saved["day"]), np.nan, dtype=np.float32)
+                              for column in columns}, index=pd.DatetimeIndex(_days(saved["day"]), name="day"))
+        return frame.loc[start:end]
+
+    def supplier(self, supplier_id, start=None, end=None):
+        """One supplier's metrics on each recorded day within [start, end], indexed by day (missing while absent)."""
+        recorded = self.network(start, end).index
+        if recorded.empty:
+            return pd.DataFrame(columns=self.metrics, index=recorded, dtype=np.float32)
+        try:
+            with open(self.ids_path, "r", encoding="utf-8") as f:
+                code = json.load(f).index(str(supplier_id))
+        except (FileNotFoundError, ValueError):
+            return pd.DataFrame(np.nan, columns=self.metrics, index=recorded, dtype=np.float32)
+        parts = []
+        for month in pd.period_range(recorded[0], recorded[-1], freq="M"):
+            saved = _read_npz(self.month_path(month.start_time))
+            if saved is None:
+                continue
+            low, high = np.searchsorted(saved["code"], [code, code + 1])
+            if high > low:
+                parts.append(pd.DataFrame(self._aligned(saved, slice(low, high)), columns=self.metrics,
+                                          index=pd.DatetimeIndex(_days(saved["day"][low:high]), name="day")))
+        if not parts:
+            return pd.DataFrame(np.nan, columns=self.metrics, index=recorded, dtype=np.float32)
+        # Rows are kept only on change, and every month opens with one: each day takes the month's latest row
+        rows = pd.concat(parts)
+        positions = rows.index.searchsorted(recorded, side="right") - 1
+        found = (positions >= 0) & (rows.index[positions.clip(0)].to_period("M") == recorded.to_period("M"))
+        frame = pd.DataFrame(np.nan, columns=self.metrics, index=recorded, dtype=np.float32)
+        frame.iloc[np.flatnonzero(found)] = rows.to_numpy()[positions[found]]
+        return frame
+
+    def trend(self, start=None, end=None, supplier_id=None, resolution=None):
+        """(frame, resolution): the network's (or one supplier's) series over [start, end], downsampled for charting."""
+        frame = self.network(start, end) if supplier_id is None else self.supplier(supplier_id, start, end)
+        if frame.empty:
+            return frame, resolution or "daily"
+        resolution = resolution or resolution_for(start if start is not None else frame.index[0],
+                                                  end if end is not None else frame.index[-1])
+        return downsample(frame, resolution), resolution
+
@@ -0,0 +1,155 @@
+"""Join indexes from a value (e.g. a supplier's name or ID) to the rows of other tables that mention it.
+
+Tables refer to a supplier by free text: ``assets.supplier``, the assignee of
+a task or audit point, a file's uploader, a message's recipient, an event's
+attendees. A join index maps each value of one such column (trimmed and
+case-folded; every element of a list column) to the primary keys of the rows
+holding it. It is built once per table and column, shared by all sessions,
+and kept current from the writes storage reports, so looking a supplier up
+costs a dict lookup plus fetching its own rows by key, however large the
+tables grow.
+"""
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+import storage
+
+
+def normalize(value):
+    """The form values are matched in: trimmed and case-folded text."""
+    return str(value).strip().casefold()
+
+
+def _cells(series):
+    """One entry per value in the column: list cells are split into their elements, blanks dropped."""
+    if series.dtype == object:
+        series = series.explode()
+    return series.dropna()
+
+
+class JoinIndex:
+    """Maps the normalized values of one column to the primary keys of the rows holding them."""
+
+    def __init__(self, frame, column, primary_key, version, schema=None):
+        self.column = column
+        self.primary_key = primary_key
+        self.version = version
+        self.schema = schema # load_data's columns argument, for typing written rows
+        # normalized value -> primary keys: an array as built, a set once a write touches it
+        self._keys = self._grouped(frame)
+        self._guard = threading.Lock()
+
+    def _cells(self, rows):
+        if rows.empty or self.column not in rows.columns or self.primary_key not in rows.columns:
+            return pd.Series(dtype=object)
+        return _cells(rows.set_index(self.primary_key)[self.column])
+
+    def _grouped(self, frame):
+        """Groups the keys of a whole table by value, normalizing each distinct value once."""
+        cells = self._cells(frame)
+        codes, uniques = pd.factorize(cells.to_numpy(), sort=False)
+        value_codes, values = pd.factorize(pd.Series(uniques, dtype="string").str.strip().str.casefold().to_numpy(), sort=False)
+        codes = value_codes[codes] if len(value_codes) else codes
+        order = np.argsort(codes, kind="stable")
+        bounds = np.cumsum(np.bincount(codes, minlength=len(values)))
+        keys = np.split(cells.index.to_numpy()[order], bounds[:-1])
+        return {value: group for value, group in zip(values, keys) if value}
+
+    def _pairs(self, rows):
+        cells = self._cells(rows)
+        normalized = cells.astype("string").str.strip().str.casefold()
+        return [(value, key) for value, key in zip(normalized.tolist(), normalized.index.tolist()) if value]
+
+    def _add(self, rows):
+        for value, key in self._pairs(rows):
+            keys = self._keys.get(value)
+            if not isinstance(keys, set):
+                keys = self._keys[value] = set(keys.tolist() if keys is not None else ())
+            keys.add(key)
+
+    def _remove(self, rows):
+        for value, key in self._pairs(rows):
+            keys = self._keys.get(value)
+            if keys is None:
+                continue
+            if not isinstance(keys, set):
+                keys = self._keys[value] = set(keys.tolist())
+            keys.discard(key)
+            if not keys:
+                del self._keys[value]
+
+    def update(self, version, added=None, removed=None):
+        """Records one write: added and removed are frames of rows put in or taken out."""
+        with self._guard:
+            if removed is not None:
+                self._remove(removed)
+            if added is not None:
+                self._add(added)
+            self.version = version
+
+    def keys_for(self, values):
+        """The primary keys of the rows whose column holds any of values."""
+        with self._guard:
+            found = set()
+            for value in values:
+                found.update(self._keys.get(normalize(value), ()))
+            return found
+
+
+_indexes = {} # (abspath, column) -> JoinIndex
+_indexes_guard = threading.Lock()
+
+
+def _apply(index, change):
+    """Applies one write to a join index; a replaced table is indexed afresh on the next lookup instead."""
+    if change["op"] == "replace":
+        return False
+    removed = storage.typed_rows(pd.DataFrame(change.get("old_rows") or []), index.schema)
+    if change["op"] == "upsert":
+        added = storage.typed_rows(pd.DataFrame([change["row"]] if change["row"] is not None else []), index.schema)
+    else:
+        added = storage.typed_rows(change.get("rows", pd.DataFrame()).copy(), index.schema)
+    index.update(change["version"], added=added, removed=removed)
+    return True
+
+
+def _on_change(file_path, change):
+    storage.follow_change(_indexes, _indexes_guard, file_path, change, _apply)
+
+
+storage.on_change(_on_change)
+
+
+def join_index(file_path, column, columns=None):
+    """Returns the join index of column in the table at file_path, building it on first use.
+
+    columns is the table's load_data columns argument (a schema dict decodes
+    list columns such as event attendees).
+    """
+    key = (os.path.abspath(file_path), column)
+    with _indexes_guard:
+        index = _indexes.get(key)
+    if index is not None and index.version == storage.table_version(file_path):
+        return index
+    primary_key = storage.table_spec(file_path)["primary_key"]
+    with storage.table_lock(file_path): # No write can slip between reading and registering
+        frame = storage.load_data(file_path, columns=columns, usecols=[primary_key, column])
+        index = JoinIndex(frame, column, primary_key, frame.attrs["table_version"], columns)
+        with _indexes_guard:
+            _indexes[key] = index
+    return index
+
+
+def related_rows(file_path, join_columns, values, columns=None):
+    """Returns the rows of the table at file_path whose join_columns hold any of values.
+
+    Only the matching rows are read (by primary key), typed with columns when
+    it is a schema dict.
+    """
+    keys = set()
+    for column in join_columns:
+        keys |= join_index(file_path, column, columns).keys_for(values)
+    return storage.load_rows(file_path, sorted(keys), columns)
@@ -0,0 +1,431 @@
+"""Incrementally maintained KPI aggregates for the OEM Dashboard.
+
+A KPI view is a named set of aggregates over one table: counts, means, counts
+or sums per value, the keys of the rows meeting a condition (optionally
+grouped by a date, for lists such as "overdue" that depend on today's date),
+top-k leaderboards and badge bitsets.
+Conditions are filters.py expressions. A view is computed once per table from
+the shared cached frame, then kept current from the writes storage reports:
+each write adds or removes a handful of rows' contributions, so the dashboard
+reads a few numbers and small dicts instead of aggregating whole tables on
+every render.
+"""
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+import filters
+import storage
+
+
+# --- Aggregates ---
+def _bump(counts, value, change):
+    """Adds change to counts[value], dropping the entry once it reaches zero."""
+    total = counts.get(value, 0) + change
+    if total > 0:
+        counts[value] = total
+    else:
+        counts.pop(value, None)
+
+
+class Aggregate:
+    """One maintained value; where (a filter expression) limits the rows it covers."""
+
+    stale = False # Set once writes alone can no longer keep it current; the view is then recomputed on its next read
+
+    def __init__(self, where=None):
+        self.where = where
+
+    def _params(self):
+        return (self.where,)
+
+    def __repr__(self):
+        return f"{type(self).__name__}{self._params()!r}"
+
+    def columns(self):
+        """Columns the aggregate reads."""
+        return filters.referenced_columns(self.where)
+
+    def add(self, rows, sign, primary_key):
+        """Counts rows (already limited by where) in (sign=1) or out (sign=-1)."""
+        raise NotImplementedError
+
+
+class Count(Aggregate):
+    """Number of rows."""
+
+    def __init__(self, where=None):
+        super().__init__(where)
+        self.value = 0
+
+    def add(self, rows, sign, primary_key):
+        self.value += sign * len(rows)
+
+
+class Mean(Aggregate):
+    """Mean of a numeric column over its non-missing values (None if there are none)."""
+
+    def __init__(self, column, where=None):
+        super().__init__(where)
+        self.column = column
+        self.total = 0.0
+        self.count = 0
+
+    def _params(self):
+        return (self.column, self.where)
+
+    def columns(self):
+        return super().columns() | {self.column}
+
+    def add(self, rows, sign, primary_key):
+        values = rows[self.column].dropna()
+        self.total += sign * float(values.sum())
+        self.count += sign * len(values)
+
+    @property
+    def value(self):
+        return self.total / self.count if self.count else None
+
+
+class CountBy(Aggregate):
+    """Rows per value of a column; missing values are counted under missing, if given."""
+
+    def __init__(self, column, where=None, missing=None):
+        super().__init__(where)
+        self.column = column
+        self.missing = missing
+        self.value = {}
+
+    def _params(self):
+        return (self.column, self.where, self.missing)
+
+    def columns(self):
+        return super().columns() | {self.column}
+
+    def add(self, rows, sign, primary_key):
+        values = rows[self.column].astype(object)
+        if self.missing is not None:
+            values = values.where(values.notna(), self.missing)
+        for value, count in values.value_counts(dropna=True, sort=False).items():
+            _bump(self.value, value, sign * int(count))
+
+
+class SumBy(Aggregate):
+    """Sum of a numeric column per value of another."""
+
+    def __init__(self, column, by, where=None):
+        super().__init__(where)
+        self.column = column
+        self.by = by
+        self.value = {}
+        self._rows = {} # by value -> rows, so a value leaves once its last row does
+
+    def _params(self):
+        return (self.column, self.by, self.where)
+
+    def columns(self):
+        return super().columns() | {self.column, self.by}
+
+    def add(self, rows, sign, primary_key):
+        groups = rows[self.column].groupby(rows[self.by].astype(object), sort=False)
+        sums, sizes = groups.sum(min_count=0), groups.size()
+        for value, total in sums.items():
+            _bump(self._rows, value, sign * int(sizes[value]))
+            if value in self._rows:
+                self.value[value] = self.value.get(value, 0) + sign * (total.item() if hasattr(total, "item") else total)
+            else:
+                self.value.pop(value, None)
+
+
+class Keys(Aggregate):
+    """Primary keys of the rows, e.g. for listing the suppliers behind an alert."""
+
+    def __init__(self, where=None):
+        super().__init__(where)
+        self._keys = set()
+
+    def add(self, rows, sign, primary_key):
+        keys = rows[primary_key].tolist()
+        if sign > 0:
+            self._keys.update(keys)
+        else:
+            self._keys.difference_update(keys)
+
+    @property
+    def value(self):
+        return len(self._keys)
+
+    def keys(self):
+        return sorted(self._keys)
+
+
+class KeysBy(Aggregate):
+    """Primary keys of the rows grouped by the day in a date column, for conditions relative to today.
+
+    "Overdue" moves with the calendar, not with writes, so the view keeps the
+    keys per day and the caller picks the days before or between dates.
+    """
+
+    def __init__(self, date_column, where=None):
+        super().__init__(where)
+        self.date_column = date_column
+        self._days = {} # day -> set of keys
+
+    def _params(self):
+        return (self.date_column, self.where)
+
+    def columns(self):
+        return super().columns() | {self.date_column}
+
+    def add(self, rows, sign, primary_key):
+        dated = rows[rows[self.date_column].notna()]
+        days = pd.to_datetime(dated[self.date_column]).dt.normalize()
+        for day, keys in dated[primary_key].groupby(days, sort=False):
+            keys = keys.tolist()
+            if sign > 0:
+                self._days.setdefault(day, set()).update(keys)
+            elif day in self._days:
+                self._days[day].difference_update(keys)
+                if not self._days[day]:
+                    del self._days[day]
+
+    def _selected(self, start, end):
+        return [keys for day, keys in self._days.items() if (start is None or day >= start) and (end is None or day < end)]
+
+    def count(self, start=None, end=None):
+        """Rows dated in [start, end); either bound may be None."""
+        return sum(len(keys) for keys in self._selected(start, end))
+
+    def keys(self, start=None, end=None):
+        return sorted(key for keys in self._selected(start, end) for key in keys)
+
+
+class TopK(Aggregate):
+    """Primary keys of the k rows with the largest values of a numeric column, largest first (ties by key).
+
+    It holds the best RESERVE * k rows, so a leader that is written down or
+    deleted is replaced from the reserve. Only when the reserve runs out does
+    the aggregate go stale and the view get recomputed.
+    """
+
+    RESERVE = 4
+
+    def __init__(self, column, k, where=None):
+        super().__init__(where)
+        self.column = column
+        self.k = k
+        self._best = {} # key -> value, the best rows
+        self._count = 0 # Rows with a value, held or not
+
+    def _params(self):
+        return (self.column, self.k, self.where)
+
+    def columns(self):
+        return super().columns() | {self.column}
+
+    @staticmethod
+    def _rank(item):
+        key, value = item
+        return (-value, key)
+
+    def add(self, rows, sign, primary_key):
+        values = pd.to_numeric(rows[self.column], errors="coerce").dropna()
+        keys = rows[primary_key].loc[values.index]
+        if sign < 0:
+            self._count -= len(values)
+            for key in keys.tolist():
+                self._best.pop(key, None)
+            if len(self._best) < min(self.k, self._count):
+                self.stale = True
+            return
+        # Rows not held rank below the worst held one, so a new row beating it is held and others are not
+        unheld = self._count - len(self._best)
+        self._count += len(values)
+        if unheld and not self._best:
+            self.stale = True
+            return
+        worst = max(map(self._rank, self._best.items())) if unheld else None
+        candidates = values.nlargest(self.k * self.RESERVE, keep="all") # Ties at the cut are all kept, to break by key
+        for key, value in zip(keys.loc[candidates.index].tolist(), candidates.tolist()):
+            if worst is None or (-value, key) < worst:
+                self._best[key] = value
+        if len(self._best) > self.k * self.RESERVE:
+            self._best = dict(sorted(self._best.items(), key=self._rank)[:self.k * self.RESERVE])
+
+    def keys(self):
+        return [key for key, _ in sorted(self._best.items(), key=self._rank)[:self.k]]
+
+    @property
+    def value(self):
+        return self.keys()
+
+
+class Badges(Aggregate):
+    """Which rows meet each of several conditions (badge name -> filter expression), as one bitset per badge.
+
+    Every primary key gets a slot; a badge's bit for the slot is set while the
+    row meets its condition. The counts are kept as bits change, so reading
+    them costs the same however many rows there are.
+    """
+
+    def __init__(self, badges):
+        super().__init__()
+        self.badges = dict(badges)
+        self._slots = {} # key -> slot
+        self._free = [] # Slots of removed rows, reused first
+        self._bits = {name: np.zeros(0, dtype=np.uint8) for name in self.badges}
+        self.value = dict.fromkeys(self.badges, 0)
+
+    def _params(self):
+        return (tuple(self.badges.items()),)
+
+    def columns(self):
+        return set().union(*(filters.referenced_columns(where) for where in self.badges.values()))
+
+    def _assign(self, keys):
+        reused, self._free = self._free[:len(keys)], self._free[len(keys):]
+        start = len(self._slots) + len(self._free) + len(reused)
+        slots = np.array(reused + list(range(start, start + len(keys) - len(reused))), dtype=np.int64)
+        self._slots.update(zip(keys, slots.tolist()))
+        size = (int(slots.max()) >> 3) + 1 if len(slots) else 0
+        for name, bits in self._bits.items():
+            if size > len(bits): # Grown by at least half, so a run of inserts copies little
+                self._bits[name] = np.concatenate([bits, np.zeros(max(size, len(bits) * 3 // 2) - len(bits), dtype=np.uint8)])
+        return slots
+
+    def _test(self, name, slots):
+        return (self._bits[name][slots >> 3] >> (slots & 7) & 1).astype(bool)
+
+    def add(self, rows, sign, primary_key):
+        keys = rows[primary_key].tolist()
+        if sign < 0:
+            slots = np.array([self._slots.pop(key) for key in keys if key in self._slots], dtype=np.int64)
+            for name in self.badges:
+                self.value[name] -= int(self._test(name, slots).sum())
+                np.bitwise_and.at(self._bits[name], slots >> 3, ~(1 << (slots & 7)).astype(np.uint8))
+            self._free.extend(slots.tolist())
+            return
+        slots = self._assign(keys)
+        for name, where in self.badges.items():
+            met = slots[filters.evaluate(rows, where)]
+            np.bitwise_or.at(self._bits[name], met >> 3, (1 << (met & 7)).astype(np.uint8))
+            self.value[name] += len(met)
+
+    def flags(self, keys):
+        """{badge name: [whether each of keys has it]}; unknown keys have none."""
+        slots = np.array([self._slots.get(key, -1) for key in keys], dtype=np.int64)
+        known = slots >= 0
+        flags = {}
+        for name in self.badges:
+            has = np.zeros(len(slots), dtype=bool)
+            has[known] = self._test(name, slots[known])
+            flags[name] = has.tolist()
+        return flags
+
+
+# --- KPI Views ---
+class KPIView:
+    """Named aggregates over one table, kept current through that table's writes."""
+
+    def __init__(self, frame, primary_key, version, schema, aggregates):
+        self.primary_key = primary_key
+        self.version = version
+        self.schema = schema # load_data's columns argument, for typing written rows
+        # Fresh instances, so rebuilding from the same definitions starts from zero
+        self.aggregates = {name: type(aggregate)(*aggregate._params()) for name, aggregate in aggregates.items()}
+        self.signature = repr(sorted(aggregates.items()))
+        self.columns = list(frame.columns)
+        self._guard = threading.Lock()
+        self._add(frame, 1)
+
+    def _add(self, rows, sign):
+        if rows is None or rows.empty:
+            return
+        for aggregate in self.aggregates.values():
+            selected = rows[filters.evaluate(rows, aggregate.where)] if aggregate.where else rows
+            if not selected.empty:
+                aggregate.add(selected, sign, self.primary_key)
+
+    def update(self, version, added=None, removed=None):
+        """Records one write: added and removed are frames of rows put in or taken out."""
+        with self._guard:
+            self._add(removed, -1)
+            self._add(added, 1)
+            self.version = version
+
+    def __getitem__(self, name):
+        """The aggregate's value (for Keys, the row count)."""
+        with self._guard:
+            return self.aggregates[name].value
+
+    def count(self, name, start=None, end=None):
+        """Rows of a KeysBy aggregate dated in [start, end)."""
+        with self._guard:
+            return self.aggregates[name].count(start, end)
+
+    def keys(self, name, *bounds):
+        """Primary keys held by a Keys, KeysBy or TopK aggregate (within [start, end) for KeysBy)."""
+        with self._guard:
+            return self.aggregates[name].keys(*bounds)
+
+    def flags(self, name, keys):
+        """A Badges aggregate's badges for these keys."""
+        with self._guard:
+            return self.aggregates[name].flags(keys)
+
+    def stale(self):
+        with self._guard:
+            return any(aggregate.stale for aggregate in self.aggregates.values())
+
+
+_views = {} # (abspath, view name) -> KPIView
+_views_guard = threading.Lock()
+
+
+def _apply(view, change):
+    """Applies one write to a KPI view; a replaced table, or a view the write left stale, is computed afresh on the next read instead."""
+    if change["op"] == "replace":
+        return False
+    old_rows = change.get("old_rows") or []
+    if change["op"] == "upsert":
+        added = pd.DataFrame([change["row"]] if change["row"] is not None else [])
+    else:
+        added = change.get("rows", pd.DataFrame())
+    # Typed in one frame: the old rows first, then the new ones
+    rows = pd.concat([pd.DataFrame(old_rows), added], ignore_index=True).reindex(columns=view.columns)
+    rows = storage.typed_rows(rows, view.schema)
+    view.update(change["version"], added=rows.iloc[len(old_rows):], removed=rows.iloc[:len(old_rows)])
+    return not view.stale()
+
+
+def _on_change(file_path, change):
+    storage.follow_change(_views, _views_guard, file_path, change, _apply)
+
+
+storage.on_change(_on_change)
+
+
+def kpi_view(file_path, columns, name, aggregates):
+    """Returns the KPI view called name over the table at file_path, computing it on first use.
+
+    aggregates maps names to Aggregate objects; columns is the table's
+    load_data columns argument. The view is shared by all sessions and
+    recomputed only if the table was changed behind storage's back or the
+    aggregates' definitions change.
+    """
+    key = (os.path.abspath(file_path), name)
+    with _views_guard:
+        view = _views.get(key)
+    if (view is not None and view.signature == repr(sorted(aggregates.items()))
+            and view.version == storage.table_version(file_path)):
+        return view
+    primary_key = storage.table_spec(file_path)["primary_key"]
+    needed = set().union(*(aggregate.columns() for aggregate in aggregates.values())) | {primary_key}
+    with storage.table_lock(file_path): # No write can slip between reading and registering
+        frame = storage.load_data(file_path, columns=columns, usecols=sorted(needed))
+        view = KPIView(frame, primary_key, frame.attrs["table_version"], columns, aggregates)
+        with _views_guard:
+            _views[key] = view
+    return view
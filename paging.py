@@ -0,0 +1,86 @@
+"""Server-side sorting and paging for the tabs' tables.
+
+Only one page of a table is handed to ``st.dataframe``, so a rerun sends a
+page of rows to the browser instead of the whole table. Sorting a table is
+done once per table version and column (searching and filtering only pick
+rows out of that order), and the page slices themselves are cached per table
+version for all sessions.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+import storage
+
+PAGE_SIZE = 50
+MAX_CACHED_PAGES = 256
+
+
+# --- Sort Order ---
+def _sort_labels(df, column, ascending):
+    return df[column].sort_values(ascending=ascending, kind="stable", na_position="last").index
+
+
+def sorted_labels(df, column, ascending=True):
+    """Returns df's index labels ordered by column (missing values last).
+
+    For frames read through storage.load_data, the whole table is sorted once
+    per table version and column; a searched or filtered df takes its rows
+    from that order instead of being sorted again.
+    """
+    full_df = storage.source_frame(df)
+    if full_df is None:
+        return _sort_labels(df, column, ascending)
+    file_path = df.attrs["source"][0]
+    version = (storage.get_engine().name, df.attrs["table_version"])
+    order = storage.cached_derived(file_path, version, ("sort", column, ascending, str(df.attrs["source"])),
+                                   lambda: _sort_labels(full_df, column, ascending))
+    if len(df) == len(full_df):
+        return order
+    order = order[order.isin(df.index)]
+    return order if len(order) == len(df) else _sort_labels(df, column, ascending)
+
+
+# --- Page Cache ---
+_pages = OrderedDict() # (table, version, rows, columns, sort, page, size) -> DataFrame, least recently used first
+_pages_guard = threading.Lock()
+
+
+def _rows_signature(df):
+    """A cheap fingerprint of which rows df holds (e.g. after a search), for the page cache key."""
+    return len(df), int(pd.util.hash_pandas_object(df.index, index=False).sum())
+
+
+def page_count(rows, size=PAGE_SIZE):
+    return max(1, -(-rows // size))
+
+
+def page(df, number, sort_column=None, ascending=True, size=PAGE_SIZE):
+    """Returns rows [number * size, (number + 1) * size) of df, sorted by sort_column if given.
+
+    Pages of frames read through storage.load_data are cached per table
+    version and shared by every session until the table is written again.
+    """
+    cacheable = storage.source_frame(df) is not None
+    if cacheable:
+        key = (os.path.abspath(df.attrs["source"][0]), storage.get_engine().name, df.attrs["table_version"],
+               _rows_signature(df), tuple(df.columns), sort_column, ascending, number, size)
+        with _pages_guard:
+            if key in _pages:
+                _pages.move_to_end(key)
+                return _pages[key]
+    if sort_column:
+        rows = df.loc[sorted_labels(df, sort_column, ascending)[number * size:(number + 1) * size]]
+    else:
+        rows = df.iloc[number * size:(number + 1) * size]
+    if cacheable:
+        with _pages_guard:
+            _pages[key] = rows
+            # Pages of older table versions are never asked for again.
+            for stale in [k for k in _pages if k[0] == key[0] and k[2] != key[2]]:
+                del _pages[stale]
+            while len(_pages) > MAX_CACHED_PAGES:
+                _pages.popitem(last=False)
+    return rows
@@ -0,0 +1,118 @@
+"""Composite supplier risk score: a supplier's risk factors weighted into one score from 0 (none) to 100.
+
+Each factor turns a column into a risk from 0 to 1 by where its value lies
+between a best and a worst value: on-time delivery, quality rejects, the last
+audit, the ESG score, the days left on the contract and the annual spend at
+stake (on a log scale). The score is the weighted mean of the factors a
+supplier has values for. Weights default in FACTORS and can be overridden per
+deployment with an environment variable named after the column, e.g.
+``ZENOVA_RISK_WEIGHT_ESG_SCORE=0.3``; a weight of 0 leaves the factor out.
+
+A RiskModel is a computed column of its table (storage.computed_column), so
+the score is read with the table like any other column: load_data scores a
+whole table version in one vectorized pass, and a write rescores only the rows
+it wrote, which is what keeps the KPI views over the score current. Days left
+on a contract move with the calendar, so just after midnight roll_day moves
+the models to the new date and touches their tables (storage.touch).
+"""
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+import storage
+
+RISK_COLUMN = "risk_score"
+RISK_WEIGHT_ENV_PREFIX = "ZENOVA_RISK_WEIGHT_"
+
+# Column -> (default weight, best value, worst value, scale). Values past the worst count as the worst.
+FACTORS = {
+    "on_time_delivery_rate": (0.25, 100, 80, "linear"), # %
+    "quality_reject_rate": (0.20, 0, 5, "linear"), # %
+    "last_audit_score": (0.20, 100, 50, "linear"),
+    "ESG_score": (0.15, 100, 40, "linear"),
+    "contract_end_date": (0.10, 365, 0, "days_left"), # An ended contract has 0 days left
+    "annual_spend_usd": (0.10, 4, 7, "log10"), # $10k to $10M at stake
+}
+
+
+def configured_weights(factors=FACTORS):
+    """{column: weight}: ZENOVA_RISK_WEIGHT_<COLUMN> if set, else the factor's default."""
+    return {column: float(os.environ.get(RISK_WEIGHT_ENV_PREFIX + column.upper(), spec[0]))
+            for column, spec in factors.items()}
+
+
+def factor_risk(values, best, worst, scale, day):
+    """The risk from 0 to 1 of each of values (a Series), NaN where the value is missing."""
+    if scale == "days_left":
+        ends = pd.to_datetime(values, errors="coerce", format="ISO8601")
+        x = np.floor(((ends - day) / pd.Timedelta(days=1)).to_numpy(dtype=float, na_value=np.nan)) # Whole days, stored with a time or not
+    else:
+        x = pd.to_numeric(values, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+        if scale == "log10":
+            x = np.log10(np.maximum(x, 1))
+    return np.clip((x - best) / (worst - best), 0, 1)
+
+
+class RiskModel:
+    """Scores the rows of the table at file_path into column, weighting FACTORS by weights ({column: weight})."""
+
+    def __init__(self, file_path, weights, column=RISK_COLUMN):
+        self.file_path = file_path
+        self.column = column
+        self.weights = {col: float(weight) for col, weight in weights.items() if col in FACTORS and weight > 0}
+        if not self.weights:
+            raise ValueError("A risk score needs at least one factor with a weight above 0")
+        self.signature = repr(sorted(self.weights.items()))
+        self.day = pd.Timestamp.today().normalize() # Days left on contracts count from here
+
+    def score(self, df):
+        """The score of each row of df (NaN where no factor has a value), rounded to 0.1."""
+        total = np.zeros(len(df))
+        weight = np.zeros(len(df))
+        for column, column_weight in self.weights.items():
+            if column not in df.columns:
+                continue
+            risk = factor_risk(df[column], *FACTORS[column][1:], self.day)
+            known = ~np.isnan(risk)
+            total += np.where(known, risk, 0) * column_weight
+            weight += known * column_weight
+        with np.errstate(invalid="ignore"):
+            return np.round(100 * total / weight, 1)
+
+    def roll_day(self):
+        """Moves the scores to today's date, if it has changed since they were computed."""
+        today = pd.Timestamp.today().normalize()
+        if today != self.day:
+            with storage.table_lock(self.file_path): # No row is scored for the old date after the touch
+                self.day = today
+                storage.touch(self.file_path)
+
+
+_models = {} # (abspath, column) -> RiskModel
+_models_guard = threading.Lock()
+
+
+def risk_model(file_path, weights=None, column=RISK_COLUMN):
+    """Returns the model scoring the table at file_path into column, adding it to the table on first use (one per process).
+
+    weights default to configured_weights(); a model with other weights replaces the one in place.
+    """
+    model = RiskModel(file_path, configured_weights() if weights is None else weights, column)
+    key = (os.path.abspath(file_path), column)
+    with _models_guard:
+        current = _models.get(key)
+        if current is not None and current.signature == model.signature:
+            return current
+        _models[key] = model
+    storage.computed_column(file_path, column, list(model.weights), model.score)
+    return model
+
+
+def roll_day():
+    """Moves every model to today's date; the app runs this just after midnight."""
+    with _models_guard:
+        models = list(_models.values())
+    for model in models:
+        model.roll_day()
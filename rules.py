@@ -0,0 +1,112 @@
+"""Declarative co-pilot rules: the dashboard's insights and alerts, evaluated together per table.
+
+A rule picks the rows of one table that meet a condition: a filters.py
+expression in which ``{threshold}`` stands for the rule's threshold, and
+optionally a date column compared with today ("past_due", "older_than" a
+number of days, or "due_within" the coming days). Thresholds default in the
+rule and can be overridden per deployment with an environment variable named
+after the rule, e.g. ``ZENOVA_RULE_IDLE_ASSETS=90``.
+
+The planner groups rules by table into one KPI view per table (kpis.py), so
+a table is read and its dates parsed once for all of its rules and then kept
+current by writes; a new rule adds an aggregate to its table's view, not a
+scan. Results are cached per table versions and day, shared by all sessions.
+"""
+import os
+import threading
+
+import pandas as pd
+
+from kpis import Keys, KeysBy, kpi_view
+
+RULE_ENV_PREFIX = "ZENOVA_RULE_"
+DATE_CONDITIONS = ("past_due", "older_than", "due_within")
+
+
+def configured_threshold(name, default):
+    """The rule's threshold: ZENOVA_RULE_<NAME> if set, else default (kept an int when default is)."""
+    value = os.environ.get(RULE_ENV_PREFIX + name.upper())
+    if value is None or default is None:
+        return default
+    return int(value) if isinstance(default, int) else float(value)
+
+
+class Rule:
+    """One insight: the rows of the table at file_path that meet where (and the date condition, if any).
+
+    columns is the table's load_data columns argument. With date_column, when
+    is "past_due" (dated before tomorrow), "older_than" (more than threshold
+    days before today) or "due_within" (from tomorrow through threshold days
+    ahead).
+    """
+
+    def __init__(self, name, file_path, columns, where=None, threshold=None, date_column=None, when=None):
+        if (date_column is None) != (when is None) or (when is not None and when not in DATE_CONDITIONS):
+            raise ValueError(f"Rule {name!r}: a date_column needs a when of {', '.join(DATE_CONDITIONS)}")
+        self.name = name
+        self.file_path = file_path
+        self.columns = columns
+        self.threshold = configured_threshold(name, threshold)
+        self.where = where.format(threshold=self.threshold) if where else None
+        self.date_column = date_column
+        self.when = when
+
+    def __repr__(self):
+        return f"Rule{(self.name, self.file_path, self.where, self.threshold, self.date_column, self.when)!r}"
+
+    def aggregate(self):
+        """The KPI view aggregate holding the keys this rule can select from."""
+        return KeysBy(self.date_column, self.where) if self.date_column else Keys(self.where)
+
+    def days(self, today):
+        """The [start, end) dates the rule selects, for a date rule."""
+        tomorrow = today + pd.Timedelta(days=1)
+        if self.when == "past_due":
+            return None, tomorrow
+        if self.when == "older_than":
+            return None, today - pd.Timedelta(days=self.threshold)
+        return tomorrow, tomorrow + pd.Timedelta(days=self.threshold)
+
+
+def plan(rules):
+    """Groups rules by table: file_path -> (columns, {aggregate name: aggregate}), one view's worth each.
+
+    Rules with the same condition (e.g. overdue and upcoming audits) share an aggregate.
+    """
+    tables, names = {}, set()
+    for rule in rules:
+        if rule.name in names:
+            raise ValueError(f"Two rules are named {rule.name!r}")
+        names.add(rule.name)
+        aggregate = rule.aggregate()
+        tables.setdefault(rule.file_path, (rule.columns, {}))[1][repr(aggregate)] = aggregate
+    return tables
+
+
+_results = {} # repr(rules) -> (table versions and day, results)
+_results_guard = threading.Lock()
+
+
+def evaluate(rules, today=None):
+    """Returns {rule name: sorted primary keys of the rows it selects} as of today (default: the current date).
+
+    The result is shared by all sessions until a rule's table is written to or
+    the day changes; callers must not modify it.
+    """
+    today = pd.Timestamp(today if today is not None else pd.Timestamp.today()).normalize()
+    views = {file_path: kpi_view(file_path, columns, "rules", aggregates)
+             for file_path, (columns, aggregates) in plan(rules).items()}
+    signature = repr(rules)
+    state = (tuple((file_path, view.version) for file_path, view in views.items()), today)
+    with _results_guard:
+        cached = _results.get(signature)
+    if cached is not None and cached[0] == state:
+        return cached[1]
+    results = {}
+    for rule in rules:
+        view = views[rule.file_path]
+        name = repr(rule.aggregate())
+        results[rule.name] = view.keys(name, *rule.days(today)) if rule.date_column else view.keys(name)
+    with _results_guard:
+        _results[signature] = (state, results)
+    return results
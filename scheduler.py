@@ -0,0 +1,196 @@
+"""Background refresh of the co-pilot insights, so a dashboard render only reads the latest snapshot.
+
+An InsightScheduler evaluates its rules (rules.py) on a daemon thread: at
+start, every ZENOVA_INSIGHT_INTERVAL_SECONDS and at midnight (the date rules
+move with the calendar), and shortly after any write to a table the rules read
+(storage.on_change). Writes arriving within ZENOVA_INSIGHT_DEBOUNCE_SECONDS of
+each other are folded into one refresh.
+
+Each result is kept as a Snapshot with the time it was computed and the table
+versions it reflects, in memory for all sessions and in a JSON file, so after a
+restart the dashboard shows the last snapshot while the first new one is
+computed. Rendering the dashboard then costs the same however large the
+tables grow; a write shows up in the insights a refresh later.
+
+A PeriodicJob runs other background work on the same terms, such as taking
+the day's KPI history snapshot (history.py).
+"""
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+
+import rules as rule_engine
+import storage
+
+INTERVAL_SECONDS = float(os.environ.get("ZENOVA_INSIGHT_INTERVAL_SECONDS", 300))
+DEBOUNCE_SECONDS = float(os.environ.get("ZENOVA_INSIGHT_DEBOUNCE_SECONDS", 0.5))
+
+
+class Snapshot:
+    """The rules' results ({rule name: sorted keys}) as computed at computed_at from these table versions."""
+
+    def __init__(self, results, computed_at, versions):
+        self.results = results
+        self.computed_at = computed_at
+        self.versions = versions
+
+    def is_current(self):
+        """True while none of the tables it was computed from has been written to since."""
+        return all(storage.table_version(file_path) == version for file_path, version in self.versions.items())
+
+
+class InsightScheduler:
+    """Keeps a Snapshot of rules current on a background thread; persists each one to snapshot_path."""
+
+    def __init__(self, rules, snapshot_path, interval=INTERVAL_SECONDS, debounce=DEBOUNCE_SECONDS):
+        self.rules = list(rules)
+        self.signature = repr(self.rules)
+        self.snapshot_path = snapshot_path
+        self.interval = interval
+        self.debounce = debounce
+        self.last_error = None # The last refresh's exception, if it failed
+        self._tables = {os.path.abspath(rule.file_path): rule.file_path for rule in self.rules}
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._tried = threading.Event() # Set once the first refresh has finished or failed
+        self._snapshot = self._load()
+        self._thread = None
+
+    def start(self):
+        storage.on_change(self._on_change)
+        self._thread = threading.Thread(target=self._run, name="insight-scheduler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        storage.off_change(self._on_change)
+        self._stopped.set()
+        self._wake.set()
+
+    def refresh(self):
+        """Asks for a refresh now, e.g. after a change the scheduler cannot see."""
+        self._wake.set()
+
+    def latest(self, timeout=None):
+        """The latest snapshot. Before there is one, waits up to timeout for the first refresh; None if it failed."""
+        if self._snapshot is None:
+            self._tried.wait(timeout)
+        return self._snapshot
+
+    def compute(self):
+        """Evaluates the rules now and stores the result as the latest snapshot."""
+        computed_at = pd.Timestamp.now()
+        # Versions are read first: a write made during the evaluation leaves the snapshot stale, never wrongly current
+        versions = {file_path: storage.table_version(file_path) for file_path in self._tables.values()}
+        results = rule_engine.evaluate(self.rules, computed_at.normalize())
+        self._snapshot = Snapshot(results, computed_at, versions)
+        self._save(self._snapshot)
+        return self._snapshot
+
+    def _on_change(self, file_path, change):
+        # Runs under the writer's table lock: only flag the refresh, the thread does the work
+        if not self._stopped.is_set() and os.path.abspath(file_path) in self._tables:
+            self._wake.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.clear()
+            try:
+                self.compute()
+                self.last_error = None
+            except Exception as e: # Keep serving the last snapshot; the next refresh tries again
+                self.last_error = e
+            self._tried.set()
+            if self._wake.wait(min(self.interval, _seconds_to_midnight())) and not self._stopped.is_set():
+                time.sleep(self.debounce)
+
+    # --- Persistence ---
+    def _load(self):
+        """The snapshot saved by an earlier run of these same rules, if any."""
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            if saved["signature"] != self.signature:
+                return None
+            return Snapshot(saved["results"], pd.Timestamp(saved["computed_at"]), saved["versions"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _save(self, snapshot):
+        saved = {"signature": self.signature, "computed_at": snapshot.computed_at.isoformat(),
+                 "versions": snapshot.versions, "results": snapshot.results}
+        tmp_path = f"{self.snapshot_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(saved, f)
+            os.replace(tmp_path, self.snapshot_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+class PeriodicJob:
+    """Runs job() on a daemon thread at start, then every interval seconds and just after midnight."""
+
+    def __init__(self, name, job, interval):
+        self.name = name
+        self.job = job
+        self.interval = interval
+        self.last_run = None # When job last finished
+        self.last_error = None # The last run's exception, if it failed
+        self._stopped = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._run, name=self.name, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self.job()
+                self.last_run, self.last_error = pd.Timestamp.now(), None
+            except Exception as e: # Tried again at the next run
+                self.last_error = e
+            self._stopped.wait(min(self.interval, _seconds_to_midnight()))
+
+
+def _seconds_to_midnight():
+    now = pd.Timestamp.now()
+    return max((now.normalize() + pd.Timedelta(days=1) - now).total_seconds(), 1)
+
+
+_schedulers = {} # snapshot_path -> InsightScheduler
+_schedulers_guard = threading.Lock()
+
+
+def scheduler_for(rules, snapshot_path):
+    """Returns the running scheduler for these rules, starting it on first use (one per process and snapshot_path).
+
+    A scheduler started for different rules (e.g. a changed threshold) is stopped and replaced.
+    """
+    rules = list(rules)
+    with _schedulers_guard:
+        scheduler = _schedulers.get(snapshot_path)
+        if scheduler is None or scheduler.signature != repr(rules):
+            if scheduler is not None:
+                scheduler.stop()
+            scheduler = _schedulers[snapshot_path] = InsightScheduler(rules, snapshot_path).start()
+        return scheduler
+
+
+_jobs = {} # name -> PeriodicJob
+_jobs_guard = threading.Lock()
+
+
+def periodic(name, job, interval):
+    """Returns the running PeriodicJob called name, starting it with job on first use (one per process)."""
+    with _jobs_guard:
+        if name not in _jobs:
+            _jobs[name] = PeriodicJob(name, job, interval).start()
+        return _jobs[name]
@@ -0,0 +1,478 @@
+"""Search helpers for the tabs' "Search..." boxes.
+
+A query matches the rows in which every word of it starts some word of the
+row (any column, case-insensitive), so "prec iso" finds "Precision Parts ...
+ISO 9001". Each table gets an inverted index from word to rows, built once
+per process from the shared cached frame and then kept up to date by the
+writes storage reports, so a keystroke is an index lookup plus a row fetch
+rather than a scan. Frames the index cannot serve (e.g. a session still
+holding an older version, or a table in which rows share an ID) are scanned
+instead, against one lower-cased text per row cached per table version.
+"""
+import os
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+import storage
+
+FIELD_SEPARATOR = "\x1f" # Keeps a match from spanning two columns
+TOKEN_SEPARATOR = r"[\W_]+" # Words are runs of letters and digits
+MIN_DELTA_ROWS = 10_000 # Rows written since the last build that are kept outside the bulk index
+DELTA_FRACTION = 0.1 # ... or this share of the table, whichever is larger
+FUZZY_LIMIT = 20 # Closest matches shown when a search finds nothing
+FUZZY_THRESHOLD = 0.3 # Least trigram similarity that counts as a match
+
+
+# --- Per-Row Search Text ---
+def _build_row_text(df):
+    """Returns the lower-cased text of every column of each row, joined, in one vectorized pass."""
+    if df.empty or not len(df.columns):
+        return pd.Series("", index=df.index, dtype="str")
+    columns = [df[col].astype("string").fillna("") for col in df.columns]
+    return columns[0].str.cat(columns[1:], sep=FIELD_SEPARATOR).str.lower()
+
+
+def row_search_text(df):
+    """Returns the search text of each row of df, cached per table version.
+
+    df may be any row subset of a frame from storage.load_data (e.g. one
+    supplier's assets); the text is built for the whole table once and
+    looked up by index. Frames without a known source are built directly.
+    """
+    source, version = df.attrs.get("source"), df.attrs.get("table_version")
+    if source is None or version is None:
+        return _build_row_text(df)
+    file_path, columns, usecols = source
+    visible = tuple(df.columns)
+
+    def build():
+        full_df = storage.load_data(file_path, columns=columns, usecols=usecols)
+        if full_df.attrs.get("table_version") != version or not set(visible) <= set(full_df.columns):
+            return None # df is from an older version (or has derived columns); don't cache
+        return _build_row_text(full_df[list(visible)])
+
+    text = storage.cached_derived(file_path, (storage.get_engine().name, version), ("search_text", visible, str(source)), build)
+    if text is None or not df.index.isin(text.index).all():
+        return _build_row_text(df)
+    return text.loc[df.index]
+
+
+def search_mask(df, query):
+    """Returns a boolean Series: rows of df whose text contains query (case-insensitive)."""
+    return row_search_text(df).str.contains(query.lower(), regex=False)
+
+
+# --- Search Indexes ---
+def _tokens(text):
+    return {token for token in re.split(TOKEN_SEPARATOR, text) if token}
+
+
+def query_terms(query):
+    """Returns the lower-cased words of query, longest (most selective) first."""
+    return sorted(_tokens(query.lower()), key=len, reverse=True)
+
+
+def _searchable(series):
+    """Returns series with list cells (and other unhashable objects) as their text."""
+    return series.astype("string") if series.dtype == object else series
+
+
+def _row_hashes(frame):
+    return pd.util.hash_pandas_object(frame.apply(_searchable), index=False).to_numpy()
+
+
+def _ranges(starts, stops):
+    """Returns the concatenation of arange(start, stop) for each pair, without a Python loop."""
+    lengths = stops - starts
+    return np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+
+
+def _sorted_unique(values):
+    """np.unique for large integer arrays (sorting beats numpy's hash-based unique here)."""
+    values = np.sort(values)
+    return values[np.concatenate([[True], values[1:] != values[:-1]])]
+
+
+def _rows_by_value(series):
+    """Factorizes a column: returns its distinct values and, per value, its row positions (CSR)."""
+    codes, values = pd.factorize(_searchable(series))
+    counts = np.bincount(codes[codes >= 0], minlength=len(values))
+    rows = np.argsort(codes, kind="stable")[np.count_nonzero(codes < 0):].astype(np.int32)
+    return values, rows, np.concatenate([[0], np.cumsum(counts)])
+
+
+class _TableIndex:
+    """What the search indexes share: rows identified by key, a bulk part built
+    from a frame in one vectorized pass, and a dict-based delta of rows written
+    since, which shadows their bulk entry.
+
+    Once the delta outgrows MIN_DELTA_ROWS / DELTA_FRACTION, apply returns
+    False and the index should be built afresh. Subclasses build the bulk part
+    in __init__ and define _entry (what the delta keeps for a written row).
+    """
+
+    def __init__(self, frame, keys, version, primary_key=None, schema=None):
+        self.primary_key = primary_key
+        self.schema = schema # load_data's columns argument, for typing written rows
+        self.columns = list(frame.columns)
+        self.version = version
+        self._guard = threading.Lock()
+        self._keys = np.asarray(keys, dtype=object)
+        self._positions = pd.Index(self._keys) # key -> row position
+        self._live = np.ones(len(frame), dtype=bool)
+        self._hashes = _row_hashes(frame)
+        self._delta = {} # key -> (row hash, entry) for rows written since the build
+
+    def __len__(self):
+        return int(self._live.sum()) + len(self._delta)
+
+    def _entries(self, frame):
+        raise NotImplementedError
+
+    def _added(self, key, entry):
+        pass
+
+    def _removed(self, key, entry):
+        pass
+
+    def _forget(self, key):
+        position = self._positions.get_indexer([key])[0]
+        if position >= 0:
+            self._live[position] = False
+        if key in self._delta:
+            self._removed(key, self._delta.pop(key)[1])
+
+    def _holds(self, key):
+        position = self._positions.get_indexer([key])[0]
+        return (position >= 0 and self._live[position]) or key in self._delta
+
+    def _put(self, rows):
+        frame = rows[self.columns]
+        for key, row_hash, entry in zip(rows[self.primary_key], _row_hashes(frame), self._entries(frame)):
+            self._forget(key)
+            self._delta[key] = (row_hash, entry)
+            self._added(key, entry)
+
+    def _has_room(self):
+        return len(self._delta) <= max(MIN_DELTA_ROWS, DELTA_FRACTION * len(self._keys))
+
+    def apply(self, version, rows=None, forget=()):
+        """Records one write: rows (typed, with the index's columns) were inserted or changed, forget were deleted.
+
+        Returns False if the index has taken in too many writes and should be rebuilt.
+        """
+        with self._guard:
+            for key in forget:
+                self._forget(key)
+            if rows is not None:
+                keys = rows[self.primary_key]
+                if keys.duplicated().any() or any(self._holds(key) for key in keys):
+                    return False # A repeated key: rows can no longer be told apart by key
+                self._put(rows)
+            self.version = version
+            return self._has_room()
+
+    def replace(self, version, rows):
+        """Records a whole-table overwrite, re-indexing only the rows that changed; see apply."""
+        if rows[self.primary_key].duplicated().any():
+            return False
+        new = pd.Series(_row_hashes(rows[self.columns]), index=pd.Index(rows[self.primary_key], dtype=object))
+        with self._guard:
+            old = pd.Series(self._hashes[self._live], index=pd.Index(self._keys[self._live], dtype=object))
+            if self._delta:
+                old = pd.concat([old, pd.Series({key: row_hash for key, (row_hash, _) in self._delta.items()}, dtype=old.dtype)])
+            changed = new.ne(old.reindex(new.index)).to_numpy()
+            removed = old.index.difference(new.index)
+            if changed.sum() + len(removed) > max(MIN_DELTA_ROWS, DELTA_FRACTION * len(self._keys)):
+                return False
+            for key in removed:
+                self._forget(key)
+            self._put(rows[changed])
+            self.version = version
+            return self._has_room()
+
+
+class InvertedIndex(_TableIndex):
+    """Word -> rows index over some columns of one table.
+
+    Each column's distinct values are split into words once (not once per
+    row); the words are kept sorted, so every word starting with a prefix is
+    one slice, and each distinct value points at its rows.
+    """
+
+    def __init__(self, frame, keys, version, primary_key=None, schema=None):
+        super().__init__(frame, keys, version, primary_key, schema)
+        self._rows_by_value = [] # per column: (row positions grouped by value, offsets)
+        refs = []
+        for number, col in enumerate(self.columns):
+            values, rows, offsets = _rows_by_value(frame[col])
+            self._rows_by_value.append((rows, offsets))
+            words = pd.Series(values).astype("string").str.lower().str.split(TOKEN_SEPARATOR, regex=True).explode()
+            words = words[words.notna() & (words != "")]
+            refs.append(pd.DataFrame({"word": words.to_numpy(dtype=object), "column": number, "value": words.index.to_numpy()}))
+        refs = pd.concat(refs, ignore_index=True) if refs else pd.DataFrame({"word": [], "column": [], "value": []})
+        word_ids, vocabulary = pd.factorize(refs["word"].to_numpy(dtype=object), sort=True)
+        order = np.argsort(word_ids, kind="stable")
+        self._vocabulary = np.asarray(vocabulary, dtype=object)
+        self._word_offsets = np.searchsorted(word_ids[order], np.arange(len(vocabulary) + 1))
+        self._word_columns = refs["column"].to_numpy(dtype=np.int64)[order]
+        self._word_values = refs["value"].to_numpy(dtype=np.int64)[order]
+        self._delta_postings = {} # word -> set of keys
+
+    def _entries(self, frame):
+        return [_tokens(text) for text in _build_row_text(frame)]
+
+    def _added(self, key, words):
+        for word in words:
+            self._delta_postings.setdefault(word, set()).add(key)
+
+    def _removed(self, key, words):
+        for word in words:
+            keys = self._delta_postings[word]
+            keys.discard(key)
+            if not keys:
+                del self._delta_postings[word]
+
+    def _base_matches(self, term):
+        """Returns a row mask of the bulk index: rows with a word starting with term."""
+        mask = np.zeros(len(self._keys), dtype=bool)
+        start, stop = np.searchsorted(self._vocabulary, [term, term + "\U0010ffff"])
+        columns = self._word_columns[self._word_offsets[start]:self._word_offsets[stop]]
+        values = self._word_values[self._word_offsets[start]:self._word_offsets[stop]]
+        for number in np.unique(columns):
+            rows, offsets = self._rows_by_value[number]
+            ids = values[columns == number]
+            mask[rows[_ranges(offsets[ids], offsets[ids + 1])]] = True
+        return mask
+
+    def _delta_matches(self, term):
+        found = set()
+        for word, keys in self._delta_postings.items():
+            if word.startswith(term):
+                found |= keys
+        return found
+
+    def lookup(self, terms):
+        """Returns the keys of the rows with a word starting with each of terms."""
+        with self._guard:
+            mask, delta_keys = self._live.copy(), None
+            for term in terms:
+                mask &= self._base_matches(term)
+                matches = self._delta_matches(term)
+                delta_keys = matches if delta_keys is None else delta_keys & matches
+            return list(self._keys[mask]) + list(delta_keys or ())
+
+
+def _normalize(text):
+    return " ".join(token for token in re.split(TOKEN_SEPARATOR, str(text).lower()) if token)
+
+
+def trigrams(text):
+    """Returns the set of three-character slices of " <words of text> " (lower-cased)."""
+    padded = f" {_normalize(text)} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)} if padded.strip() else set()
+
+
+def similarity(grams, other):
+    """Share of trigrams two texts have in common (0 to 1), as in PostgreSQL's pg_trgm."""
+    shared = len(grams & other)
+    return shared / (len(grams) + len(other) - shared) if shared else 0.0
+
+
+def _trigram_postings(values):
+    """Returns (sorted trigram codes, offsets, value ids, trigram count per value) for distinct values."""
+    padded = " " + pd.Series(values, dtype="str").str.lower().str.replace(TOKEN_SEPARATOR, " ", regex=True).str.strip() + " "
+    lengths = padded.str.len().to_numpy(dtype=np.int64)
+    chars = np.frombuffer("".join(padded).encode("utf-32-le"), dtype=np.uint32).astype(np.int64)
+    counts = np.where(lengths > 2, lengths - 2, 0)
+    starts = np.cumsum(lengths) - lengths
+    at = _ranges(starts, starts + counts)
+    codes = chars[at] << 42 | chars[at + 1] << 21 | chars[at + 2] # Code points fit in 21 bits
+    gram_ids, vocabulary = pd.factorize(codes, sort=True)
+    size = max(len(values), 1)
+    pairs = _sorted_unique(gram_ids.astype(np.int64) * size + np.repeat(np.arange(len(values)), counts))
+    value_ids = pairs % size
+    offsets = np.searchsorted(pairs // size, np.arange(len(vocabulary) + 1))
+    return np.asarray(vocabulary, dtype=np.int64), offsets, value_ids, np.bincount(value_ids, minlength=len(values))
+
+
+def _gram_code(gram):
+    return ord(gram[0]) << 42 | ord(gram[1]) << 21 | ord(gram[2])
+
+
+class TrigramIndex(_TableIndex):
+    """Trigram index over the distinct values of some columns of one table, for
+    ranking near misses ("Precison Manufacturing") by similarity."""
+
+    def __init__(self, frame, keys, version, primary_key=None, schema=None):
+        super().__init__(frame, keys, version, primary_key, schema)
+        self._columns = [] # per column: (rows by value, value offsets, trigram postings)
+        for col in self.columns:
+            values, rows, offsets = _rows_by_value(frame[col])
+            self._columns.append((rows, offsets, _trigram_postings(values)))
+
+    def _entries(self, frame):
+        return zip(*[[trigrams(value) if pd.notna(value) else set() for value in frame[col]] for col in self.columns])
+
+    def _base_matches(self, grams, threshold, limit):
+        """Returns (row positions, similarity) of the bulk index's closest values in each column."""
+        found = []
+        codes = np.array(sorted(_gram_code(gram) for gram in grams), dtype=np.int64)
+        for rows, offsets, (vocabulary, gram_offsets, value_ids, value_counts) in self._columns:
+            at = np.searchsorted(vocabulary, codes)
+            at = at[(at < len(vocabulary)) & (vocabulary[np.minimum(at, len(vocabulary) - 1)] == codes)]
+            if not len(at):
+                continue
+            shared = np.bincount(value_ids[_ranges(gram_offsets[at], gram_offsets[at + 1])], minlength=len(value_counts))
+            ids = np.flatnonzero(shared)
+            scores = shared[ids] / (len(grams) + value_counts[ids] - shared[ids])
+            keep = scores >= threshold
+            ids, scores = ids[keep], scores[keep]
+            if len(ids) > limit:
+                best = np.argpartition(-scores, limit - 1)[:limit]
+                ids, scores = ids[best], scores[best]
+            found.append((rows[_ranges(offsets[ids], offsets[ids + 1])], np.repeat(scores, offsets[ids + 1] - offsets[ids])))
+        return found
+
+    def lookup(self, query, limit, threshold):
+        """Returns [(key, similarity)] of the at most limit rows with a value closest to query, best first."""
+        grams = trigrams(query)
+        if not grams:
+            return []
+        with self._guard:
+            positions, scores = [np.empty(0, dtype=np.int64)], [np.empty(0)]
+            for rows, row_scores in self._base_matches(grams, threshold, limit):
+                live = self._live[rows]
+                positions.append(rows[live])
+                scores.append(row_scores[live])
+            positions, scores = np.concatenate(positions), np.concatenate(scores)
+            order = np.argsort(-scores, kind="stable")
+            positions, first = np.unique(positions[order], return_index=True) # Keeps each row's best score
+            best = np.argsort(-scores[order][first], kind="stable")[:limit]
+            matches = list(zip(self._keys[positions[best]], scores[order][first][best]))
+            for key, (_, entry) in self._delta.items():
+                score = max(similarity(grams, value) for value in entry) if entry else 0.0
+                if score >= threshold:
+                    matches.append((key, score))
+        return sorted(matches, key=lambda match: -match[1])[:limit]
+
+
+_indexes = {} # (abspath, index class, columns) -> index
+_indexes_guard = threading.Lock()
+
+
+def _typed_rows(rows, index):
+    """Returns written rows with the index's columns and key, typed as load_data would have read them."""
+    rows = rows.reindex(columns=list(dict.fromkeys([index.primary_key] + index.columns)))
+    return storage.typed_rows(rows[rows[index.primary_key].notna()], index.schema)
+
+
+def _apply(index, change):
+    """Applies one write to a table's index; a touched table is indexed afresh on the next search instead."""
+    if change["op"] == "insert":
+        return index.apply(change["version"], rows=_typed_rows(change["rows"], index))
+    if change["op"] == "upsert":
+        rows = None if change["row"] is None else _typed_rows(pd.DataFrame([change["row"]]), index)
+        return index.apply(change["version"], rows=rows, forget=[change["key"]])
+    if change["op"] == "delete":
+        return index.apply(change["version"], forget=change["keys"])
+    return change["rows"] is not None and index.replace(change["version"], _typed_rows(change["rows"], index))
+
+
+def _on_change(file_path, change):
+    storage.follow_change(_indexes, _indexes_guard, file_path, change, _apply)
+
+
+storage.on_change(_on_change)
+
+
+def table_index(df, index_class=InvertedIndex, columns=None):
+    """Returns the index of df's table over columns (default: all of df's) at df's version, or None.
+
+    None means the index cannot answer for df: it has no known source or
+    primary key, some rows share a key (see storage.backfill_ids), or it is
+    older than the index (another session wrote since).
+    """
+    source, version = df.attrs.get("source"), df.attrs.get("table_version")
+    if source is None or version is None:
+        return None
+    file_path = source[0]
+    primary_key = storage.table_spec(file_path)["primary_key"]
+    columns = tuple(df.columns if columns is None else columns)
+    if not primary_key or primary_key not in df.columns or not set(columns) <= set(df.columns):
+        return None
+    key = (os.path.abspath(file_path), index_class, columns)
+    with storage.table_lock(file_path): # No write can slip between the build and its registration
+        with _indexes_guard:
+            index = _indexes.get(key)
+        if index is not None and index.version >= version:
+            return index if index.version == version else None
+        full_df = storage.load_data(file_path, columns=source[1], usecols=source[2])
+        if full_df.attrs.get("table_version") != version or not set(columns) <= set(full_df.columns):
+            return None
+        full_df = full_df[full_df[primary_key].notna()]
+        # Hits map back to rows by key, so a table with a repeated key is scanned instead
+        if not storage.cached_derived(file_path, (storage.get_engine().name, version), ("unique_keys", primary_key),
+                                      lambda: full_df[primary_key].is_unique):
+            return None
+        index = index_class(full_df[list(columns)], full_df[primary_key], version, primary_key, source[1])
+        with _indexes_guard:
+            _indexes[key] = index
+        return index
+
+
+def _row_labels(df, primary_key):
+    """Returns a Series of index label by primary key for the whole table df was read from."""
+    file_path, columns, usecols = df.attrs["source"]
+
+    def build():
+        full_df = storage.load_data(file_path, columns=columns, usecols=usecols)
+        if full_df.attrs.get("table_version") != df.attrs["table_version"]:
+            return None # Written since; don't cache
+        return pd.Series(full_df.index, index=pd.Index(full_df[primary_key], dtype=object))
+
+    version = (storage.get_engine().name, df.attrs["table_version"])
+    return storage.cached_derived(file_path, version, ("row_labels", str(df.attrs["source"])), build)
+
+
+def _fetch(df, labels, keys):
+    """Returns the rows of df with these primary keys, in df's order."""
+    positions = labels.index.get_indexer(keys)
+    positions = df.index.get_indexer(labels.to_numpy()[positions[positions >= 0]])
+    return df.take(np.sort(positions[positions >= 0]))
+
+
+def search_rows(df, query):
+    """Returns the rows of df in which every word of query starts a word (case-insensitive)."""
+    terms = query_terms(query)
+    if not terms:
+        return df
+    index = table_index(df)
+    labels = None if index is None else _row_labels(df, index.primary_key)
+    if labels is None: # Scan instead
+        text = row_search_text(df)
+        mask = pd.Series(True, index=df.index)
+        for term in terms:
+            mask &= text.str.contains(r"(?:^|[\W_])" + re.escape(term), regex=True)
+        return df[mask]
+    return _fetch(df, labels, index.lookup(terms))
+
+
+def fuzzy_rows(df, query, columns, limit=FUZZY_LIMIT, threshold=FUZZY_THRESHOLD):
+    """Returns the at most limit rows of df whose value in one of columns is most like query, best first.
+
+    Similarity is the share of trigrams in common, so misspellings such as
+    "Precison Manufacturing" still find "Precision Manufacturing Co.".
+    """
+    index = table_index(df, TrigramIndex, columns)
+    labels = None if index is None else _row_labels(df, index.primary_key)
+    if labels is None: # Index this frame directly instead
+        matches = TrigramIndex(df[list(columns)], df.index, None).lookup(query, limit, threshold)
+        return df.loc[[label for label, _ in matches]]
+    matches = index.lookup(query, len(df), threshold) if len(df) < len(labels) else index.lookup(query, limit, threshold)
+    positions = labels.index.get_indexer([key for key, _ in matches])
+    positions = df.index.get_indexer(labels.to_numpy()[positions[positions >= 0]])
+    return df.take(positions[positions >= 0][:limit])
@@ -0,0 +1,1474 @@
+"""Storage engines for the Zenova SRP data tables.
+
+Every table is addressed by its CSV path (the *_FILE constants in app.py) and
+named after the file's basename, e.g. ``data/assets.csv`` -> ``assets``.
+``load_data``, ``append_data``, ``update_data`` and the row-level
+``upsert_row`` / ``delete_row`` delegate to the engine selected with the
+``ZENOVA_STORAGE_ENGINE`` environment variable:
+
+* ``csv`` (default) - one CSV file per table, as the app has always used.
+  Appends and row edits go to an append-only journal next to the CSV and are folded back
+  into it by a background compaction once the journal grows large.
+  When pyarrow is available, each CSV is mirrored by a Parquet snapshot so
+  reads can project just the columns a caller renders.
+* ``sqlite`` - one table per file in ``<data dir>/zenova.db`` with primary
+  keys and secondary indexes on the columns the tabs filter by.
+
+Existing CSVs can be copied into SQLite once with ``python storage.py migrate``.
+"""
+import argparse
+import ast
+import json
+import os
+import re
+import sqlite3
+import threading
+from contextlib import closing
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+    import msvcrt
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa # Installed alongside streamlit
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+STORAGE_ENGINE_ENV = "ZENOVA_STORAGE_ENGINE"
+SQLITE_DB_NAME = "zenova.db"
+SQLITE_MAX_PARAMS = 500 # Keys per "IN (...)" lookup, well under SQLite's bound-parameter limit
+JOURNAL_COMPACT_BYTES = int(os.environ.get("ZENOVA_JOURNAL_COMPACT_BYTES", 1024 * 1024)) # Fold the journal back in past 1 MB
+SNAPSHOT_DIR_NAME = ".snapshots"
+SNAPSHOTS_ENABLED = pq is not None and os.environ.get("ZENOVA_SNAPSHOTS", "1") != "0"
+
+# --- Table Specs: primary key and filter columns per data file ---
+TABLE_SPECS = {
+    "supplier_dummy_data": {
+        "primary_key": "supplier_id",
+        "indexes": ["supplier_name", "agreement_status", "risk_level", "primary_product_category"],
+    },
+    "notifications": {
+        "primary_key": "notification_id",
+        "indexes": ["recipient_role", "sender_role", "parent_notification_id", "timestamp"],
+    },
+    "assets": {"primary_key": "asset_id", "indexes": ["supplier", "status"]},
+    "project_tasks": {"primary_key": "task_id", "indexes": ["assigned_to", "status", "due_date"]},
+    "audit_points": {"primary_key": "audit_id", "indexes": ["assignee", "status", "due_date"]},
+    "events": {"primary_key": "event_id", "indexes": ["end_date", "created_by"]},
+    "uploaded_files": {"primary_key": "file_id", "indexes": ["uploader", "filename"]},
+    "file_comments": {"primary_key": "comment_id", "indexes": ["file_name", "parent_comment_id"]},
+    "saved_views": {"primary_key": "view_id", "indexes": ["view_table"]},
+}
+
+
+def table_name(file_path):
+    """Returns the table name for a data file, e.g. 'data/assets.csv' -> 'assets'."""
+    return os.path.splitext(os.path.basename(file_path))[0]
+
+
+def table_spec(file_path):
+    """Returns the primary key / index spec for a data file (empty spec if unknown)."""
+    return TABLE_SPECS.get(table_name(file_path), {"primary_key": None, "indexes": []})
+
+
+# --- Value Conversion ---
+def _to_plain_value(value):
+    """Converts a pandas/numpy cell into a plain Python value (None for missing)."""
+    if value is None:
+        return None
+    if isinstance(value, float) and value != value: # NaN
+        return None
+    if value is pd.NaT or value is pd.NA:
+        return None
+    if isinstance(value, pd.Timestamp):
+        # Dates (midnight timestamps) keep the YYYY-MM-DD form the forms write.
+        return value.date().isoformat() if value == value.normalize() else value.isoformat()
+    if isinstance(value, (list, tuple, set)):
+        return json.dumps(list(value))
+    if isinstance(value, dict):
+        return json.dumps(value)
+    if hasattr(value, "item"): # numpy scalar
+        return value.item()
+    return value
+
+
+def _records(df):
+    """Yields the rows of df as tuples of plain Python values."""
+    as_objects = df.astype(object)
+    for row in as_objects.itertuples(index=False, name=None):
+        yield tuple(_to_plain_value(value) for value in row)
+
+
+# --- Typed Schemas ---
+_BOOL_STRINGS = {"true": True, "false": False, "1": True, "0": False, "1.0": True, "0.0": False, "yes": True, "no": False}
+
+
+def _to_bool(series):
+    """Parses True/False, 1/0 and yes/no (in any case) into a nullable boolean; anything else is <NA>."""
+    if pd.api.types.is_bool_dtype(series):
+        return series.astype("boolean")
+    return series.astype("string").str.strip().str.lower().map(_BOOL_STRINGS).astype("boolean")
+
+
+def _to_int(series):
+    """Parses whole numbers into a nullable integer; columns holding fractions stay float."""
+    numbers = pd.to_numeric(series, errors="coerce")
+    try:
+        return numbers.astype("Int64")
+    except (TypeError, ValueError):
+        return numbers.astype("float64")
+
+
+def _literal_list(text):
+    """Decodes one list cell saved in the old Python-repr form, e.g. "['OEM', 'Supplier A']"."""
+    try:
+        value = ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return [text] # A bare value
+    return list(value) if isinstance(value, (list, tuple, set)) else [value]
+
+
+def _to_list(series):
+    """Decodes JSON-array cells into Python lists with a single json.loads over the whole column.
+
+    Missing cells become [] and cells still in the old Python-repr form are converted first.
+    """
+    if series.empty:
+        return series.astype(object)
+    text = series.astype("string").str.strip().fillna("[]").replace("", "[]")
+    legacy = ~(text.str.startswith('["') | (text == "[]"))
+    if legacy.any():
+        text = text.where(~legacy, text[legacy].map(lambda value: json.dumps(_literal_list(value))))
+    try:
+        decoded = json.loads("[" + ",".join(text.tolist()) + "]")
+    except ValueError: # A malformed cell: decode row by row so one bad cell doesn't hide the rest
+        decoded = [_literal_list(value) if not value.startswith("[") else json.loads(value) for value in text.tolist()]
+    return pd.Series(decoded, index=series.index, dtype=object)
+
+
+def _encode_lists(df):
+    """Returns df with list cells encoded as JSON arrays, as they are stored."""
+    list_columns = [
+        col for col in df.columns
+        if df[col].dtype == object and isinstance(df[col].dropna().iloc[0] if df[col].notna().any() else None, (list, tuple, set))
+    ]
+    if not list_columns:
+        return df
+    df = df.copy()
+    for col in list_columns:
+        df[col] = df[col].map(lambda value: json.dumps(list(value)) if isinstance(value, (list, tuple, set)) else value)
+    return df
+
+
+# Column types a table schema can declare, and how each is parsed.
+SCHEMA_TYPES = {
+    "str": lambda series: series,
+    "category": lambda series: series.astype("category"),
+    "int": _to_int,
+    "float": lambda series: pd.to_numeric(series, errors="coerce").astype("float64"),
+    "bool": _to_bool,
+    "list": _to_list,
+    "date": lambda series: pd.to_datetime(series, errors="coerce", format="ISO8601").dt.normalize(),
+    "datetime": lambda series: pd.to_datetime(series, errors="coerce", format="ISO8601"),
+}
+
+
+def apply_schema(df, schema):
+    """Converts the columns of df that schema (a dict of column -> type name) declares."""
+    for col, type_name in schema.items():
+        if type_name not in SCHEMA_TYPES:
+            raise ValueError(f"Unknown column type '{type_name}' for {col}. Choose one of: {', '.join(SCHEMA_TYPES)}")
+        if col in df.columns:
+            df[col] = SCHEMA_TYPES[type_name](df[col])
+    return df
+
+
+# --- Locking & Atomic Writes ---
+class StaleVersionError(Exception):
+    """Raised when a write was prepared against an older version of a table."""
+
+    def __init__(self, file_path, expected_version, current_version):
+        super().__init__(
+            f"{table_name(file_path)} changed since it was loaded (version {expected_version} -> {current_version})"
+        )
+        self.expected_version = expected_version
+        self.current_version = current_version
+
+
+class StaleRowError(StaleVersionError):
+    """Raised when a row was changed or deleted since the caller read it."""
+
+    def __init__(self, file_path, key):
+        Exception.__init__(self, f"{table_name(file_path)} row {key} changed since it was loaded")
+        self.key = key
+
+
+class DuplicateKeyError(ValueError):
+    """Raised when rows of a table share a primary key where keys must be unique, e.g. moving it into SQLite."""
+
+    def __init__(self, file_path, keys):
+        shown = ", ".join(str(key) for key in keys[:10]) + (f" and {len(keys) - 10} more" if len(keys) > 10 else "")
+        super().__init__(f"{table_name(file_path)} has rows sharing a primary key: {shown}. "
+                         "Give each row its own ID first (backfill_ids renumbers repeats); nothing was copied.")
+        self.keys = keys
+
+
+class TableLock:
+    """Re-entrant lock on one table, held across threads and processes.
+
+    A thread lock serialises the sessions of this process; an OS file lock on
+    ``<file>.lock`` serialises other processes serving the same data directory.
+    """
+
+    def __init__(self, file_path):
+        self.lock_path = file_path + ".lock"
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                self._fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+                if fcntl is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_EX)
+                else:
+                    msvcrt.locking(self._fd, msvcrt.LK_LOCK, 1)
+            except BaseException:
+                if self._fd is not None:
+                    os.close(self._fd)
+                    self._fd = None
+                self._thread_lock.release()
+                raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self._depth -= 1
+        if self._depth == 0:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+            os.close(self._fd)
+            self._fd = None
+        self._thread_lock.release()
+
+
+_path_locks = {}
+_path_locks_guard = threading.Lock()
+
+
+def _lock_for(file_path):
+    """Returns the lock guarding a table's files."""
+    key = os.path.abspath(file_path)
+    with _path_locks_guard:
+        if key not in _path_locks:
+            _path_locks[key] = TableLock(file_path)
+        return _path_locks[key]
+
+
+def table_lock(file_path):
+    """Returns the re-entrant lock guarding a table, for grouping a write with related work."""
+    return _lock_for(file_path)
+
+
+def _tmp_path(path):
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def _atomic_write_csv(df, file_path):
+    """Writes df to a temp file and renames it over file_path, so readers never see a partial file."""
+    tmp_path = _tmp_path(file_path)
+    try:
+        _encode_lists(df).to_csv(tmp_path, index=False)
+        os.replace(tmp_path, file_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _file_stat(path):
+    """Returns (mtime_ns, size) for a file, or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+# --- Columnar Snapshots ---
+def snapshot_path(file_path):
+    return os.path.join(os.path.dirname(file_path) or ".", SNAPSHOT_DIR_NAME, table_name(file_path) + ".parquet")
+
+
+def _snapshot_source(path):
+    """Returns the source version a snapshot was built from, or None if unusable."""
+    try:
+        metadata = pq.read_schema(path).metadata or {}
+    except (OSError, pa.ArrowException):
+        return None
+    source = metadata.get(b"zenova_source")
+    return json.loads(source) if source else None
+
+
+def _build_snapshot(file_path, source):
+    """Rewrites the Parquet snapshot of a CSV. Returns False if it cannot be stored as Parquet."""
+    df = pd.read_csv(file_path)
+    path = snapshot_path(file_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = _tmp_path(path)
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), b"zenova_source": json.dumps(source).encode()})
+        pq.write_table(table, tmp_path)
+    except (pa.ArrowException, TypeError, ValueError): # e.g. a column mixing numbers and text
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+    os.replace(tmp_path, path)
+    return True
+
+
+def read_csv_snapshot(file_path, usecols=None):
+    """Reads a CSV through its Parquet snapshot, rebuilding the snapshot if the CSV changed.
+
+    Only the requested columns are read from the snapshot. Falls back to parsing the
+    CSV when snapshots are disabled or the table cannot be stored as Parquet. The
+    result has one row per stored row even when none of usecols is stored.
+    """
+    if SNAPSHOTS_ENABLED:
+        source = list(_file_stat(file_path))
+        path = snapshot_path(file_path)
+        if _snapshot_source(path) == source or _build_snapshot(file_path, source):
+            if usecols is not None:
+                present = set(pq.read_schema(path).names)
+                usecols = [col for col in usecols if col in present]
+                if not usecols:
+                    return pd.DataFrame(index=pd.RangeIndex(pq.read_metadata(path).num_rows))
+            return pd.read_parquet(path, columns=usecols)
+    if usecols is None:
+        return pd.read_csv(file_path)
+    df = pd.read_csv(file_path, usecols=lambda col: col in usecols)
+    if df.columns.empty: # Count the rows through the first column instead
+        df = pd.read_csv(file_path, usecols=[0]).iloc[:, :0]
+    return df
+
+
+# --- CSV Engine ---
+def _merge_columns(base_columns, new_columns):
+    return list(base_columns) + [col for col in new_columns if col not in base_columns]
+
+
+def _set_values(series, positions, values):
+    """Returns a copy of series with values written at the given positions."""
+    updated = series.astype(object)
+    updated.iloc[positions] = values
+    return updated.infer_objects()
+
+
+def _apply_ops(base_df, ops, primary_key):
+    """Applies journal operations (insert / upsert / delete) on top of the base table."""
+    if not ops:
+        return base_df
+    if all(op["op"] == "insert" for op in ops):
+        pending_rows = [op["row"] for op in ops]
+        base_updates, base_deleted = {}, set()
+    else:
+        base_keys = set(base_df[primary_key]) if base_df is not None and primary_key in base_df.columns else set()
+        pending_rows = [] # Rows added since the base was written, in order (None once deleted)
+        pending_index = {} # key -> position in pending_rows
+        base_updates = {} # key -> {column: value} for rows already in the base
+        base_deleted = set()
+        for op in ops:
+            key = op.get("key", op.get("row", {}).get(primary_key))
+            if op["op"] == "delete":
+                if key in pending_index:
+                    pending_rows[pending_index.pop(key)] = None
+                elif key in base_keys:
+                    base_deleted.add(key)
+                    base_updates.pop(key, None)
+            elif op["op"] == "upsert" and key in pending_index:
+                pending_rows[pending_index[key]].update(op["row"])
+            elif op["op"] == "upsert" and key in base_keys and key not in base_deleted:
+                base_updates.setdefault(key, {}).update(op["row"])
+            else:
+                row = dict(op["row"])
+                if primary_key:
+                    row[primary_key] = key
+                    pending_index[key] = len(pending_rows)
+                pending_rows.append(row)
+        pending_rows = [row for row in pending_rows if row is not None]
+
+    df = base_df
+    if base_updates:
+        # Each base row's update by key; every row of a repeated key takes it, so a repeat never makes the table unreadable
+        update_of = df[primary_key].map(pd.Series(range(len(base_updates)), index=pd.Index(list(base_updates), dtype=object)))
+        positions = np.flatnonzero(update_of.notna().to_numpy())
+        updates = update_of.to_numpy()[positions].astype(int)
+        update_df = pd.DataFrame.from_records(list(base_updates.values()))
+        df = df.reindex(columns=_merge_columns(df.columns, update_df.columns))
+        for col in update_df.columns:
+            given = (update_df[col].notna() | pd.Series([col in row for row in base_updates.values()])).to_numpy()[updates]
+            df[col] = _set_values(df[col], positions[given], update_df[col].to_numpy(dtype=object)[updates[given]].tolist())
+    if base_deleted:
+        df = df[~df[primary_key].isin(base_deleted)].reset_index(drop=True)
+    if pending_rows:
+        pending_df = pd.DataFrame(pending_rows) # Keeps a row per insert even when none of its columns were read
+        if df is None:
+            return pending_df
+        all_columns = _merge_columns(df.columns, pending_df.columns)
+        df = pd.concat([df.reindex(columns=all_columns), pending_df.reindex(columns=all_columns)], ignore_index=True)
+    return df
+
+
+class CSVEngine:
+    """Stores each table as a CSV file at its own path.
+
+    Appends, single-row upserts and deletes are written as JSON lines to
+    ``<file>.journal`` so their cost does not depend on the table size. Reads
+    apply the pending journal on top of the CSV, and ``compact`` folds it back
+    into the CSV. Every write bumps the counter in ``<file>.version``.
+    """
+    name = "csv"
+
+    def __init__(self):
+        self._base_indexes = {} # abspath -> (CSV stat, base DataFrame, primary key index)
+
+    def journal_path(self, file_path):
+        return file_path + ".journal"
+
+    def compacting_path(self, file_path):
+        return file_path + ".journal.compacting"
+
+    def version_path(self, file_path):
+        return file_path + ".version"
+
+    def sequence_path(self, file_path):
+        return file_path + ".seq"
+
+    def version_token(self, file_path):
+        """Changes whenever the CSV or its journal is written."""
+        paths = (file_path, self.compacting_path(file_path), self.journal_path(file_path), self.version_path(file_path))
+        return tuple(_file_stat(path) for path in paths)
+
+    def table_version(self, file_path):
+        try:
+            with open(self.version_path(file_path), "r", encoding="utf-8") as f:
+                return int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def _bump_version(self, file_path):
+        """Increments the table's version counter. Call with the table lock held."""
+        version = self.table_version(file_path) + 1
+        version_path = self.version_path(file_path)
+        tmp_path = _tmp_path(version_path)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(str(version))
+        os.replace(tmp_path, version_path)
+        return version
+
+    def reserve_ids(self, file_path, count, seed):
+        """Advances the table's ID sequence by count and returns the first number reserved.
+
+        The sequence starts from seed() the first time it is used.
+        """
+        sequence_path = self.sequence_path(file_path)
+        with _lock_for(file_path):
+            try:
+                with open(sequence_path, "r", encoding="utf-8") as f:
+                    last = int(f.read().strip())
+            except (FileNotFoundError, ValueError):
+                last = seed()
+            tmp_path = _tmp_path(sequence_path)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(str(last + count))
+            os.replace(tmp_path, sequence_path)
+        return last + 1
+
+    def initialize(self, file_path, columns):
+        with _lock_for(file_path):
+            if not os.path.exists(file_path) or os.path.getsize(file_path) == 0:
+                _atomic_write_csv(pd.DataFrame(columns=columns), file_path)
+
+    def _read_base(self, file_path, usecols=None):
+        if not os.path.exists(file_path) or os.path.getsize(file_path) == 0:
+            return None
+        try:
+            return read_csv_snapshot(file_path, usecols)
+        except pd.errors.EmptyDataError:
+            return None
+
+    def stored_columns(self, file_path):
+        """Returns the columns every stored row has: the base CSV's header (journal rows may add others)."""
+        try:
+            return list(pd.read_csv(file_path, nrows=0).columns)
+        except (FileNotFoundError, pd.errors.EmptyDataError):
+            return []
+
+    def _read_journal(self, journal_path):
+        """Returns the operations recorded in a journal file, in order."""
+        ops = []
+        if os.path.exists(journal_path):
+            with open(journal_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        ops.append(json.loads(line))
+        return ops
+
+    def load(self, file_path, usecols=None):
+        """Returns the table (or just usecols of it) as a DataFrame, or None if it has no data yet."""
+        primary_key = table_spec(file_path)["primary_key"]
+        with _lock_for(file_path):
+            ops = self._read_journal(self.compacting_path(file_path)) + self._read_journal(self.journal_path(file_path))
+            read_cols = usecols
+            if usecols is not None:
+                read_cols = list(usecols) + ([primary_key] if primary_key and primary_key not in usecols else [])
+                ops = [{**op, "row": {col: op["row"][col] for col in read_cols if col in op["row"]}} if "row" in op else op for op in ops]
+            df = _apply_ops(self._read_base(file_path, read_cols), ops, primary_key)
+        if df is not None and usecols is not None:
+            df = df[[col for col in usecols if col in df.columns]]
+        return df
+
+    def _write_ops(self, file_path, ops):
+        """Appends operations to the journal, bumps the version and compacts if it grew large."""
+        lines = [json.dumps(op, default=str) + "\n" for op in ops]
+        journal_path = self.journal_path(file_path)
+        with _lock_for(file_path):
+            with open(journal_path, "a", encoding="utf-8") as f:
+                f.writelines(lines)
+            journal_size = os.path.getsize(journal_path)
+            self._bump_version(file_path)
+        if journal_size >= JOURNAL_COMPACT_BYTES:
+            self.compact_in_background(file_path)
+
+    def append(self, file_path, new_rows):
+        columns = list(new_rows.columns)
+        self._write_ops(file_path, [{"op": "insert", "row": dict(zip(columns, values))} for values in _records(new_rows)])
+
+    def upsert(self, file_path, key, values):
+        row = {col: _to_plain_value(value) for col, value in values.items()}
+        self._write_ops(file_path, [{"op": "upsert", "key": _to_plain_value(key), "row": row}])
+
+    def delete(self, file_path, keys):
+        self._write_ops(file_path, [{"op": "delete", "key": _to_plain_value(key)} for key in keys])
+
+    def _base_index(self, file_path):
+        """Returns the base table and an index on its primary key, cached until the CSV is rewritten."""
+        stat = _file_stat(file_path)
+        cached = self._base_indexes.get(os.path.abspath(file_path))
+        if cached is None or cached[0] != stat:
+            base_df = self._read_base(file_path)
+            if base_df is None:
+                base_df = pd.DataFrame(columns=[table_spec(file_path)["primary_key"]])
+            cached = (stat, base_df, pd.Index(base_df[table_spec(file_path)["primary_key"]]))
+            self._base_indexes[os.path.abspath(file_path)] = cached
+        return cached[1], cached[2]
+
+    def get_row(self, file_path, key):
+        """Returns one row as a dict (None if absent): the base row plus any journal ops on it."""
+        rows = self.get_rows(file_path, [key])
+        return rows[0] if rows else None
+
+    def get_rows(self, file_path, keys):
+        """Returns the rows with these keys as dicts, in the order asked for (absent keys are skipped).
+
+        The journal is read once for all of them.
+        """
+        primary_key = table_spec(file_path)["primary_key"]
+        keys = list(dict.fromkeys(_to_plain_value(key) for key in keys))
+        rows = {}
+        with _lock_for(file_path):
+            base_df, index = self._base_index(file_path)
+            for key in keys:
+                positions = index.get_indexer_for([key])
+                if len(positions) and positions[-1] >= 0:
+                    rows[key] = {col: _to_plain_value(value) for col, value in base_df.iloc[positions[-1]].items()}
+            ops = self._read_journal(self.compacting_path(file_path)) + self._read_journal(self.journal_path(file_path))
+        wanted = set(keys)
+        for op in ops:
+            key = op.get("key", op.get("row", {}).get(primary_key))
+            if key not in wanted:
+                continue
+            if op["op"] == "delete":
+                rows.pop(key, None)
+            elif op["op"] == "upsert" and key in rows:
+                rows[key].update(op["row"])
+            else:
+                rows[key] = {**op["row"], primary_key: key}
+        return [rows[key] for key in keys if key in rows]
+
+    def replace(self, file_path, df, expected_version=None):
+        with _lock_for(file_path):
+            if expected_version is not None:
+                current_version = self.table_version(file_path)
+                if current_version != expected_version:
+                    raise StaleVersionError(file_path, expected_version, current_version)
+            _atomic_write_csv(df, file_path)
+            # The new contents already include everything that was pending.
+            for path in (self.journal_path(file_path), self.compacting_path(file_path)):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._bump_version(file_path)
+
+    def touch(self, file_path):
+        with _lock_for(file_path):
+            self._bump_version(file_path)
+
+    def compact(self, file_path):
+        """Folds the pending journal into the CSV. Appends keep flowing while it runs."""
+        journal_path = self.journal_path(file_path)
+        compacting_path = self.compacting_path(file_path)
+        with _lock_for(file_path):
+            if not os.path.exists(compacting_path):
+                if not os.path.exists(journal_path):
+                    return
+                os.replace(journal_path, compacting_path) # New appends start a fresh journal
+            base_df = self._read_base(file_path)
+            compacting_stat = _file_stat(compacting_path)
+        try:
+            merged_df = _apply_ops(base_df, self._read_journal(compacting_path), table_spec(file_path)["primary_key"])
+        except FileNotFoundError: # Overwritten by update_data mid-read
+            return
+        tmp_path = _tmp_path(file_path)
+        merged_df.to_csv(tmp_path, index=False)
+        with _lock_for(file_path):
+            if _file_stat(compacting_path) != compacting_stat:
+                # The table was overwritten (or compacted by another process) while we were merging.
+                os.remove(tmp_path)
+                return
+            os.replace(tmp_path, file_path)
+            os.remove(compacting_path)
+
+    def compact_in_background(self, file_path):
+        key = os.path.abspath(file_path)
+        with _path_locks_guard:
+            if key in _compactions_running:
+                return
+            _compactions_running.add(key)
+
+        def run():
+            try:
+                self.compact(file_path)
+            finally:
+                with _path_locks_guard:
+                    _compactions_running.discard(key)
+
+        threading.Thread(target=run, name=f"compact-{table_name(file_path)}", daemon=True).start()
+
+
+_compactions_running = set()
+
+
+# --- SQLite Engine ---
+def _quote(identifier):
+    return '"' + str(identifier).replace('"', '""') + '"'
+
+
+class SQLiteEngine:
+    """Stores every table in one SQLite database next to the CSV files.
+
+    Inserts only touch the new rows, so appends need no journal here.
+    """
+    name = "sqlite"
+
+    def db_path(self, file_path):
+        return os.path.join(os.path.dirname(file_path) or ".", SQLITE_DB_NAME)
+
+    def version_token(self, file_path):
+        """Changes whenever the database (or its write-ahead log) is written."""
+        db_path = self.db_path(file_path)
+        return (_file_stat(db_path), _file_stat(db_path + "-wal"))
+
+    def _version(self, conn, file_path):
+        conn.execute("CREATE TABLE IF NOT EXISTS _table_versions (table_name PRIMARY KEY, version INTEGER NOT NULL)")
+        row = conn.execute("SELECT version FROM _table_versions WHERE table_name = ?", (table_name(file_path),)).fetchone()
+        return row[0] if row else 0
+
+    def _bump_version(self, conn, file_path):
+        version = self._version(conn, file_path) + 1
+        conn.execute(
+            "INSERT INTO _table_versions (table_name, version) VALUES (?, ?) "
+            "ON CONFLICT(table_name) DO UPDATE SET version = excluded.version",
+            (table_name(file_path), version),
+        )
+        return version
+
+    def table_version(self, file_path):
+        with closing(self.connect(file_path)) as conn, conn:
+            return self._version(conn, file_path)
+
+    def reserve_ids(self, file_path, count, seed):
+        """Advances the table's ID sequence by count and returns the first number reserved.
+
+        The sequence starts from seed() the first time it is used.
+        """
+        with closing(self.connect(file_path)) as conn, conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("CREATE TABLE IF NOT EXISTS _sequences (table_name PRIMARY KEY, last INTEGER NOT NULL)")
+            row = conn.execute("SELECT last FROM _sequences WHERE table_name = ?", (table_name(file_path),)).fetchone()
+            last = row[0] if row else seed()
+            conn.execute(
+                "INSERT INTO _sequences (table_name, last) VALUES (?, ?) "
+                "ON CONFLICT(table_name) DO UPDATE SET last = excluded.last",
+                (table_name(file_path), last + count),
+            )
+        return last + 1
+
+    def connect(self, file_path):
+        conn = sqlite3.connect(self.db_path(file_path), timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _table_columns(self, conn, table):
+        return [row[1] for row in conn.execute(f"PRAGMA table_info({_quote(table)})")]
+
+    def ensure_table(self, conn, file_path, columns):
+        """Creates the table (plus key and indexes) and adds any missing columns."""
+        table = table_name(file_path)
+        spec = table_spec(file_path)
+        primary_key = spec["primary_key"]
+        existing = self._table_columns(conn, table)
+        if not existing:
+            columns = list(columns)
+            if primary_key and primary_key not in columns:
+                columns.insert(0, primary_key)
+            column_sql = ", ".join(_quote(col) for col in columns)
+            if primary_key:
+                column_sql += f", PRIMARY KEY ({_quote(primary_key)})"
+            conn.execute(f"CREATE TABLE {_quote(table)} ({column_sql})")
+            existing = columns
+        else:
+            for col in columns:
+                if col not in existing:
+                    conn.execute(f"ALTER TABLE {_quote(table)} ADD COLUMN {_quote(col)}")
+                    existing.append(col)
+                    if col == primary_key: # Key added to an older table: index it instead
+                        conn.execute(
+                            f"CREATE UNIQUE INDEX IF NOT EXISTS {_quote(f'idx_{table}_{col}')} ON {_quote(table)} ({_quote(col)})"
+                        )
+        for col in spec["indexes"]:
+            if col in existing:
+                conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS {_quote(f'idx_{table}_{col}')} ON {_quote(table)} ({_quote(col)})"
+                )
+        return existing
+
+    def _insert(self, conn, file_path, df):
+        if df.empty:
+            return
+        table = table_name(file_path)
+        placeholders = ", ".join("?" for _ in df.columns)
+        column_sql = ", ".join(_quote(col) for col in df.columns)
+        conn.executemany(f"INSERT INTO {_quote(table)} ({column_sql}) VALUES ({placeholders})", _records(df))
+
+    def initialize(self, file_path, columns):
+        with closing(self.connect(file_path)) as conn, conn:
+            if self._table_columns(conn, table_name(file_path)):
+                return
+            # First run against this database: bring over any rows already in the CSV.
+            # Checked before the table is created, so a refused import is tried again on the next start.
+            csv_df = CSVEngine().load(file_path)
+            if csv_df is not None and not csv_df.empty:
+                _check_unique_keys(file_path, csv_df)
+            self.ensure_table(conn, file_path, columns)
+            if csv_df is not None and not csv_df.empty:
+                self.ensure_table(conn, file_path, csv_df.columns)
+                self._insert(conn, file_path, csv_df)
+
+    def stored_columns(self, file_path):
+        """Returns the table's columns ([] before it exists)."""
+        with closing(self.connect(file_path)) as conn:
+            return self._table_columns(conn, table_name(file_path))
+
+    def load(self, file_path, usecols=None):
+        """Returns the table (or just usecols of it) as a DataFrame, or None if it does not exist yet."""
+        table = table_name(file_path)
+        with closing(self.connect(file_path)) as conn:
+            existing = self._table_columns(conn, table)
+            if not existing:
+                return None
+            selected = existing if usecols is None else [col for col in usecols if col in existing]
+            column_sql = ", ".join(_quote(col) for col in selected) or "rowid"
+            df = pd.read_sql_query(f"SELECT {column_sql} FROM {_quote(table)} ORDER BY rowid", conn)
+            return df[selected]
+
+    def append(self, file_path, new_rows):
+        with closing(self.connect(file_path)) as conn, conn:
+            self.ensure_table(conn, file_path, new_rows.columns)
+            self._insert(conn, file_path, new_rows)
+            self._bump_version(conn, file_path)
+
+    def replace(self, file_path, df, expected_version=None):
+        with closing(self.connect(file_path)) as conn, conn:
+            conn.execute("BEGIN IMMEDIATE") # Take the write lock before checking the version
+            if expected_version is not None:
+                current_version = self._version(conn, file_path)
+                if current_version != expected_version:
+                    raise StaleVersionError(file_path, expected_version, current_version)
+            self.ensure_table(conn, file_path, df.columns)
+            conn.execute(f"DELETE FROM {_quote(table_name(file_path))}")
+            self._insert(conn, file_path, df)
+            self._bump_version(conn, file_path)
+
+    def touch(self, file_path):
+        with closing(self.connect(file_path)) as conn, conn:
+            self._bump_version(conn, file_path)
+
+    def upsert(self, file_path, key, values):
+        table = table_name(file_path)
+        primary_key = table_spec(file_path)["primary_key"]
+        values = {col: _to_plain_value(value) for col, value in values.items() if col != primary_key}
+        with closing(self.connect(file_path)) as conn, conn:
+            self.ensure_table(conn, file_path, [primary_key] + list(values))
+            updated = 0
+            if values:
+                set_sql = ", ".join(f"{_quote(col)} = ?" for col in values)
+                updated = conn.execute(
+                    f"UPDATE {_quote(table)} SET {set_sql} WHERE {_quote(primary_key)} = ?", [*values.values(), _to_plain_value(key)]
+                ).rowcount
+            if not updated:
+                conn.execute(
+                    f"INSERT OR IGNORE INTO {_quote(table)} ({', '.join(_quote(col) for col in [primary_key, *values])}) "
+                    f"VALUES ({', '.join('?' for _ in range(len(values) + 1))})",
+                    [_to_plain_value(key), *values.values()],
+                )
+            self._bump_version(conn, file_path)
+
+    def delete(self, file_path, keys):
+        table = table_name(file_path)
+        primary_key = table_spec(file_path)["primary_key"]
+        with closing(self.connect(file_path)) as conn, conn:
+            if self._table_columns(conn, table):
+                conn.executemany(f"DELETE FROM {_quote(table)} WHERE {_quote(primary_key)} = ?", [(_to_plain_value(key),) for key in keys])
+            self._bump_version(conn, file_path)
+
+    def get_row(self, file_path, key):
+        """Returns one row as a dict (None if absent), looked up through the primary key."""
+        table = table_name(file_path)
+        primary_key = table_spec(file_path)["primary_key"]
+        with closing(self.connect(file_path)) as conn:
+            columns = self._table_columns(conn, table)
+            if not columns:
+                return None
+            row = conn.execute(f"SELECT * FROM {_quote(table)} WHERE {_quote(primary_key)} = ?", (_to_plain_value(key),)).fetchone()
+            return dict(zip(columns, row)) if row else None
+
+    def get_rows(self, file_path, keys):
+        """Returns the rows with these keys as dicts, in the order asked for (absent keys are skipped)."""
+        table = table_name(file_path)
+        primary_key = table_spec(file_path)["primary_key"]
+        keys = list(dict.fromkeys(_to_plain_value(key) for key in keys))
+        rows = {}
+        with closing(self.connect(file_path)) as conn:
+            columns = self._table_columns(conn, table)
+            if not columns:
+                return []
+            position = columns.index(primary_key)
+            for start in range(0, len(keys), SQLITE_MAX_PARAMS):
+                chunk = keys[start:start + SQLITE_MAX_PARAMS]
+                placeholders = ", ".join("?" for _ in chunk)
+                query = f"SELECT * FROM {_quote(table)} WHERE {_quote(primary_key)} IN ({placeholders})"
+                rows.update((row[position], dict(zip(columns, row))) for row in conn.execute(query, chunk))
+        return [rows[key] for key in keys if key in rows]
+
+
+def _check_unique_keys(file_path, df):
+    """Raises DuplicateKeyError if rows of df share a primary key, as a primary key cannot repeat in SQLite."""
+    primary_key = table_spec(file_path)["primary_key"]
+    if primary_key and primary_key in df.columns:
+        keys = df[primary_key]
+        repeated = keys[keys.notna() & keys.duplicated()].unique().tolist()
+        if repeated:
+            raise DuplicateKeyError(file_path, repeated)
+
+
+ENGINES = {"csv": CSVEngine, "sqlite": SQLiteEngine}
+_engine = None
+
+
+def get_engine():
+    """Returns the storage engine selected by ZENOVA_STORAGE_ENGINE (default: csv)."""
+    global _engine
+    engine_name = os.environ.get(STORAGE_ENGINE_ENV, "csv").strip().lower()
+    if engine_name not in ENGINES:
+        raise ValueError(f"Unknown storage engine '{engine_name}'. Choose one of: {', '.join(ENGINES)}")
+    if _engine is None or _engine.name != engine_name:
+        _engine = ENGINES[engine_name]()
+    return _engine
+
+
+# --- Shared DataFrame Cache ---
+class FrameCache:
+    """Process-wide cache of parsed tables, shared by every Streamlit session.
+
+    Entries are keyed on (engine, version token, schema), where the version token
+    is the mtime and size of the table's files, so a write from any process is
+    picked up on the next read. Writes made through this module also drop the
+    table's entries straight away.
+    """
+
+    def __init__(self):
+        self._entries = {} # abspath -> {(engine, token, schema): DataFrame}
+        self._guard = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, file_path, key):
+        with self._guard:
+            df = self._entries.get(os.path.abspath(file_path), {}).get(key)
+            if df is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return df
+
+    def put(self, file_path, key, df):
+        with self._guard:
+            entries = self._entries.setdefault(os.path.abspath(file_path), {})
+            # Older versions of the table are never served again.
+            for stale_key in [k for k in entries if k[:2] != key[:2]]:
+                del entries[stale_key]
+            entries[key] = df
+
+    def invalidate(self, file_path):
+        with self._guard:
+            self._entries.pop(os.path.abspath(file_path), None)
+
+    def stats(self):
+        with self._guard:
+            frames = [df for entries in self._entries.values() for df in entries.values()]
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "tables": len(self._entries),
+                "bytes": int(sum(df.memory_usage(index=True, deep=False).sum() for df in frames)),
+            }
+
+
+_frame_cache = FrameCache()
+
+# Cached frames are handed to every session as shallow copies. Copy-on-write
+# (always on from pandas 3) keeps one session's column edits out of the others.
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+
+def cache_stats():
+    """Returns hit/miss counters and the size of the shared DataFrame cache."""
+    return _frame_cache.stats()
+
+
+# --- Derived Values Cached per Table Version ---
+_derived = {} # (abspath, name) -> (table version, value)
+_derived_guard = threading.Lock()
+
+
+def cached_derived(file_path, version, name, build):
+    """Returns build(), computed once per (table, name, version) and shared by all sessions.
+
+    version is normally ``df.attrs["table_version"]`` of the frame build reads;
+    without one the value is rebuilt on every call.
+    """
+    if version is None:
+        return build()
+    key = (os.path.abspath(file_path), name)
+    with _derived_guard:
+        cached = _derived.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    value = build()
+    with _derived_guard:
+        _derived[key] = (version, value)
+    return value
+
+
+def list_membership(file_path, df, column):
+    """Returns a dict of value -> index labels of the rows of df whose list column contains it.
+
+    Built with one explode per table version, so "which rows include X" is a dict lookup.
+    """
+    def build():
+        exploded = df[column].explode().dropna()
+        return {value: labels for value, labels in exploded.groupby(exploded, sort=False).groups.items()}
+    return cached_derived(file_path, (get_engine().name, df.attrs.get("table_version")), f"members:{column}", build)
+
+
+# --- Computed Columns ---
+_computed = {} # abspath -> {column: (input columns, compute)}
+
+
+def computed_column(file_path, column, inputs, compute):
+    """Adds a column to the table as read, computed from its inputs columns: compute(df) returns its values for df's rows.
+
+    The column is never stored. load_data computes it for the whole table once
+    per version, and get_row, get_rows and the rows listeners are shown compute
+    it for just those rows, so a write costs only the rows it wrote. compute
+    sees the inputs typed by load_data's schema or as stored, and must accept
+    both. If its values change without a write (e.g. with the calendar), call touch.
+    """
+    _computed.setdefault(os.path.abspath(file_path), {})[column] = (list(inputs), compute)
+    _frame_cache.invalidate(file_path)
+
+
+def _computed_for(file_path, usecols=None):
+    """The table's computed columns among usecols (all of them when usecols is None)."""
+    computed = _computed.get(os.path.abspath(file_path), {})
+    return {column: spec for column, spec in computed.items() if usecols is None or column in usecols}
+
+
+def _with_computed(file_path, df):
+    """df (rows of the table) with its computed columns added."""
+    computed = _computed_for(file_path)
+    if df is None or not computed:
+        return df
+    df = df.copy(deep=False)
+    for column, (inputs, compute) in computed.items():
+        df[column] = compute(df.reindex(columns=inputs))
+    return df
+
+
+def _rows_with_computed(file_path, rows):
+    """rows (dicts as stored) with their computed columns added."""
+    computed = _computed_for(file_path)
+    if not rows or not computed:
+        return rows
+    df = pd.DataFrame(rows)
+    for column, (inputs, compute) in computed.items():
+        for row, value in zip(rows, compute(df.reindex(columns=inputs))):
+            row[column] = _to_plain_value(value)
+    return rows
+
+
+# --- Helper Functions for Data Handling ---
+def initialize_csv(file_path, columns):
+    """Initializes a table with headers if it doesn't exist or is empty."""
+    get_engine().initialize(file_path, list(columns))
+    _frame_cache.invalidate(file_path)
+
+
+def _load_uncached(engine, file_path, columns, usecols):
+    computed = _computed_for(file_path, usecols)
+    read_cols = usecols
+    if usecols is not None and computed: # Read what the computed columns are computed from instead
+        inputs = [col for spec in computed.values() for col in spec[0]]
+        read_cols = list(dict.fromkeys([col for col in usecols if col not in computed] + inputs))
+    df = engine.load(file_path, read_cols)
+    if df is None:
+        df = pd.DataFrame(columns=list(columns)) if columns else pd.DataFrame()
+    # Ensure columns are present, add if missing (e.g., new columns from updates)
+    if columns:
+        for col in columns:
+            if col not in df.columns and (read_cols is None or col in read_cols):
+                df[col] = None
+    if read_cols is not None:
+        for col in read_cols:
+            if col not in df.columns:
+                df[col] = None
+        df = df[list(read_cols)]
+    if isinstance(columns, dict):
+        df = apply_schema(df, columns)
+    for column, (inputs, compute) in computed.items():
+        df[column] = compute(df.reindex(columns=inputs))
+    if usecols is not None and computed:
+        df = df[list(usecols)]
+    return df
+
+
+def table_version(file_path):
+    """Returns the table's write counter; it goes up by one on every write."""
+    return get_engine().table_version(file_path)
+
+
+def load_data(file_path, columns=None, usecols=None):
+    """Loads a table. Returns an empty DataFrame if the table is empty or not found.
+
+    columns may be a list of column names or a schema dict of column -> type
+    ("str", "category", "int", "float", "bool", "list", "date" or "datetime"); declared types
+    are parsed once per table version, not on every rerun.
+
+    Pass usecols to read only the columns you render; the CSV engine then reads
+    them from the table's Parquet snapshot instead of parsing every column.
+
+    The parsed frame is cached for all sessions until the table changes; callers
+    get their own shallow copy, so they may add or overwrite columns freely.
+    The version it was read at is in ``df.attrs["table_version"]`` and the
+    load_data arguments that produced it in ``df.attrs["source"]``.
+    """
+    engine = get_engine()
+    with _lock_for(file_path): # One parse per table version, however many sessions ask
+        schema = tuple(columns.items()) if isinstance(columns, dict) else tuple(columns or ())
+        key = (engine.name, engine.version_token(file_path), schema, None if usecols is None else tuple(usecols))
+        df = _frame_cache.get(file_path, key)
+        if df is None:
+            df = _load_uncached(engine, file_path, columns, usecols)
+            df.attrs["table_version"] = engine.table_version(file_path)
+            df.attrs["source"] = (file_path, columns, usecols) # Lets derived caches reload this exact frame
+            _frame_cache.put(file_path, key, df)
+    return df.copy(deep=False)
+
+
+def source_frame(df):
+    """Returns the cached frame df was searched or filtered from, or None if df cannot be traced to one.
+
+    That is the load_data result recorded in ``df.attrs["source"]``, if it is still at df's version.
+    """
+    source, version = df.attrs.get("source"), df.attrs.get("table_version")
+    if source is None or version is None:
+        return None
+    file_path, columns, usecols = source
+    full_df = load_data(file_path, columns=columns, usecols=usecols)
+    if full_df.attrs.get("table_version") != version or not set(df.columns) <= set(full_df.columns):
+        return None # Written since, or df has columns computed after loading
+    return full_df
+
+
+# --- Change Listeners ---
+_listeners = []
+
+
+def on_change(listener):
+    """Registers listener(file_path, change) to be called after every write made through this module.
+
+    It runs under the table lock, so it sees writes one at a time and in order.
+    change is a dict with "op" ("insert", "upsert", "delete" or "replace"), the
+    table's new "version" and what was written: "rows" (a DataFrame) for insert
+    and replace, "key", "values" and "row" (the whole row as now stored, a dict)
+    for upsert, "keys" for delete. Upserts and deletes also carry "old_rows", the
+    affected rows (dicts) as they were before. Rows and old rows include the
+    table's computed columns. A replace whose "rows" is None comes from touch:
+    the table's values are to be read afresh.
+    """
+    if listener not in _listeners:
+        _listeners.append(listener)
+
+
+def off_change(listener):
+    """Stops calling a listener registered with on_change; a no-op if it is not registered."""
+    try:
+        _listeners.remove(listener)
+    except ValueError:
+        pass
+
+
+def _rows_for_listeners(file_path, keys):
+    """Returns the stored rows with these keys, for listeners; nothing if no one listens."""
+    if not _listeners:
+        return []
+    return _rows_with_computed(file_path, get_engine().get_rows(file_path, keys))
+
+
+def _notify(file_path, op, **change):
+    if not _listeners:
+        return
+    change.update(op=op, version=get_engine().table_version(file_path))
+    for listener in list(_listeners):
+        listener(file_path, change)
+
+
+def follow_change(registry, guard, file_path, change, apply):
+    """Brings the structures kept in registry for file_path's table up to date with one write (an on_change change).
+
+    registry maps keys whose first item is the table's absolute path to
+    structures with a ``version``; guard is the lock registry is read and
+    written under. apply(structure, change) records the write and returns False
+    if the structure should be built afresh instead. A structure that missed a
+    write, or that the write does not fit (apply raises KeyError, TypeError or
+    ValueError), is dropped from registry, to be rebuilt on its next use.
+    """
+    path = os.path.abspath(file_path)
+    with guard:
+        entries = [(key, structure) for key, structure in registry.items() if key[0] == path]
+    for key, structure in entries:
+        if structure.version == change["version"]:
+            continue # Nothing was written
+        try:
+            current = structure.version == change["version"] - 1 and apply(structure, change)
+        except (KeyError, TypeError, ValueError):
+            current = False
+        if not current:
+            with guard:
+                if registry.get(key) is structure:
+                    del registry[key]
+
+
+def typed_rows(rows, columns):
+    """Returns written rows (a DataFrame) typed as load_data(file_path, columns) would have read them."""
+    if isinstance(columns, dict):
+        rows = apply_schema(rows, {col: columns[col] for col in rows.columns if col in columns})
+    return rows
+
+
+def append_data(file_path, new_entry_df):
+    """Appends rows to a table, adding any new columns."""
+    with _lock_for(file_path):
+        try:
+            new_entry_df = new_entry_df.drop(columns=list(_computed_for(file_path)), errors="ignore")
+            get_engine().append(file_path, new_entry_df)
+            _notify(file_path, "insert", rows=_with_computed(file_path, new_entry_df))
+        finally:
+            _frame_cache.invalidate(file_path)
+
+
+def update_data(file_path, df_to_save, expected_version=None):
+    """Overwrites the entire table with the given DataFrame.
+
+    The write happens under the table lock and replaces the file atomically. If
+    expected_version is given and the table has been written since then, nothing
+    is saved and StaleVersionError is raised.
+    """
+    with _lock_for(file_path): # Also keeps load_data's frame and version in step
+        try:
+            df_to_save = df_to_save.drop(columns=list(_computed_for(file_path)), errors="ignore")
+            get_engine().replace(file_path, df_to_save, expected_version=expected_version)
+            _notify(file_path, "replace", rows=_with_computed(file_path, df_to_save))
+        finally:
+            _frame_cache.invalidate(file_path)
+
+
+def touch(file_path):
+    """Marks the table as changed without writing to it, e.g. when its computed columns move with the calendar.
+
+    Its version goes up and listeners see a replace without rows, so
+    everything derived from the table is computed afresh.
+    """
+    with _lock_for(file_path):
+        try:
+            get_engine().touch(file_path)
+            _notify(file_path, "replace", rows=None)
+        finally:
+            _frame_cache.invalidate(file_path)
+
+
+# --- Row-Level Writes ---
+def _primary_key(file_path):
+    primary_key = table_spec(file_path)["primary_key"]
+    if not primary_key:
+        raise ValueError(f"{table_name(file_path)} has no primary key; use update_data instead")
+    return primary_key
+
+
+def _comparable(value):
+    """Normalizes a cell so values read back from CSV, JSON or SQLite compare equal."""
+    value = _to_plain_value(value)
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return float(value)
+    return str(value)
+
+
+def _check_expected(file_path, key, expected):
+    """Raises StaleRowError unless the stored row still matches the expected values."""
+    current = get_engine().get_row(file_path, key)
+    if current is None:
+        raise StaleRowError(file_path, key)
+    for col, value in expected.items():
+        if col not in current: # Columns the caller derived for display are not stored
+            continue
+        old, new = _comparable(value), _comparable(current[col])
+        if old != new and str(old) != str(new):
+            raise StaleRowError(file_path, key)
+
+
+def get_row(file_path, key):
+    """Returns one row of a table as a dict keyed by column, or None if the key is absent."""
+    rows = get_rows(file_path, [key])
+    return rows[0] if rows else None
+
+
+def get_rows(file_path, keys):
+    """Returns the rows of a table with these primary keys as dicts, in the order asked for; absent keys are skipped."""
+    _primary_key(file_path)
+    return _rows_with_computed(file_path, get_engine().get_rows(file_path, keys))
+
+
+def load_rows(file_path, keys, columns=None):
+    """Returns the rows with these primary keys as a DataFrame, typed like load_data's (columns as there)."""
+    names = list(columns) + [col for col in _computed_for(file_path) if col not in columns] if columns else None
+    rows = pd.DataFrame(get_rows(file_path, keys), columns=names)
+    return apply_schema(rows, columns) if isinstance(columns, dict) else rows
+
+
+def upsert_row(file_path, key, values, expected=None):
+    """Updates the given columns of the row with this primary key, inserting it if absent.
+
+    Only the one row is written, however large the table. If expected (a dict of
+    column -> value as the caller last saw it) is given and the stored row no
+    longer matches, or has been deleted, nothing is saved and StaleRowError is raised.
+    """
+    _primary_key(file_path)
+    with _lock_for(file_path):
+        try:
+            if expected is not None:
+                _check_expected(file_path, key, expected)
+            old_rows = _rows_for_listeners(file_path, [key])
+            values = {col: value for col, value in values.items() if col not in _computed_for(file_path)}
+            get_engine().upsert(file_path, key, values)
+            row = _rows_for_listeners(file_path, [key]) # Read once here rather than by each listener
+            _notify(file_path, "upsert", key=key, values=values, old_rows=old_rows, row=row[0] if row else None)
+        finally:
+            _frame_cache.invalidate(file_path)
+
+
+def delete_row(file_path, key, expected=None):
+    """Deletes the row with this primary key; see upsert_row for expected. Returns False if there was no such row."""
+    _primary_key(file_path)
+    with _lock_for(file_path):
+        try:
+            if expected is not None:
+                _check_expected(file_path, key, expected)
+            stored = get_engine().get_rows(file_path, [key])
+            if not stored:
+                return False
+            get_engine().delete(file_path, [key])
+            _notify(file_path, "delete", keys=[key], old_rows=_rows_with_computed(file_path, stored) if _listeners else [])
+            return True
+        finally:
+            _frame_cache.invalidate(file_path)
+
+
+def delete_rows(file_path, keys):
+    """Deletes every row whose primary key is in keys."""
+    _primary_key(file_path)
+    keys = list(keys)
+    if not keys:
+        return
+    with _lock_for(file_path):
+        try:
+            old_rows = _rows_for_listeners(file_path, keys)
+            get_engine().delete(file_path, keys)
+            _notify(file_path, "delete", keys=keys, old_rows=old_rows)
+        finally:
+            _frame_cache.invalidate(file_path)
+
+
+# --- ID Allocation ---
+def _sequence_floor(ids, prefix):
+    """Returns the highest number already used by IDs like PREFIX0042 (or the row count, if higher)."""
+    numbers = ids.dropna().astype(str).str.extract(rf"^{re.escape(prefix)}-?(\d+)$")[0].dropna().astype(int)
+    return max(len(ids), int(numbers.max()) if len(numbers) else 0)
+
+
+def allocate_ids(file_path, prefix, count=1, width=4):
+    """Reserves count new IDs for a table, e.g. ["AST0012", "AST0013"].
+
+    IDs come from a persistent per-table sequence, so they are never reused
+    (even after deletes) and two sessions or processes never receive the same
+    one. Allocation does not load the table, except once to start the sequence
+    above the IDs already in it.
+    """
+    primary_key = _primary_key(file_path)
+    engine = get_engine()
+
+    def seed():
+        existing = engine.load(file_path, [primary_key])
+        return 0 if existing is None or primary_key not in existing.columns else _sequence_floor(existing[primary_key], prefix)
+
+    first = engine.reserve_ids(file_path, count, seed)
+    return [f"{prefix}{str(number).zfill(width)}" for number in range(first, first + count)]
+
+
+def allocate_id(file_path, prefix, width=4):
+    """Reserves one new ID for a table; see allocate_ids."""
+    return allocate_ids(file_path, prefix, 1, width)[0]
+
+
+def _unsound_keys(keys):
+    """Which keys need a new ID: missing or blank ones, and every repeat of a key after its first row."""
+    missing = keys.isna() | (keys.astype(str).str.strip() == "")
+    return missing | (keys.duplicated(keep="first") & ~missing)
+
+
+def backfill_ids(file_path, prefix, width=4):
+    """Gives a newly allocated primary key to rows saved without one and to repeats of a key. Returns the number of rows fixed.
+
+    Repeats are left by the old "row count + 1" IDs, which were given out again
+    after a delete; a key's first row keeps it. The new IDs come from the
+    table's sequence, which moves past them. Once the keys are sound the check
+    is a lookup until the table is next written, so this can run on every start.
+    """
+    primary_key = _primary_key(file_path)
+    with _lock_for(file_path):
+        # Only a stored key column can be checked on its own; without one (a table saved before it had keys) every row needs an ID
+        if primary_key in get_engine().stored_columns(file_path):
+            keys = load_data(file_path, usecols=[primary_key])
+            version = (get_engine().name, keys.attrs["table_version"])
+            if cached_derived(file_path, version, "sound_keys", lambda: not _unsound_keys(keys[primary_key]).any()):
+                return 0
+        df = load_data(file_path)
+        if primary_key in df.columns:
+            unsound = _unsound_keys(df[primary_key])
+        else:
+            unsound = pd.Series(True, index=df.index)
+        if not unsound.any():
+            return 0
+        df[primary_key] = df.get(primary_key, pd.Series(None, index=df.index)).astype(object)
+        df.loc[unsound, primary_key] = allocate_ids(file_path, prefix, int(unsound.sum()), width)
+        df = df[[primary_key] + [col for col in df.columns if col != primary_key]]
+        update_data(file_path, df, expected_version=df.attrs.get("table_version"))
+        return int(unsound.sum())
+
+
+# --- One-shot CSV -> SQLite Migration ---
+def migrate_csv_to_sqlite(data_dir):
+    """Copies every known CSV table in data_dir into the SQLite database, replacing its rows.
+
+    Returns a dict of table name -> number of rows migrated. If any table has
+    rows sharing a primary key, DuplicateKeyError is raised before anything is copied.
+    """
+    engine = SQLiteEngine()
+    tables = {}
+    for table in TABLE_SPECS:
+        file_path = os.path.join(data_dir, f"{table}.csv")
+        csv_df = CSVEngine().load(file_path)
+        if csv_df is not None:
+            _check_unique_keys(file_path, csv_df)
+            tables[file_path] = csv_df
+    migrated = {}
+    for file_path, csv_df in tables.items():
+        engine.replace(file_path, csv_df)
+        migrated[table_name(file_path)] = len(csv_df)
+    return migrated
+
+
+def compact_all(data_dir):
+    """Folds every pending CSV journal in data_dir into its table."""
+    compacted = []
+    for table in TABLE_SPECS:
+        file_path = os.path.join(data_dir, f"{table}.csv")
+        engine = CSVEngine()
+        if os.path.exists(engine.journal_path(file_path)) or os.path.exists(engine.compacting_path(file_path)):
+            engine.compact(file_path)
+            compacted.append(table)
+    return compacted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Zenova SRP storage utilities.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = subparsers.add_parser("migrate", help="Copy the CSV tables into the SQLite database.")
+    migrate_parser.add_argument("--data-dir", default="data", help="Directory holding the CSV files (default: data)")
+    compact_parser = subparsers.add_parser("compact", help="Fold pending CSV journals into their tables.")
+    compact_parser.add_argument("--data-dir", default="data", help="Directory holding the CSV files (default: data)")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        try:
+            migrated = migrate_csv_to_sqlite(args.data_dir)
+        except DuplicateKeyError as e:
+            parser.exit(1, f"Not migrated: {e}\n")
+        for table, row_count in migrated.items():
+            print(f"{table}: {row_count} rows")
+        print(f"Done. Set {STORAGE_ENGINE_ENV}=sqlite to run the app on {os.path.join(args.data_dir, SQLITE_DB_NAME)}.")
+    elif args.command == "compact":
+        compacted = compact_all(args.data_dir)
+        print(f"Compacted: {', '.join(compacted)}" if compacted else "No pending journals.")
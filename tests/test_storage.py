@@ -0,0 +1,39 @@
+"""Regression tests for storage.py, run against both engines: python -m pytest tests"""
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import storage  # noqa: E402
+
+
+@pytest.fixture(params=["csv", "sqlite"])
+def engine(request, monkeypatch):
+    monkeypatch.setenv(storage.STORAGE_ENGINE_ENV, request.param)
+    return request.param
+
+
+def test_backfill_ids_without_a_key_column(engine, tmp_path):
+    # uploaded_files.csv as saved before files had a file_id
+    file_path = str(tmp_path / "uploaded_files.csv")
+    pd.DataFrame({"name": ["a.pdf", "b.pdf", "c.pdf"], "path": ["a", "b", "c"]}).to_csv(file_path, index=False)
+    storage.initialize_csv(file_path, ["file_id", "name", "path"])
+
+    assert storage.backfill_ids(file_path, "FILE") == 3
+    df = storage.load_data(file_path)
+    assert df["name"].tolist() == ["a.pdf", "b.pdf", "c.pdf"]
+    assert df["file_id"].str.startswith("FILE").all() and df["file_id"].is_unique
+    assert storage.backfill_ids(file_path, "FILE") == 0
+
+
+def test_backfill_ids_with_a_blank_key(engine, tmp_path):
+    file_path = str(tmp_path / "assets.csv")
+    storage.initialize_csv(file_path, ["asset_id", "name"])
+    storage.append_data(file_path, pd.DataFrame({"asset_id": ["AST0001", None], "name": ["pump", "valve"]}))
+
+    assert storage.backfill_ids(file_path, "AST") == 1
+    keys = storage.load_data(file_path)["asset_id"]
+    assert keys[0] == "AST0001" and keys[1].startswith("AST") and keys.is_unique
+    assert storage.allocate_id(file_path, "AST") not in set(keys)